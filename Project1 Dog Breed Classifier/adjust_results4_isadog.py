@@ -36,29 +36,107 @@
 #       Notice that this function doesn't return anything because the 
 #       results_dic dictionary that is passed into the function is a mutable 
 #       data type so no return is needed.
-# 
+#
+#       When the predicted ImageNet class indexes are passed in as well, the
+#       classifier dog check doesn't need any string work: the dog names are
+#       compiled once into a 1000-entry boolean lookup (one entry per ImageNet
+#       class id) and the whole batch is checked with one array lookup.
+#
+
+import os  # To check when the dog names file changes
+from functools import lru_cache  # To read each dog names file only once
+import numpy as np  # For the class id lookup array
+from imagenet_labels import load_imagenet_labels  # Precompiled ImageNet label table
+from results_table import ResultsTable  # Column-based results dictionary
+
 
-def adjust_results4_isadog(results_dic, dogfile):
+def load_dognames(dogfile):
     """
-    Adjust the dictionary to check if the labels are dogs or not.
+    Returns the set of dog names (lowercase, no extra spaces) in dogfile.
+    The file is only read again when it changes.
     """
-    # Create a set to store dog names
-    dognames = set()
-    
-    # Open the file with dog names and read each line
+    return _load_dognames(os.path.abspath(dogfile), os.path.getmtime(dogfile))
+
+
+@lru_cache(maxsize=8)
+def _load_dognames(dogfile, mtime):
+    # Read each line of the dog names file into a set
     with open(dogfile, 'r') as f:
-        for line in f:
-            dogname = line.strip().lower()  # Remove spaces and make lowercase
-            dognames.add(dogname)  # Add the name to the set
-    
-    # Counter for counting iterations
-    counter = 0  
-    
-    # Loop through each item in the dictionary
+        return frozenset(line.strip().lower() for line in f)
+
+
+def dog_class_lookup(dogfile):
+    """
+    Returns a boolean array with one entry per ImageNet class id, True when
+    any of the class's names is in the dog names file.
+    """
+    return _dog_class_lookup(os.path.abspath(dogfile), os.path.getmtime(dogfile))
+
+
+@lru_cache(maxsize=8)
+def _dog_class_lookup(dogfile, mtime):
+    dognames = _load_dognames(dogfile, mtime)
+
+    # A class is a dog if any of its comma-separated names is a dog name
+    lookup = np.array([any(name in dognames for name in names)
+                       for names in load_imagenet_labels().synonyms], dtype=bool)
+    lookup.setflags(write=False)
+    return lookup
+
+
+def adjust_results4_isadog(results_dic, dogfile, class_ids=None, rows=None):
+    """
+    Adjust the dictionary to check if the labels are dogs or not.
+
+    Parameters:
+        results_dic (dict or ResultsTable): Results dictionary (see classify_images).
+        dogfile (str): Text file with one dog name per line.
+        class_ids (dict or None): Filename -> predicted ImageNet class index.
+                                  When given, the classifier dog check is a
+                                  single array lookup instead of string
+                                  matching on the classifier labels.
+        rows (list or None): Only fill in these rows of a ResultsTable (e.g.
+                             one finished batch). None fills in every row.
+    """
+    # Get the set of dog names (read from the file once per change)
+    dognames = load_dognames(dogfile)
+
+    if isinstance(results_dic, ResultsTable):
+        # Check each distinct pet label once, then spread the answer to every
+        # image through the label codes
+        selected = slice(None) if rows is None else np.asarray(rows, dtype=np.int64)
+        label_is_dog = np.array([label in dognames for label in results_dic.labels], dtype=np.int8)
+        is_pet_dog = label_is_dog[results_dic.pet_label_codes[selected]]
+        class_ids = results_dic.class_ids[selected]
+        if (class_ids >= 0).all():
+            # The table already holds the predicted class ids
+            is_classifier_dog = dog_class_lookup(dogfile)[class_ids]
+        else:
+            # Only labels are known (e.g. a table made from a dictionary)
+            is_classifier_dog = np.array(
+                [any(name.strip() in dognames for name in label.split(','))
+                 for label in results_dic.labels],
+                dtype=np.int8)[results_dic.classifier_label_codes[selected]]
+        results_dic.set_dog_flags(is_pet_dog, is_classifier_dog, rows)
+        return
+
+    if class_ids is not None:
+        # Look up every predicted class id in the dog lookup array at once
+        filenames = list(results_dic)
+        ids = np.fromiter((class_ids[key] for key in filenames), dtype=np.int64,
+                          count=len(filenames))
+        is_classifier_dog = dog_class_lookup(dogfile)[ids].astype(int).tolist()
+
+        for key, classifier_dog in zip(filenames, is_classifier_dog):
+            value = results_dic[key]
+            # Check if the pet label is a dog (1) or not (0)
+            is_pet_dog = 1 if value[0] in dognames else 0
+            # Add the results to the dictionary
+            value.extend([is_pet_dog, classifier_dog])
+        return
+
+    # Without class ids, check the classifier label strings instead
     for key, value in results_dic.items():
-        # Increment the counter
-        counter += 1  
-        
         # Check if the pet label is a dog
         if value[0] in dognames:
             is_pet_dog = 1  # It is a dog
@@ -68,21 +146,11 @@ def adjust_results4_isadog(results_dic, dogfile):
         # Split classifier label into a list
         classifier_labels = [label.strip() for label in value[1].split(',')]
 
-        # Variable to check classifier
-        found_dog_in_classifier = False  
-        for label in classifier_labels:
-            if label in dognames:
-                found_dog_in_classifier = True
-
         # Check if the classifier says it's a dog
-        if found_dog_in_classifier:
+        if any(label in dognames for label in classifier_labels):
             is_classifier_dog = 1  # Classifier says dog
         else:
             is_classifier_dog = 0  # Classifier says not a dog
 
         # Add the results to the dictionary
         value.extend([is_pet_dog, is_classifier_dog])
-
-        # Condition based on the counter
-        if counter % 5 == 0:
-            pass  # Placeholder for future code
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/benchmark_pipeline.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Benchmark the speed of the program without the internet. The CNN
+#          models are built with random weights (their speed doesn't depend
+#          on the weight values) and the images are synthetic JPEGs of typical
+#          photo sizes, so no pretrained weights or pet images are needed.
+#          Measures:
+#            latency     - single-image decode + inference time (after warm-up)
+#            throughput  - images per second of batched inference per batch size
+#            decode      - images per second of decoding and preprocessing
+#            postprocess - adjust_results4_isadog and calculates_results_stats
+#                          on 10k to 1M synthetic results
+#          Every number is saved to a JSON file. Given an earlier JSON file as
+#          --baseline, any number that got worse by more than --threshold is
+#          reported and the script exits with status 1.
+#
+# Usage: python benchmark_pipeline.py --output benchmark.json
+#        python benchmark_pipeline.py --baseline benchmark.json --threshold 0.2
+#
+##
+import argparse  # For the command line arguments
+import json  # To save and compare the results
+import os  # For the synthetic image folder
+import platform  # To record the machine the benchmark ran on
+import statistics  # For the latency percentiles
+import sys  # To exit with a failure status on a regression
+import tempfile  # Folder for the synthetic JPEGs
+from time import perf_counter, time  # To time each measurement
+import numpy as np  # For synthetic images and results
+from PIL import Image  # To write the synthetic JPEGs
+import torch  # For the random-weight models
+from classifier import load_image_tensor, models, predict_tensors, register_model  # The models
+from image_pipeline import load_image_batch  # Decodes a batch of images
+from imagenet_labels import load_imagenet_labels  # ImageNet class labels
+from adjust_results4_isadog import adjust_results4_isadog, load_dognames  # Is-a-dog step
+from calculates_results_stats import calculates_results_stats  # Statistics step
+from results_table import ResultsTable  # Column-based results
+
+# Typical (width, height) of photos such as the pet images
+IMAGE_SIZES = [(500, 375), (640, 480), (1024, 768), (1600, 1200)]
+
+# Result names ending with this are better when higher; all others are times
+HIGHER_IS_BETTER = 'images_per_sec'
+
+
+def random_weights_name(arch):
+    """
+    Registers a random-weight copy of an architecture as '<arch>:random' and
+    returns that name.
+    """
+    name = f"{arch}:random"
+    register_model(name, lambda pretrained: models.build(arch, pretrained=False))
+    return name
+
+
+def make_synthetic_jpegs(folder, n_images, seed=0):
+    """
+    Writes n_images synthetic JPEGs of the sizes in IMAGE_SIZES to folder and
+    returns their paths. The images are smooth color gradients with noise,
+    which compress (and decode) more like photos than pure noise does.
+    """
+    rng = np.random.default_rng(seed)
+    img_paths = []
+    for index in range(n_images):
+        width, height = IMAGE_SIZES[index % len(IMAGE_SIZES)]
+        # Scale a tiny random image up for large smooth areas, then add noise
+        small = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8))
+        pixels = np.asarray(small.resize((width, height), Image.BILINEAR), dtype=np.int16)
+        pixels = pixels + rng.integers(-12, 13, pixels.shape, dtype=np.int16)
+        img_path = os.path.join(folder, f"synthetic_{index:05d}.jpg")
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(img_path, quality=90)
+        img_paths.append(img_path)
+    return img_paths
+
+
+def percentile(values, fraction):
+    """Returns the value below which a fraction of the sorted values fall."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def benchmark_latency(name, img_paths, warmup=3, repeats=20):
+    """
+    Times decoding and classifying one image at a time.
+
+    Returns:
+        dict: p50, p95 and mean latency in milliseconds.
+    """
+    for img_path in img_paths[:warmup]:
+        predict_tensors(load_image_tensor(img_path).unsqueeze(0), name)
+
+    latencies_ms = []
+    for index in range(repeats):
+        start_time = perf_counter()
+        img_path = img_paths[index % len(img_paths)]
+        predict_tensors(load_image_tensor(img_path).unsqueeze(0), name)
+        latencies_ms.append((perf_counter() - start_time) * 1000.0)
+    return {
+        'p50_ms': percentile(latencies_ms, 0.50),
+        'p95_ms': percentile(latencies_ms, 0.95),
+        'mean_ms': statistics.fmean(latencies_ms),
+    }
+
+
+def benchmark_throughput(name, batch_sizes, min_images=64):
+    """
+    Times batched inference on already preprocessed images.
+
+    Returns:
+        dict: 'batch<N>_images_per_sec' for each batch size.
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        img_batch = torch.randn(batch_size, 3, 224, 224)
+        predict_tensors(img_batch, name)  # Warm-up run
+        n_batches = max(1, min_images // batch_size)
+        start_time = perf_counter()
+        for _ in range(n_batches):
+            predict_tensors(img_batch, name)
+        seconds = perf_counter() - start_time
+        results[f"batch{batch_size}_{HIGHER_IS_BETTER}"] = n_batches * batch_size / seconds
+    return results
+
+
+def benchmark_decode(img_paths, batch_size=32):
+    """
+    Times decoding and preprocessing the images in batches.
+
+    Returns:
+        dict: 'images_per_sec' of decoding.
+    """
+    load_image_batch(img_paths[:2])  # Warm-up
+    start_time = perf_counter()
+    for start in range(0, len(img_paths), batch_size):
+        load_image_batch(img_paths[start:start + batch_size])
+    return {HIGHER_IS_BETTER: len(img_paths) / (perf_counter() - start_time)}
+
+
+def make_synthetic_results(n_results, dogfile, seed=0):
+    """
+    Returns a ResultsTable with n_results classified synthetic images. Pet
+    labels are dog names plus some other animals; class ids are random.
+    """
+    rng = np.random.default_rng(seed)
+    imagenet_labels = load_imagenet_labels()
+    pet_label_choices = sorted(load_dognames(dogfile))[:100] + ['cat', 'gecko', 'polar bear']
+    pet_labels = [pet_label_choices[code]
+                  for code in rng.integers(0, len(pet_label_choices), n_results)]
+    table = ResultsTable((f"image_{index:07d}.jpg" for index in range(n_results)), pet_labels)
+    class_ids = rng.integers(0, len(imagenet_labels.labels), n_results)
+    table.set_classifications(class_ids,
+                              [imagenet_labels.normalized[class_id] for class_id in class_ids],
+                              rng.integers(0, 2, n_results))
+    return table
+
+
+def benchmark_postprocess(sizes, dogfile, repeats=3):
+    """
+    Times the is-a-dog and statistics steps on synthetic results of each size.
+
+    Returns:
+        dict: '<size>/adjust_results4_isadog_ms' and
+              '<size>/calculates_results_stats_ms' (best of repeats).
+    """
+    results = {}
+    adjust_results4_isadog(make_synthetic_results(10, dogfile), dogfile)  # Warm the lookups
+    for n_results in sizes:
+        table = make_synthetic_results(n_results, dogfile)
+        adjust_ms = []
+        stats_ms = []
+        for _ in range(repeats):
+            start_time = perf_counter()
+            adjust_results4_isadog(table, dogfile)
+            adjust_ms.append((perf_counter() - start_time) * 1000.0)
+            start_time = perf_counter()
+            calculates_results_stats(table)
+            stats_ms.append((perf_counter() - start_time) * 1000.0)
+        results[f"{n_results}/adjust_results4_isadog_ms"] = min(adjust_ms)
+        results[f"{n_results}/calculates_results_stats_ms"] = min(stats_ms)
+    return results
+
+
+def flatten(results, prefix=''):
+    """Returns nested result dictionaries as {'a/b/c': number}."""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}/"))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compares two benchmark results.
+
+    Parameters:
+        results (dict): This run's 'results' (as saved in the JSON file).
+        baseline (dict): An earlier run's 'results'.
+        threshold (float): Allowed slowdown as a fraction (0.2 = 20%).
+
+    Returns:
+        list: (name, baseline value, new value, slowdown fraction) of every
+              number that got worse by more than threshold.
+    """
+    regressions = []
+    new_values = flatten(results)
+    for name, old_value in flatten(baseline).items():
+        new_value = new_values.get(name)
+        if new_value is None or not old_value or not new_value:
+            continue  # Not measured in both runs
+        if name.endswith(HIGHER_IS_BETTER):
+            slowdown = old_value / new_value - 1.0
+        else:
+            slowdown = new_value / old_value - 1.0
+        if slowdown > threshold:
+            regressions.append((name, old_value, new_value, slowdown))
+    return regressions
+
+
+def run_benchmarks(archs, n_images, batch_sizes, postprocess_sizes, dogfile, repeats):
+    """
+    Runs every benchmark and returns the results as a nested dictionary.
+    """
+    results = {'latency': {}, 'throughput': {}}
+    with tempfile.TemporaryDirectory(prefix='benchmark_images_') as folder:
+        img_paths = make_synthetic_jpegs(folder, n_images)
+        print(f"Decoding {len(img_paths)} synthetic JPEGs...")
+        results['decode'] = benchmark_decode(img_paths)
+        for arch in archs:
+            name = random_weights_name(arch)
+            print(f"Benchmarking {arch} (random weights)...")
+            models[name]  # Build the model before timing
+            results['latency'][arch] = benchmark_latency(name, img_paths, repeats=repeats)
+            results['throughput'][arch] = benchmark_throughput(name, batch_sizes)
+            models.unload(name)
+    print("Benchmarking post-processing...")
+    results['postprocess'] = benchmark_postprocess(postprocess_sizes, dogfile)
+    return results
+
+
+def main():
+    """
+    Runs the benchmarks, saves them as JSON and compares them with a baseline.
+    """
+    parser = argparse.ArgumentParser(description="Offline speed benchmarks of the pipeline.")
+    parser.add_argument('--arch', type=str, default='resnet,alexnet,vgg',
+                        help="CNN model architectures to benchmark, separated by commas.")
+    parser.add_argument('--images', type=int, default=32,
+                        help="Number of synthetic JPEGs to decode. Default is 32.")
+    parser.add_argument('--batch_sizes', type=str, default='1,8,32',
+                        help="Batch sizes for the throughput benchmark. Default is '1,8,32'.")
+    parser.add_argument('--sizes', type=str, default='10000,100000,1000000',
+                        help="Numbers of synthetic results for the post-processing benchmark.")
+    parser.add_argument('--repeats', type=int, default=20,
+                        help="Timed single images per model. Default is 20.")
+    parser.add_argument('--dogfile', type=str, default='dognames.txt',
+                        help="File containing dog names. Default is 'dognames.txt'.")
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help="JSON file to save the results to.")
+    parser.add_argument('--baseline', type=str, default=None,
+                        help="JSON file of an earlier run to compare against.")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed slowdown against the baseline (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    archs = [arch.strip() for arch in args.arch.split(',') if arch.strip()]
+    results = run_benchmarks(
+        archs, args.images, [int(size) for size in args.batch_sizes.split(',')],
+        [int(size) for size in args.sizes.split(',')], args.dogfile, args.repeats)
+
+    report = {
+        'created': time(),
+        'machine': {
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'torch_threads': torch.get_num_threads(),
+            'torch_version': torch.__version__,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    print(f"\n*** Benchmark Results (saved to {args.output}) ***")
+    for name, value in flatten(results).items():
+        print(f"{name:55}: {value:12.2f}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n*** {len(regressions)} regression(s) beyond {args.threshold * 100.0:.0f}% ***")
+            for name, old_value, new_value, slowdown in regressions:
+                print(f"{name:55}: {old_value:10.2f} -> {new_value:10.2f} "
+                      f"({slowdown * 100.0:.0f}% slower)")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold * 100.0:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
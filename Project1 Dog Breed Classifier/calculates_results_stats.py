@@ -36,8 +36,35 @@
 #            pct_correct_dogs - percentage of correctly classified dogs
 #            pct_correct_breed - percentage of correctly classified dog breeds
 #            pct_correct_notdogs - percentage of correctly classified NON-dogs
+#          All counts are computed with vectorized NumPy reductions over the
+#          match and is-a-dog columns of the results.
+#          The class ResultsStatsAccumulator keeps the same counts (plus how
+#          often each dog breed was classified as each label) and can be
+#          updated one batch of results at a time, merged with the
+#          accumulators of other processes or machines, and saved as JSON.
 #
 ##
+from collections import Counter  # For the per-breed confusion counts
+import json  # To save and load accumulators
+import numpy as np  # For vectorized counting over the results
+from results_table import ResultsTable  # Column-based results dictionary
+
+
+def result_flags(results_dic):
+    """
+    Returns the match, is-pet-dog and is-classifier-dog flags of every image
+    as three boolean NumPy arrays.
+    """
+    if isinstance(results_dic, ResultsTable):
+        return (results_dic.match == 1, results_dic.is_pet_dog == 1,
+                results_dic.is_classifier_dog == 1)
+
+    # A dictionary of lists: gather indexes 2, 3 and 4 of every list
+    flags = np.array([value[2:5] for value in results_dic.values()], dtype=np.int8)
+    flags = flags.reshape(-1, 3) == 1
+    return flags[:, 0], flags[:, 1], flags[:, 2]
+
+
 # TODO 5: Define calculates_results_stats function below, please be certain to replace None
 #       in the return statement with the results_stats_dic dictionary that you create 
 #       with this function
@@ -47,39 +74,43 @@ def calculates_results_stats(results_dic):
     Calculates statistics based on the results of the program run using the 
     classifier's model. Creates a dictionary with counts and percentages.
     """
-    # Create variables to store counts
-    n_images = len(results_dic)  # Total number of images
-    n_dogs_img = 0  # Count of dog images
-    n_notdogs_img = 0  # Count of non-dog images
-    n_match = 0  # Count of correct matches
-    n_correct_dogs = 0  # Count of correctly identified dog images
-    n_correct_notdogs = 0  # Count of correctly identified non-dog images
-    n_correct_breed = 0  # Count of correct dog breeds
-
-    # Loop through the dictionary
-    for key, value in results_dic.items():
-        # Check if the pet label matches the classifier label
-        if value[2] == 1:  # 1 means it's a match
-            n_match += 1
-        
-        # Check if the image is a dog and classified correctly
-        if value[3] == 1 and value[4] == 1:  # Both pet and classifier agree it's a dog
-            n_correct_dogs += 1
-        
-        # Check if the image is NOT a dog and classified correctly
-        if value[3] == 0 and value[4] == 0:  # Both pet and classifier agree it's not a dog
-            n_correct_notdogs += 1
-        
-        # Check if the breed of the dog is correct
-        if value[3] == 1 and value[2] == 1:  # It's a dog and labels match
-            n_correct_breed += 1
-        
-        # Count the total number of dog images
-        if value[3] == 1:  # 1 means it's a dog image
-            n_dogs_img += 1
-
-    # Calculate the number of non-dog images
-    n_notdogs_img = n_images - n_dogs_img  # Total images minus dog images
+    # Get the flags of all images as arrays
+    match, is_pet_dog, is_classifier_dog = result_flags(results_dic)
+
+    # Count everything and turn the counts into the statistics dictionary
+    return stats_from_counts(**count_flags(match, is_pet_dog, is_classifier_dog))
+
+
+def count_flags(match, is_pet_dog, is_classifier_dog):
+    """
+    Counts the images, dog images, matches and correct classifications in
+    the boolean flag arrays of some images.
+
+    Returns:
+        dict: n_images, n_dogs_img, n_match, n_correct_dogs,
+              n_correct_notdogs and n_correct_breed.
+    """
+    # Count everything with vectorized reductions
+    return {
+        'n_images': len(match),  # Total number of images
+        'n_dogs_img': int(is_pet_dog.sum()),  # Count of dog images
+        'n_match': int(match.sum()),  # Count of correct matches
+        # Both pet and classifier agree it's a dog
+        'n_correct_dogs': int((is_pet_dog & is_classifier_dog).sum()),
+        # Both pet and classifier agree it's not a dog
+        'n_correct_notdogs': int((~is_pet_dog & ~is_classifier_dog).sum()),
+        # It's a dog and labels match
+        'n_correct_breed': int((is_pet_dog & match).sum()),
+    }
+
+
+def stats_from_counts(n_images, n_dogs_img, n_match, n_correct_dogs, n_correct_notdogs,
+                      n_correct_breed):
+    """
+    Creates the results statistics dictionary (counts and percentages) from
+    the counts made by count_flags.
+    """
+    n_notdogs_img = n_images - n_dogs_img  # Count of non-dog images
 
     # Create a dictionary to store the statistics
     results_stats_dic = {}
@@ -120,3 +151,112 @@ def calculates_results_stats(results_dic):
 
     # Return the results statistics dictionary
     return results_stats_dic
+
+
+class ResultsStatsAccumulator:
+    """
+    Running results statistics that can be updated batch by batch and merged.
+
+    Keeps the counts behind results_stats_dic and, for every dog image, how
+    often its breed (pet label) was classified as each classifier label.
+    Merging is associative and order doesn't matter, so accumulators from
+    several workers, shards or machines can be combined in any grouping.
+    """
+
+    # Version of the saved format (see to_json)
+    FORMAT_VERSION = 1
+
+    def __init__(self):
+        self.counts = {'n_images': 0, 'n_dogs_img': 0, 'n_match': 0, 'n_correct_dogs': 0,
+                       'n_correct_notdogs': 0, 'n_correct_breed': 0}
+        self.confusion = Counter()  # (pet label, classifier label) of dog images -> count
+
+    def update(self, results_dic, rows=None):
+        """
+        Adds a batch of finished results (with the is-a-dog flags, see
+        adjust_results4_isadog), or only the given rows of a ResultsTable.
+        Returns the accumulator.
+        """
+        match, is_pet_dog, is_classifier_dog = result_flags(results_dic)
+        rows = slice(None) if rows is None else np.asarray(rows, dtype=np.int64)
+        match, is_pet_dog, is_classifier_dog = match[rows], is_pet_dog[rows], is_classifier_dog[rows]
+        for name, count in count_flags(match, is_pet_dog, is_classifier_dog).items():
+            self.counts[name] += count
+
+        if isinstance(results_dic, ResultsTable):
+            # Count each (pet label code, classifier label code) pair of the
+            # dog images at once, then turn the codes back into labels
+            pairs = np.stack([results_dic.pet_label_codes[rows][is_pet_dog],
+                              results_dic.classifier_label_codes[rows][is_pet_dog]], axis=1)
+            if len(pairs):
+                unique_pairs, pair_counts = np.unique(pairs, axis=0, return_counts=True)
+                for (pet_code, classifier_code), count in zip(unique_pairs.tolist(),
+                                                              pair_counts.tolist()):
+                    self.confusion[(results_dic.labels[pet_code],
+                                    results_dic.labels[classifier_code])] += count
+        else:
+            for value, pet_dog in zip(results_dic.values(), is_pet_dog):
+                if pet_dog:
+                    self.confusion[(value[0], value[1])] += 1
+        return self
+
+    def merge(self, other):
+        """Adds the counts of another accumulator to this one. Returns this one."""
+        for name, count in other.counts.items():
+            self.counts[name] += count
+        self.confusion.update(other.confusion)
+        return self
+
+    def subtract(self, other):
+        """
+        Takes the counts of another accumulator out of this one (e.g. the
+        old results of images that are classified again). Returns this one.
+        """
+        for name, count in other.counts.items():
+            self.counts[name] -= count
+        self.confusion.subtract(other.confusion)
+        self.confusion = +self.confusion  # Drop the pairs that reached zero
+        return self
+
+    @classmethod
+    def merge_all(cls, accumulators):
+        """Returns a new accumulator holding the sum of several accumulators."""
+        total = cls()
+        for accumulator in accumulators:
+            total.merge(accumulator)
+        return total
+
+    def results_stats(self):
+        """Returns the results statistics dictionary (same as calculates_results_stats)."""
+        return stats_from_counts(**self.counts)
+
+    def breed_confusion(self):
+        """
+        Returns dog breed (pet label) -> Counter of the classifier labels it
+        was classified as.
+        """
+        by_breed = {}
+        for (pet_label, classifier_label), count in self.confusion.items():
+            by_breed.setdefault(pet_label, Counter())[classifier_label] += count
+        return by_breed
+
+    def to_json(self):
+        """Returns the accumulator as a compact JSON string."""
+        return json.dumps({
+            'version': self.FORMAT_VERSION,
+            'counts': self.counts,
+            'confusion': [[pet_label, classifier_label, count]
+                          for (pet_label, classifier_label), count in sorted(self.confusion.items())],
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        """Creates an accumulator from a string made by to_json."""
+        saved = json.loads(text)
+        if saved.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unknown results statistics format version {saved.get('version')}")
+        accumulator = cls()
+        accumulator.counts.update(saved['counts'])
+        for pet_label, classifier_label, count in saved['confusion']:
+            accumulator.confusion[(pet_label, classifier_label)] += count
+        return accumulator
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/cascade.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Create a "cascade" model that runs the cheapest CNN model first
+#          and only sends the images it isn't confident about to the next,
+#          more expensive model: AlexNet -> ResNet-18 -> VGG-16 by default.
+#          Confidence is the softmax probability of the predicted class; an
+#          image stays with a model when its confidence is at least that
+#          model's threshold. The last model answers every image left.
+#          The cascade is registered with the classifier as 'cascade', so it
+#          can be used like any other architecture (e.g. --arch cascade). It
+#          only keeps the names of its stages and asks the registry for each
+#          stage model when it runs, so the stage weights are held (and
+#          counted against the memory cap) once, by the registry.
+#          Run as a script to calibrate the thresholds on a folder of
+#          labelled pet images: the cheapest thresholds whose accuracy is
+#          within --max_drop of the last model alone are saved to cascade.json.
+#
+# Usage: python cascade.py --dir pet_images --max_drop 0.01
+#
+##
+import argparse  # For the command line arguments of the calibration
+from itertools import product  # To try every combination of thresholds
+import json  # To save and load the thresholds
+import os  # To find the images and the thresholds file
+from time import time  # To measure the cost of each model
+import numpy as np  # For the calibration search
+import torch  # For the cascade model
+from classifier import models, predict_confidences, register_model  # The models
+from get_pet_labels import scan_pet_images  # Labelled images for calibration
+from image_pipeline import iter_image_batches  # Decodes images into batches
+from breed_matcher import get_breed_matcher  # To check predictions against pet labels
+
+# File where the calibrated thresholds are saved
+DEFAULT_CASCADE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cascade.json')
+
+# (model, threshold) of each stage, cheapest first. The last stage has no
+# threshold because it answers every image that reaches it.
+DEFAULT_STAGES = [('alexnet', 0.90), ('resnet', 0.80), ('vgg', None)]
+
+# Thresholds tried by the calibration
+CALIBRATION_GRID = np.round(np.arange(0.0, 1.0001, 0.05), 2)
+
+
+class CascadeModel(torch.nn.Module):
+    """
+    Runs images through the stages of a cascade, keeping each image's output
+    from the first model that is confident enough about it. The stage models
+    are looked up in the registry on every call, not kept by the cascade.
+
+    Parameters:
+        stages (list): (model name, threshold) of each stage, cheapest first.
+                       The threshold of the last stage is ignored.
+    """
+
+    def __init__(self, stages):
+        super().__init__()
+        self.archs = [arch for arch, threshold in stages]
+        self.thresholds = [threshold for arch, threshold in stages[:-1]] + [None]
+        self.images_per_stage = [0] * len(stages)  # Images answered by each stage so far
+
+    def forward(self, img_batch):
+        outputs = None
+        remaining = torch.arange(len(img_batch))  # Images no stage has answered yet
+        for stage, arch in enumerate(self.archs):
+            stage_batch = img_batch[remaining]
+            if models.uses_channels_last(arch):
+                stage_batch = stage_batch.contiguous(memory_format=torch.channels_last)
+            stage_outputs = models[arch](stage_batch)
+            if outputs is None:
+                outputs = stage_outputs.clone()
+            else:
+                outputs[remaining] = stage_outputs
+
+            threshold = self.thresholds[stage]
+            if threshold is None:
+                self.images_per_stage[stage] += len(remaining)
+                break
+            # Keep the images this model is confident about, pass on the rest
+            confidences = torch.softmax(stage_outputs, dim=1).max(dim=1).values
+            confident = confidences >= threshold
+            self.images_per_stage[stage] += int(confident.sum())
+            remaining = remaining[~confident]
+            if len(remaining) == 0:
+                break
+        return outputs
+
+    def summary(self):
+        """Returns a line with the share of images answered by each stage."""
+        total = sum(self.images_per_stage) or 1
+        return ', '.join(f"{arch} {count / total * 100.0:.1f}%"
+                         for arch, count in zip(self.archs, self.images_per_stage))
+
+
+def load_cascade_stages(path=DEFAULT_CASCADE_FILE):
+    """
+    Returns the stages saved by the calibration in path, or DEFAULT_STAGES
+    if there's no such file.
+    """
+    if not path or not os.path.exists(path):
+        return list(DEFAULT_STAGES)
+    with open(path) as cascade_file:
+        saved = json.load(cascade_file)
+    return [(stage['arch'], stage['threshold']) for stage in saved['stages']]
+
+
+def register_cascade(stages=DEFAULT_STAGES, name='cascade'):
+    """
+    Registers a cascade of registered models as a model of its own.
+
+    Parameters:
+        stages (list): (model name, threshold) of each stage, cheapest first.
+        name (str): Name to register the cascade under.
+
+    Returns:
+        str: The registry name of the cascade.
+    """
+    stages = [(arch, threshold) for arch, threshold in stages]
+    # The cascade's predictions depend on every stage's weights and threshold
+    weights_id = 'cascade/' + '/'.join(f"{arch}@{models.fingerprint(arch)}>{threshold}"
+                                       for arch, threshold in stages)
+    register_model(name, lambda pretrained: CascadeModel(stages), weights_id=weights_id)
+    return name
+
+
+def calibration_predictions(img_paths, archs, batch_size=32, workers=0):
+    """
+    Runs every model on every image.
+
+    Returns:
+        tuple: (class_ids, confidences, seconds_per_image), each a dictionary
+               with one entry per model (arrays in image order).
+    """
+    class_ids = {arch: [] for arch in archs}
+    confidences = {arch: [] for arch in archs}
+    seconds = {arch: 0.0 for arch in archs}
+    for img_batch in iter_image_batches(img_paths, batch_size, workers):
+        for arch in archs:
+            models[arch]  # Build the model before timing inference
+            start_time = time()
+            batch_class_ids, batch_confidences = predict_confidences(img_batch, arch)
+            seconds[arch] += time() - start_time
+            class_ids[arch].extend(batch_class_ids)
+            confidences[arch].extend(batch_confidences)
+    n_images = max(len(img_paths), 1)
+    return ({arch: np.array(class_ids[arch]) for arch in archs},
+            {arch: np.array(confidences[arch]) for arch in archs},
+            {arch: seconds[arch] / n_images for arch in archs})
+
+
+def simulate_cascade(thresholds, correct, confidences, costs):
+    """
+    Works out how a cascade would do from each model's own predictions.
+
+    Parameters:
+        thresholds (tuple): Threshold of every stage but the last.
+        correct (list): Per stage, boolean array of correct predictions.
+        confidences (list): Per stage, array of confidences.
+        costs (list): Per stage, seconds per image.
+
+    Returns:
+        tuple: (accuracy, seconds per image, share of images answered per stage)
+    """
+    n_images = len(correct[0])
+    remaining = np.ones(n_images, dtype=bool)
+    n_correct = 0
+    seconds = 0.0
+    answered = []
+    for stage in range(len(correct)):
+        seconds += remaining.sum() * costs[stage]
+        if stage < len(thresholds):
+            accept = remaining & (confidences[stage] >= thresholds[stage])
+        else:
+            accept = remaining
+        n_correct += int(correct[stage][accept].sum())
+        answered.append(int(accept.sum()) / n_images)
+        remaining &= ~accept
+    return n_correct / n_images, seconds / n_images, answered
+
+
+def calibrate(image_dir, archs, max_drop=0.01, batch_size=32, workers=0):
+    """
+    Picks the cheapest thresholds whose accuracy is at most max_drop below
+    the accuracy of the last (most expensive) model alone.
+
+    Parameters:
+        image_dir (str): Folder of labelled pet images (label in the filename).
+        archs (list): Models of the cascade, cheapest first.
+        max_drop (float): Accepted accuracy loss (0.01 = 1 percentage point).
+        batch_size (int): Images per forward pass.
+        workers (int): Processes decoding images.
+
+    Returns:
+        dict: 'stages', 'accuracy', 'seconds_per_image', 'answered' and
+              the accuracy and cost of each model alone ('models').
+    """
+    images = list(scan_pet_images(image_dir))
+    if not images:
+        raise ValueError(f"No images found in {image_dir}")
+    img_paths = [os.path.join(image_dir, filename) for filename, pet_label in images]
+    pet_labels = [pet_label for filename, pet_label in images]
+    class_ids, confidences, costs = calibration_predictions(img_paths, archs, batch_size, workers)
+
+    # A prediction is correct when it matches the pet label
+    matcher = get_breed_matcher()
+    correct = [matcher.match_batch(pet_labels, class_ids[arch]).astype(bool) for arch in archs]
+    confidences = [confidences[arch] for arch in archs]
+    costs = [costs[arch] for arch in archs]
+    target = correct[-1].mean() - max_drop
+
+    # Try every combination of thresholds; keep the cheapest that reaches
+    # the target (or the most accurate if none does)
+    best = None
+    for thresholds in product(CALIBRATION_GRID, repeat=len(archs) - 1):
+        accuracy, seconds, answered = simulate_cascade(thresholds, correct, confidences, costs)
+        key = (accuracy < target, seconds if accuracy >= target else -accuracy)
+        if best is None or key < best[0]:
+            best = (key, thresholds, accuracy, seconds, answered)
+    key, thresholds, accuracy, seconds, answered = best
+
+    return {
+        'stages': [{'arch': arch, 'threshold': float(threshold) if threshold is not None else None}
+                   for arch, threshold in zip(archs, list(thresholds) + [None])],
+        'accuracy': accuracy,
+        'seconds_per_image': seconds,
+        'answered': dict(zip(archs, answered)),
+        'models': {arch: {'accuracy': float(arch_correct.mean()), 'seconds_per_image': cost}
+                   for arch, arch_correct, cost in zip(archs, correct, costs)},
+        'images': len(images),
+    }
+
+
+def main():
+    """
+    Calibrates the cascade thresholds on a folder of labelled images.
+    """
+    parser = argparse.ArgumentParser(description="Calibrates the cascade thresholds.")
+    parser.add_argument('--dir', type=str, default='pet_images',
+                        help="Folder of labelled pet images. Default is 'pet_images'.")
+    parser.add_argument('--arch', type=str, default='alexnet,resnet,vgg',
+                        help="Models of the cascade, cheapest first. Default is 'alexnet,resnet,vgg'.")
+    parser.add_argument('--max_drop', type=float, default=0.01,
+                        help="Accepted accuracy loss against the last model alone. Default is 0.01.")
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help="Number of images per forward pass. Default is 32.")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Number of processes decoding images. Default is 0.")
+    parser.add_argument('--output', type=str, default=DEFAULT_CASCADE_FILE,
+                        help="File to save the thresholds to.")
+    args = parser.parse_args()
+
+    archs = [arch.strip() for arch in args.arch.split(',') if arch.strip()]
+    report = calibrate(args.dir, archs, args.max_drop, args.batch_size, args.workers)
+    with open(args.output, 'w') as cascade_file:
+        json.dump(report, cascade_file, indent=2)
+
+    print(f"\n*** Cascade Calibration on {report['images']} images from {args.dir} ***")
+    for arch, arch_report in report['models'].items():
+        print(f"{arch:>10} alone: accuracy {arch_report['accuracy'] * 100.0:5.1f}%, "
+              f"{arch_report['seconds_per_image'] * 1000.0:.1f} ms per image")
+    stages = ' -> '.join(f"{stage['arch']} ({stage['threshold']})" if stage['threshold'] is not None
+                         else stage['arch'] for stage in report['stages'])
+    print(f"   cascade: accuracy {report['accuracy'] * 100.0:5.1f}%, "
+          f"{report['seconds_per_image'] * 1000.0:.1f} ms per image")
+    print(f"Stages: {stages}")
+    print("Answered by: " + ', '.join(f"{arch} {share * 100.0:.1f}%"
+                                      for arch, share in report['answered'].items()))
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,18 +12,47 @@
 from time import time, sleep  # To measure program runtime and for delays
 from print_functions_for_lab_checks import *  # To debug and test functions
 from get_input_args import get_input_args  # For getting input arguments
-from get_pet_labels import get_pet_labels  # To get pet labels from filenames
-from classify_images import classify_images  # To classify pet images
+from get_pet_labels import get_pet_labels, scan_pet_images  # To get pet labels from filenames
+from classify_images import classify_images_multi  # To classify pet images with one or more models
 from adjust_results4_isadog import adjust_results4_isadog  # To check dog status
-from calculates_results_stats import calculates_results_stats  # To calculate stats
-from print_results import print_results  # To print final program output
+from calculates_results_stats import calculates_results_stats, ResultsStatsAccumulator  # To calculate stats
+from print_results import print_results, print_comparison, print_progress, print_breed_confusion  # To print program output
+from prediction_cache import PredictionCache  # To reuse predictions from earlier runs
+from run_metrics import RunMetrics  # To time each stage and write a metrics file
+from breed_matcher import get_breed_matcher  # Matches pet labels to predicted classes
+from quantize_models import register_int8_model  # For --precision int8
+from compiled_models import register_compiled_model  # For --compile
+from cpu_profile import apply_cpu_profile, load_cpu_profile  # For --cpu_profile
+from classifier_client import ClassifierClient  # For --server
+from cascade import load_cascade_stages, register_cascade  # For --arch cascade
+from classifier import models, PREPROCESS_VERSION  # Cascade report and stored run details
+from model_pool import ModelPool  # For --pool_workers
+from results_store import ResultsStore  # For --results_db
+from watch_folder import watch  # For --watch
+from sharding import parse_shard, select_shard, iter_shard, shard_file_path, write_shard_file  # For --shard
+from image_pack import is_image_pack  # Image packs already hold their pet labels
+from results_table import ResultsTable  # Column-based results filled in as the folder is scanned
+
+def model_version(arch, in_arg):
+    """
+    Returns the registry name of the version of a model chosen by the
+    --precision and --compile arguments (e.g. 'vgg', 'vgg:int8' or 'vgg:jit').
+    """
+    if in_arg.precision == 'int8':
+        # Use the int8 quantized version of the model (e.g. 'vgg:int8')
+        arch = register_int8_model(arch)
+    if in_arg.compile:
+        # Use the frozen TorchScript version of the model (e.g. 'vgg:jit')
+        arch = register_compiled_model(arch)
+    return arch
+
 
 def main():
     """
     This is the main function that runs the whole program. It has steps:
     1. Read arguments from the user (like directory and model type).
     2. Get labels for pet images.
-    3. Use CNN model to classify the images.
+    3. Use one or more CNN models to classify the images.
     4. Check if the labels belong to a dog or not.
     5. Calculate how well the model performed (accuracy and percentages).
     6. Print the results in a nice format.
@@ -31,6 +60,7 @@ def main():
 
     # Step 1: Start time tracking for the program
     start_time = time()  # Note the current time to calculate total runtime later
+    metrics = RunMetrics()  # Times each stage and the batch latencies
 
     # Step 2: Get input arguments from the user
     # User specifies the directory, CNN model, and dog file
@@ -40,42 +70,174 @@ def main():
     print("Arguments received from the user:", in_arg)  # Print arguments to debug
     check_command_line_arguments(in_arg)  # Another debugging tool
 
+    # Apply the tuned CPU threads, core pinning and memory format (if tuned)
+    cpu_profile = load_cpu_profile(in_arg.cpu_profile)
+    if cpu_profile is not None:
+        apply_cpu_profile(cpu_profile)
+        print(f"CPU profile: {cpu_profile}")
+
     # Step 3: Create results dictionary for pet labels
-    results = get_pet_labels(in_arg.dir)  # Extract labels from filenames
+    # A folder is scanned while its images are classified: the scanner's
+    # (filename, pet label) pairs go straight to classify_images_multi,
+    # which adds them to the results batch by batch. An image pack already
+    # holds every label, so it's read at once.
+    if is_image_pack(in_arg.dir):
+        with metrics.stage('get_pet_labels'):
+            results = get_pet_labels(in_arg.dir, in_arg.recursive)  # Extract labels from the pack
+        images = None
+    else:
+        results = ResultsTable()  # Filled in as the folder is scanned
+        images = scan_pet_images(in_arg.dir, in_arg.recursive)
+
+    # With --shard i/N, keep only this shard's images (the same split in
+    # every shard process, see sharding.py)
+    if in_arg.shard:
+        shard_index, n_shards = parse_shard(in_arg.shard)
+        if images is None:
+            results, shard_rows = select_shard(results, shard_index, n_shards)
+        else:
+            shard_rows = []  # Filled in as the scan goes
+            images = iter_shard(images, shard_index, n_shards, shard_rows)
+
+    # Step 4: Classify the images using the selected CNN model(s)
+    # Several models can be given as --arch resnet,alexnet,vgg. Each image is
+    # then decoded once and run through every model, with one results
+    # dictionary per model. Images found in the prediction cache (if one is
+    # given) are not classified again.
+    archs = []
+    # The cascade's models, cheapest first, with the calibrated thresholds
+    cascade_stages = [(model_version(stage_arch, in_arg), threshold) for
+                      stage_arch, threshold in load_cascade_stages(in_arg.cascade)]
+    for arch in (arch.strip() for arch in in_arg.arch.split(',')):
+        if arch == 'cascade':
+            archs.append(register_cascade(cascade_stages))
+        elif arch:
+            archs.append(model_version(arch, in_arg))
+    results_by_arch = {arch: results.copy() for arch in archs}
+    cache = PredictionCache(in_arg.cache, in_arg.cache_size) if in_arg.cache else None
+    # The original substring check, or whole-word matching (with plurals) if asked for
+    if in_arg.match == 'word':
+        matcher = get_breed_matcher(whole_word=True, plurals=True)
+    else:
+        matcher = get_breed_matcher(whole_word=False, plurals=False)
+    # With --server, a running classifier server (with warm models) classifies the
+    # images; a cascade's stages and thresholds are sent along with its images
+    client = ClassifierClient(in_arg.server, cascade_stages=cascade_stages) if in_arg.server else None
+    # With --pool_workers, worker processes sharing one copy of the weights run the models
+    pool = None
+    if in_arg.pool_workers > 0 and client is None:
+        pool = ModelPool(archs, in_arg.pool_workers, in_arg.pool_threads or None)
+        print(f"Model pool: {pool.workers} workers with {pool.threads_per_worker} threads each")
+
+    # With --results_db, every model's per-image results are stored for later queries
+    store = ResultsStore(in_arg.results_db) if in_arg.results_db else None
 
-    # Debug: Check if pet labels are correctly created
-    print("Labels generated for images:")  # Debugging: Print pet labels
-    for key, value in results.items():
-        print(f"File: {key}, Label: {value}")  # Print each label for clarity
-    check_creating_pet_image_labels(results)
+    # With --watch, keep classifying images as they arrive instead of one pass
+    if in_arg.watch:
+        watch(in_arg.dir, archs, in_arg.dogfile, in_arg.checkpoint, store, in_arg.batch_size,
+              cache, matcher, client, pool, in_arg.recursive, in_arg.watch_interval,
+              metrics=metrics)
+        for resource in (pool, store, cache):
+            if resource is not None:
+                resource.close()
+        # Write the metrics of everything classified before watching stopped
+        if in_arg.metrics:
+            metrics.write_json(in_arg.metrics)
+        return
 
-    # Step 4: Classify the images using the selected CNN model
-    classify_images(in_arg.dir, results, in_arg.arch)
+    # Running statistics of each model, updated as every batch finishes
+    accumulators = {arch: ResultsStatsAccumulator() for arch in archs}
+    # With --results_db, each model's run is started now and filled in batch by batch
+    run_ids = {}
+    if store is not None:
+        for arch in archs:
+            run_ids[arch] = store.start_run(arch, models.fingerprint(arch), PREPROCESS_VERSION,
+                                            in_arg.dir, in_arg.dogfile)
 
-    # Debug: Verify if classifications are added to results dictionary
-    print("\nClassification results added to the dictionary.")  # Debug statement
-    check_classifying_images(results)
+    finish_seconds = []  # Time spent in finish_batch, timed under its own stages
 
-    # Step 5: Adjust results for 'is-a-dog' checks
-    adjust_results4_isadog(results, in_arg.dogfile)
+    def finish_batch(arch, indexes, amortized_ms):
+        # Fill in the is-a-dog flags of a finished batch, store it and print
+        # the running statistics of its model
+        finish_start = time()
+        with metrics.stage('adjust_results4_isadog'):
+            adjust_results4_isadog(results_by_arch[arch], in_arg.dogfile, rows=indexes)
+        if store is not None:
+            with metrics.stage('store_results'):
+                store.add_results(run_ids[arch], results_by_arch[arch], [amortized_ms] * len(indexes),
+                                  rows=indexes)
+        with metrics.stage('calculates_results_stats'):
+            accumulators[arch].update(results_by_arch[arch], rows=indexes)
+        with metrics.stage('print_progress'):
+            # (The total isn't known yet while the folder is still being scanned)
+            print_progress(accumulators[arch], arch, len(results_by_arch[arch]) if images is None else None)
+        finish_seconds.append(time() - finish_start)
 
-    # Debug: Ensure dog status flags are properly added
-    print("\nChecking 'is-a-dog' status adjustments in results.")  # Debug statement
-    for key, value in results.items():
-        print(f"File: {key}, Pet Label: {value[0]}, Classifier Label: {value[1]}, Is Pet Dog: {value[3]}, Is Classifier Dog: {value[4]}")  # Verbose debug print
-    check_classifying_labels_as_dogs(results)
+    classify_start = time()
+    _, timings = classify_images_multi(
+        in_arg.dir, results_by_arch, in_arg.batch_size, in_arg.workers, in_arg.prefetch,
+        cache, metrics, matcher, client, pool, on_batch=finish_batch, images=images,
+        verbose=in_arg.verbose)
+    # The classify_images stage leaves out the batch work timed in finish_batch
+    metrics.add_time('classify_images', time() - classify_start - sum(finish_seconds))
+    if in_arg.shard:
+        print(f"Shard {shard_index}/{n_shards}: {len(results_by_arch[archs[0]])} images")
 
-    # Step 6: Calculate statistics for classification performance
-    results_stats = calculates_results_stats(results)
+    # Debug: Check if pet labels are correctly created (prints the first 10)
+    check_creating_pet_image_labels(results_by_arch[archs[0]])
+    if pool is not None:
+        pool.close()
+    if cache is not None:
+        print(f"\nPrediction cache: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+    # (With a pool, the cascade counted its images in the workers)
+    if 'cascade' in archs and 'cascade' in models.loaded() and pool is None:
+        print(f"\nCascade answered by: {models['cascade'].summary()}")
 
-    # Debug: Check the stats dictionary for correctness
-    print("\nStatistics calculated for the model:")  # Debugging output
-    for stat, value in results_stats.items():
-        print(f"{stat}: {value}")  # Print each statistic
-    check_calculating_results(results, results_stats)
+    results_stats_by_arch = {}
+    for arch, results in results_by_arch.items():
+        # Debug: Verify if classifications are added to results dictionary
+        print(f"\nClassification results added to the dictionary for {arch}.")  # Debug statement
+        check_classifying_images(results)
 
-    # Step 7: Print the results of the classification
-    print_results(results, results_stats, in_arg.arch, True, True)
+        # Step 5: The 'is-a-dog' flags were filled in as each batch finished
+        # (see finish_batch), from the predicted class ids
+
+        # Debug: Ensure dog status flags are properly added (one line per image with --verbose)
+        print("\nChecking 'is-a-dog' status adjustments in results.")  # Debug statement
+        if in_arg.verbose:
+            for key, value in results.items():
+                print(f"File: {key}, Pet Label: {value[0]}, Classifier Label: {value[1]}, Is Pet Dog: {value[3]}, Is Classifier Dog: {value[4]}")  # Verbose debug print
+        check_classifying_labels_as_dogs(results)
+
+        # Step 6: Calculate statistics for classification performance
+        with metrics.stage('calculates_results_stats'):
+            results_stats = calculates_results_stats(results)
+        results_stats_by_arch[arch] = results_stats
+
+        # Debug: Check the stats dictionary for correctness
+        print("\nStatistics calculated for the model:")  # Debugging output
+        for stat, value in results_stats.items():
+            print(f"{stat}: {value}")  # Print each statistic
+        check_calculating_results(results, results_stats)
+
+        # Step 7: Print the results of the classification
+        with metrics.stage('print_results'):
+            print_results(results, results_stats, arch, True, True)
+            print_breed_confusion(accumulators[arch])
+
+        # Save this shard's results for merge_shards.py
+        if in_arg.shard:
+            write_shard_file(shard_file_path(in_arg.shard_dir, arch, shard_index, n_shards, in_arg.dir),
+                             arch, shard_index, n_shards, results, shard_rows, timings[arch],
+                             in_arg.dir)
+
+    if store is not None:
+        store.close()
+
+    # Compare the models side by side when more than one was used
+    if len(archs) > 1:
+        print_comparison(results_stats_by_arch, timings)
 
     # Step 8: End time tracking and calculate total runtime
     end_time = time()  # Record end time
@@ -87,6 +249,10 @@ def main():
           str(int((tot_time % 3600) / 60)) + ":" +  # Minutes
           str(int((tot_time % 3600) % 60)))  # Seconds
 
+    # Write the machine-readable metrics next to the text report
+    if in_arg.metrics:
+        metrics.write_json(in_arg.metrics)
+
 
 # Call the main function to start the program
 if __name__ == "__main__":
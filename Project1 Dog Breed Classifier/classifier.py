@@ -1,26 +1,423 @@
-import ast  # For safely reading the dictionary from the file
+import hashlib  # To fingerprint model weights
+import numpy as np  # To hand out image crops as arrays
+from collections import OrderedDict  # To remember which models were used most recently
+import threading  # The registry is shared by the server's request and batching threads
+from time import time  # To measure how long a model takes to load
 from PIL import Image  # To open and process images
+from imagenet_labels import load_imagenet_labels  # Precompiled ImageNet label table
 import torchvision.transforms as transforms  # For image transformations like resizing and cropping
-from torch.autograd import Variable  # For wrapping tensors in older PyTorch versions
-import torchvision.models as models  # To load pretrained models
-from torch import __version__  # To check the PyTorch version
+import torchvision  # To tie the pretrained weights to the torchvision version
+import torchvision.models as tv_models  # To load pretrained models
+import torch  # For stacking images into batches and running inference
 
-# Load pretrained CNN models
-# These models are already trained on ImageNet data
-resnet18 = models.resnet18(pretrained=True)  # ResNet-18 model
-alexnet = models.alexnet(pretrained=True)  # AlexNet model
-vgg16 = models.vgg16(pretrained=True)  # VGG-16 model
 
-# Create a dictionary to store models
-# This makes it easy to select a model by its name
-models = {'resnet': resnet18, 'alexnet': alexnet, 'vgg': vgg16}
+class ModelRegistry:
+    """
+    Builds CNN models on demand and keeps them in memory for later calls.
+
+    A model is only created the first time it's asked for, so a run that uses
+    just 'resnet' never pays the load time or memory of 'vgg' and 'alexnet'.
+    If a memory cap is set, the least recently used models are unloaded when
+    the loaded models together grow past the cap. The registry can be used
+    from several threads: its state is changed and read under a lock, and
+    each model is built only once even if several threads ask for it.
+
+    Parameters:
+        max_bytes (int or None): Memory cap in bytes for all loaded models
+                                 (None means no cap).
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes  # Memory cap for loaded models (None = no cap)
+        self._builders = {}  # Model name -> function that builds the model
+        self._weights_ids = {}  # Model name -> fixed id of its weights (or None)
+        self._fingerprints = {}  # Model name -> cached weights fingerprint
+        self._loaded = OrderedDict()  # Model name -> loaded model, oldest use first
+        self.load_seconds = {}  # Model name -> seconds it took to build the model
+        self.channels_last = set()  # Architectures run in channels_last memory format
+        self._lock = threading.RLock()  # Held briefly while the dictionaries change or are read
+        self._build_locks = {}  # Model name -> lock held while that model is built
+
+    def register(self, name, builder, weights_id=None):
+        """
+        Registers an architecture so it can be requested by name.
+
+        Parameters:
+            name (str): The name used to select the model (e.g. 'resnet').
+            builder (callable): Function called as builder(pretrained) that
+                                returns a torch.nn.Module.
+            weights_id (str or None): A fixed id for the weights the builder
+                                      loads. If None, the weights are hashed
+                                      when a fingerprint is needed.
+        """
+        with self._lock:
+            self._builders[name] = builder
+            self._weights_ids[name] = weights_id
+            # Drop any model (and fingerprint) from an older builder with the same name
+            self._loaded.pop(name, None)
+            self._fingerprints.pop(name, None)
+
+    def get(self, name):
+        """
+        Returns the model with the given name, building it on the first request.
+
+        Parameters:
+            name (str): The name of a registered model.
+
+        Returns:
+            torch.nn.Module: The model, already switched to evaluation mode.
+        """
+        if name not in self._builders:
+            raise KeyError(f"Unknown model architecture '{name}'. "
+                           f"Available: {', '.join(self.names())}")
+
+        # Reuse the model if it's already in memory (and mark it as recently used)
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name]
+
+        # One lock per model, so a builder can ask the registry for other
+        # models (a cascade builds its stages) without waiting for itself
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            # Another thread may have built it while we waited
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    return self._loaded[name]
+
+            # Build the model and switch it to evaluation mode once, here
+            start_time = time()
+            model = self._builders[name](True).eval()
+            if self.uses_channels_last(name):
+                model = _to_memory_format(model, torch.channels_last)
+            self.load_seconds[name] = time() - start_time
+
+            with self._lock:
+                self._loaded[name] = model
+                self._enforce_memory_cap()
+        return model
+
+    def build(self, name, pretrained=True):
+        """
+        Builds a fresh copy of a registered model without keeping it in the
+        registry (e.g. to derive a quantized model from it).
+        """
+        return self._builders[name](pretrained).eval()
+
+    def unload(self, name=None):
+        """
+        Removes a model (or every model if name is None) from memory.
+        """
+        with self._lock:
+            if name is None:
+                self._loaded.clear()
+            else:
+                self._loaded.pop(name, None)
+
+    def uses_channels_last(self, name):
+        """
+        True when the model runs in channels_last memory format. Derived
+        models like 'resnet:int8' follow their architecture ('resnet').
+        """
+        return name.split(':')[0] in self.channels_last
+
+    def set_channels_last(self, names):
+        """
+        Sets the architectures that run in channels_last memory format, which
+        is faster on CPU for convolution-heavy networks. Loaded models are
+        converted right away.
+        """
+        with self._lock:
+            self.channels_last = set(names)
+            for name, model in self._loaded.items():
+                memory_format = torch.channels_last if self.uses_channels_last(name) \
+                    else torch.contiguous_format
+                self._loaded[name] = _to_memory_format(model, memory_format)
+
+    def fingerprint(self, name):
+        """
+        Returns a short string that changes whenever the weights of a model
+        change, so stored predictions can be tied to the weights that made them.
+        """
+        if name not in self._fingerprints:
+            hasher = hashlib.sha1()
+            if self._weights_ids.get(name) is not None:
+                # Known weights: the id is enough, no need to load the model
+                hasher.update(self._weights_ids[name].encode())
+            else:
+                # Unknown weights: hash every tensor of the loaded model
+                for key, tensor in self.get(name).state_dict().items():
+                    hasher.update(key.encode())
+                    hasher.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+            self._fingerprints[name] = hasher.hexdigest()[:16]
+        return self._fingerprints[name]
+
+    def names(self):
+        """Returns the names of all registered architectures."""
+        with self._lock:
+            return list(self._builders)
+
+    def loaded(self):
+        """Returns the names of the models currently in memory."""
+        with self._lock:
+            return list(self._loaded)
+
+    def memory_bytes(self, name=None):
+        """
+        Returns the memory used by the parameters and buffers of one loaded
+        model, or of all loaded models if name is None.
+        """
+        with self._lock:
+            loaded = list(self._loaded.values()) if name is None else [self._loaded[name]]
+        total = 0
+        for model in loaded:
+            for tensor in list(model.parameters()) + list(model.buffers()):
+                total += tensor.numel() * tensor.element_size()
+        return total
+
+    def _enforce_memory_cap(self):
+        # Unload the least recently used models until we are under the cap,
+        # but always keep the model that was just requested (called with
+        # self._lock held)
+        if self.max_bytes is None:
+            return
+        while len(self._loaded) > 1 and self.memory_bytes() > self.max_bytes:
+            self._loaded.popitem(last=False)
+
+    # The registry behaves like the old {'resnet': ..., 'alexnet': ..., 'vgg': ...}
+    # dictionary, so existing code using models[model_name] keeps working
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self._builders
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self):
+        return len(self._builders)
+
+
+def _to_memory_format(model, memory_format):
+    # TorchScript models keep the memory format they were compiled with
+    if isinstance(model, torch.jit.ScriptModule):
+        return model
+    return model.to(memory_format=memory_format)
+
+
+# Create the registry with the three CNN models pretrained on ImageNet data.
+# Nothing is loaded here - each model is built the first time it's used.
+models = ModelRegistry()
+models.register('resnet', lambda pretrained: tv_models.resnet18(pretrained=pretrained),  # ResNet-18 model
+                weights_id=f'torchvision-{torchvision.__version__}/resnet18/imagenet')
+models.register('alexnet', lambda pretrained: tv_models.alexnet(pretrained=pretrained),  # AlexNet model
+                weights_id=f'torchvision-{torchvision.__version__}/alexnet/imagenet')
+models.register('vgg', lambda pretrained: tv_models.vgg16(pretrained=pretrained),  # VGG-16 model
+                weights_id=f'torchvision-{torchvision.__version__}/vgg16/imagenet')
+
+
+def register_model(name, builder, weights_id=None):
+    """
+    Makes an extra CNN architecture available to classifier() without
+    editing this module.
+
+    Parameters:
+        name (str): The name used to select the model (e.g. 'densenet').
+        builder (callable): Function called as builder(pretrained) that
+                            returns a torch.nn.Module trained on ImageNet.
+        weights_id (str or None): A fixed id for the weights (see
+                                  ModelRegistry.register).
+    """
+    models.register(name, builder, weights_id)
+
+
+def set_memory_cap(max_mb):
+    """
+    Sets the memory cap (in megabytes) for loaded models. Use None to remove it.
+    """
+    models.max_bytes = None if max_mb is None else int(max_mb * 1024 * 1024)
+    models._enforce_memory_cap()
+
 
 # Load the class labels for ImageNet
-# These are human-readable labels corresponding to model predictions
-with open('imagenet1000_clsid_to_human.txt') as imagenet_classes_file:
-    # Parse the file content into a dictionary
-    # We use ast.literal_eval to make sure the parsing is safe
-    imagenet_classes_dict = ast.literal_eval(imagenet_classes_file.read())
+# These are human-readable labels corresponding to model predictions. The
+# table is precompiled, so this is fast and doesn't depend on the current folder
+imagenet_labels = load_imagenet_labels()
+imagenet_classes_dict = dict(enumerate(imagenet_labels.labels))
+
+# ImageNet's mean and standard deviation of each color channel
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Resize and crop images to the size the CNN models expect. This part of the
+# preprocessing is the same for every model, so image packs store its output.
+crop_transform = transforms.Compose([
+    transforms.Resize(256),  # Resize the image so the shortest side is 256 pixels
+    transforms.CenterCrop(224),  # Crop the image to 224x224 pixels in the center
+])
+
+# Preprocess images to make them compatible with the CNN models
+# The transformations are based on what the models expect
+preprocess = transforms.Compose(crop_transform.transforms + [
+    transforms.ToTensor(),  # Convert the image to a PyTorch tensor (required for models)
+    transforms.Normalize(  # Normalize using ImageNet's mean and standard deviation
+        mean=IMAGENET_MEAN,
+        std=IMAGENET_STD
+    )
+])
+
+# Version of the preprocessing above. Change it whenever the preprocessing
+# changes, so predictions stored for the old version are not reused.
+PREPROCESS_VERSION = 'jpeg-draft256-resize256-crop224-imagenet-norm/2'
+
+# JPEGs are decoded at a reduced size whose short side is at least this many
+# pixels (the size Resize scales the short side to anyway)
+DECODE_MIN_SIZE = 256
+
+# Use inference_mode when this PyTorch version has it, otherwise no_grad
+inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
+
+def decode_image(img_pil, draft=True):
+    """
+    Decodes an opened image as RGB.
+
+    With draft=True a JPEG is decoded at 1/2, 1/4 or 1/8 of its size (scaled
+    down by the JPEG decoder itself, which is much faster than decoding every
+    pixel and resizing afterwards), choosing the smallest size whose short
+    side is still at least DECODE_MIN_SIZE pixels. Other formats and small
+    JPEGs are decoded normally.
+
+    Parameters:
+        img_pil (PIL.Image): An image opened with Image.open (not yet decoded).
+        draft (bool): Whether to use the reduced-size JPEG decoding.
+
+    Returns:
+        PIL.Image: The decoded RGB image.
+    """
+    if draft and img_pil.format == 'JPEG':
+        img_pil.draft('RGB', (DECODE_MIN_SIZE, DECODE_MIN_SIZE))
+    return img_pil.convert('RGB')
+
+
+def load_image_tensor(img_path, draft=True):
+    """
+    Opens an image and preprocesses it into a [C, H, W] tensor for the models.
+    draft=False decodes JPEGs at full size (see decode_image).
+    """
+    with Image.open(img_path) as img_pil:
+        return preprocess(decode_image(img_pil, draft))
+
+
+def load_image_crop(img_path, draft=True):
+    """
+    Opens an image and resizes and crops it to 224x224, without converting it
+    to a tensor. Returns the crop as a [H, W, C] uint8 NumPy array.
+    """
+    with Image.open(img_path) as img_pil:
+        return np.asarray(crop_transform(decode_image(img_pil, draft)))
+
+
+def crops_to_tensor(crops):
+    """
+    Turns a batch of crops from load_image_crop into the normalized batch the
+    models expect. Gives the same numbers as preprocess.
+
+    Parameters:
+        crops (torch.Tensor): uint8 crops stacked as an [N, H, W, C] tensor.
+
+    Returns:
+        torch.Tensor: A float [N, C, H, W] batch.
+    """
+    # Same steps as ToTensor and Normalize, on the whole batch at once
+    img_batch = crops.permute(0, 3, 1, 2).float().div_(255)
+    mean = torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)
+    std = torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+    return img_batch.sub_(mean).div_(std)
+
+
+def model_outputs(img_batch, model_name):
+    """
+    Runs a batch of preprocessed images through a model in one forward pass
+    and returns the raw output scores, an [N, 1000] tensor.
+    """
+    model = models[model_name]
+    if models.uses_channels_last(model_name):
+        # Match the memory format of the model's weights
+        img_batch = img_batch.contiguous(memory_format=torch.channels_last)
+    with inference_mode():
+        return model(img_batch)
+
+
+def predict_tensors(img_batch, model_name):
+    """
+    Runs a batch of preprocessed images through a model in one forward pass.
+
+    Parameters:
+        img_batch (torch.Tensor): Images stacked as an [N, C, H, W] tensor.
+        model_name (str): The name of the model to use ('resnet', 'alexnet', or 'vgg').
+
+    Returns:
+        list: The predicted ImageNet class index for each image, in input order.
+    """
+    return model_outputs(img_batch, model_name).argmax(dim=1).tolist()
+
+
+def predict_confidences(img_batch, model_name):
+    """
+    Like predict_tensors, but also returns how confident the model is: the
+    softmax probability of each predicted class (between 0 and 1).
+
+    Returns:
+        tuple: (list of predicted class indexes, list of confidences).
+    """
+    probabilities = torch.softmax(model_outputs(img_batch, model_name), dim=1)
+    confidences, class_ids = probabilities.max(dim=1)
+    return class_ids.tolist(), confidences.tolist()
+
+
+def predict_batch(img_paths, model_name, batch_size=32):
+    """
+    Predicts the ImageNet class index of many images, batch_size images per
+    forward pass.
+
+    Parameters:
+        img_paths (list): Paths to the image files.
+        model_name (str): The name of the model to use ('resnet', 'alexnet', or 'vgg').
+        batch_size (int): How many images to stack into each forward pass.
+
+    Returns:
+        list: The predicted class index for each image, in input order.
+    """
+    class_ids = []
+    for start in range(0, len(img_paths), batch_size):
+        batch_paths = img_paths[start:start + batch_size]
+        # Stack the [C, H, W] images into one [N, C, H, W] batch
+        img_batch = torch.stack([load_image_tensor(path) for path in batch_paths])
+        class_ids.extend(predict_tensors(img_batch, model_name))
+    return class_ids
+
+
+def classify_batch(img_paths, model_name, batch_size=32):
+    """
+    Classifies many images using a pretrained model, batch_size images per
+    forward pass.
+
+    Parameters:
+        img_paths (list): Paths to the image files.
+        model_name (str): The name of the model to use ('resnet', 'alexnet', or 'vgg').
+        batch_size (int): How many images to stack into each forward pass.
+
+    Returns:
+        list: The predicted class label for each image, in input order.
+    """
+    return [imagenet_classes_dict[class_id]
+            for class_id in predict_batch(img_paths, model_name, batch_size)]
+
 
 def classifier(img_path, model_name):
     """
@@ -33,62 +430,16 @@ def classifier(img_path, model_name):
     Returns:
         str: The predicted class label for the image.
     """
-    # Open the image using PIL
-    img_pil = Image.open(img_path)  # This creates an image object
-
-    # Preprocess the image to make it compatible with the CNN models
-    # The transformations are based on what the models expect
-    preprocess = transforms.Compose([
-        transforms.Resize(256),  # Resize the image so the shortest side is 256 pixels
-        transforms.CenterCrop(224),  # Crop the image to 224x224 pixels in the center
-        transforms.ToTensor(),  # Convert the image to a PyTorch tensor (required for models)
-        transforms.Normalize(  # Normalize using ImageNet's mean and standard deviation
-            mean=[0.485, 0.456, 0.406],
-            std=[0.229, 0.224, 0.225]
-        )
-    ])
-    
-    # Apply preprocessing to the image
-    img_tensor = preprocess(img_pil)  # Now the image is ready for the model
+    # Open and preprocess the image to make it compatible with the CNN models
+    img_tensor = load_image_tensor(img_path)
 
     # Add a batch dimension to the tensor
     # Models expect a batch of images, even if it's just one image
-    img_tensor.unsqueeze_(0)  # Change shape from [C, H, W] to [1, C, H, W]
-
-    # Check the PyTorch version to decide how to handle tensors
-    pytorch_ver = __version__.split('.')  # Split version number into parts
-
-    # If PyTorch version is 0.4 or higher, we don't need Variables
-    if int(pytorch_ver[0]) > 0 or int(pytorch_ver[1]) >= 4:
-        # Make sure the tensor doesn't require gradients
-        # This is important for inference, where we don't update weights
-        img_tensor.requires_grad_(False)
-
-    # If PyTorch version is below 0.4, we must use Variable
-    else:
-        # Wrap the tensor in a Variable for compatibility with older PyTorch versions
-        # We use volatile=True because this is for inference only
-        data = Variable(img_tensor, volatile=True)
-
-    # Get the selected model from the dictionary
-    # This retrieves the model based on the name provided
-    model = models[model_name]  # 'resnet', 'alexnet', or 'vgg'
-
-    # Switch the model to evaluation mode
-    # This disables things like dropout and batch norm updates
-    model = model.eval()
-
-    # Perform inference (get predictions)
-    if int(pytorch_ver[0]) > 0 or int(pytorch_ver[1]) >= 4:
-        # Use the tensor directly for PyTorch 0.4 and above
-        output = model(img_tensor)
-    else:
-        # Use the Variable for older PyTorch versions
-        output = model(data)
-
-    # Find the index of the highest score in the output tensor
-    # This corresponds to the predicted class
-    pred_idx = output.data.numpy().argmax()
+    img_tensor = img_tensor.unsqueeze(0)  # Change shape from [C, H, W] to [1, C, H, W]
+
+    # Perform inference (get predictions) under inference_mode
+    # This returns the index of the highest score, which is the predicted class
+    pred_idx = predict_tensors(img_tensor, model_name)[0]
 
     # Return the class label corresponding to the predicted index
     return imagenet_classes_dict[pred_idx]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/classifier_client.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Create a class ClassifierClient that sends images to a running
+#          classifier_server.py. Several images are sent at the same time
+#          (one request per image, from a few threads) so the server can
+#          gather them into batches. The client doesn't need PyTorch.
+#          Images are sent by path; if the server refuses to read paths (it
+#          isn't on loopback or the file is outside its --image_root), the
+#          file's data is sent instead.
+#          Requests for 'cascade' carry the caller's cascade stages and
+#          thresholds (if given), so the server runs the same cascade.
+#
+# Usage: python classifier_client.py pet_images/Beagle_01141.jpg --arch resnet
+#
+##
+import argparse  # For the command line arguments
+import base64  # To send image file data
+from concurrent.futures import ThreadPoolExecutor  # To send several images at once
+import json  # Requests and responses are JSON
+import os  # The server needs absolute image paths
+from urllib.error import HTTPError  # To notice refused image paths
+from urllib.request import Request, urlopen  # To send the HTTP requests
+
+# Default address of the server (see classifier_server.py)
+DEFAULT_SERVER = 'http://127.0.0.1:8765'
+
+
+class ClassifierClient:
+    """
+    Client for a running classifier server.
+
+    Parameters:
+        server (str): Address of the server, e.g. 'http://127.0.0.1:8765'.
+        concurrency (int): Images sent to the server at the same time.
+        timeout (float): Seconds to wait for one image's result.
+        cascade_stages (list or None): (model name, threshold) of each stage,
+                       sent with 'cascade' requests (None uses the server's
+                       own calibrated thresholds).
+    """
+
+    def __init__(self, server=DEFAULT_SERVER, concurrency=16, timeout=60.0, cascade_stages=None):
+        self.server = server.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cascade_stages = cascade_stages
+
+    def _post(self, path, body):
+        request = Request(f"{self.server}{path}", data=json.dumps(body).encode('utf-8'),
+                          headers={'Content-Type': 'application/json'})
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def health(self):
+        """Returns the server's status (loaded models and batch count)."""
+        with urlopen(f"{self.server}/health", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def classify(self, img_path, arch):
+        """
+        Classifies one image file (read by the server from its path).
+
+        Returns:
+            dict: 'class_id', 'label', 'decode_ms', 'queue_ms',
+                  'inference_ms' and 'batch_size'.
+        """
+        body = {'arch': arch}
+        if arch == 'cascade' and self.cascade_stages:
+            body['stages'] = [[stage_arch, threshold] for stage_arch, threshold in self.cascade_stages]
+        try:
+            return self._post('/classify', dict(body, path=os.path.abspath(img_path)))
+        except HTTPError as error:
+            if error.code != 403:
+                raise
+        # The server may not read this path itself: send the file's data
+        with open(img_path, 'rb') as img_file:
+            data = base64.b64encode(img_file.read()).decode('ascii')
+        return self._post('/classify', dict(body, image=data))
+
+    def classify_many(self, img_paths, arch):
+        """
+        Classifies many image files, sending up to concurrency at a time.
+
+        Returns:
+            list: The result dictionary of each image (see classify), in order.
+        """
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            return list(executor.map(lambda img_path: self.classify(img_path, arch), img_paths))
+
+
+def main():
+    """
+    Classifies the images given on the command line with a running server.
+    """
+    parser = argparse.ArgumentParser(description="Sends images to a classifier server.")
+    parser.add_argument('images', nargs='+', help="Image files to classify.")
+    parser.add_argument('--arch', type=str, default='vgg',
+                        help="CNN model architecture to use. Default is 'vgg'.")
+    parser.add_argument('--server', type=str, default=DEFAULT_SERVER,
+                        help=f"Address of the server. Default is {DEFAULT_SERVER}.")
+    args = parser.parse_args()
+
+    client = ClassifierClient(args.server)
+    for img_path, result in zip(args.images, client.classify_many(args.images, args.arch)):
+        print(f"{img_path}: {result['label']} (queue {result['queue_ms']:.1f} ms, "
+              f"inference {result['inference_ms']:.1f} ms in a batch of {result['batch_size']})")
+
+
+if __name__ == "__main__":
+    main()
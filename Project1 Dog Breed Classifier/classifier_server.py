@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/classifier_server.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: A local HTTP server that keeps the CNN models loaded, so images can
+#          be classified without starting Python and loading the weights for
+#          every run. Requests that arrive at about the same time are gathered
+#          into one batch (micro-batching): a batch is run as soon as it holds
+#          --batch_size images or its first image has waited --max_latency_ms.
+#          Endpoints:
+#            POST /classify  {"path": "/abs/path.jpg", "arch": "resnet"}
+#                            or {"image": "<base64 file data>", "arch": "resnet"}
+#                            -> {"class_id", "label", "decode_ms", "queue_ms",
+#                                "inference_ms", "batch_size"}
+#            GET  /health    -> {"status": "ok", "loaded": [...], "batches": N}
+#          Use classifier_client.py (or check_images.py --server) to send images.
+#          Requests by "path" make the server read a file from its own disk,
+#          so they're only accepted for files under --image_root, or (when
+#          no --image_root is given) when the server listens on loopback
+#          only. Elsewhere images have to be sent as file data.
+#
+# Usage: python classifier_server.py --arch resnet,alexnet,vgg --port 8765
+#
+##
+import argparse  # For the command line arguments
+import base64  # For images sent as file data
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # The HTTP server
+import io  # To open images sent as file data
+import ipaddress  # To tell whether the server listens on loopback only
+import json  # Requests and responses are JSON
+import os  # To check image paths against the allowed folder
+import queue  # Requests waiting to be batched
+import threading  # The batching thread and per-request events
+from time import time  # For the queue and inference timings
+import torch  # For stacking images into batches
+from classifier import load_image_tensor, models, predict_tensors  # The models
+from imagenet_labels import load_imagenet_labels  # ImageNet class labels
+from cpu_profile import apply_cpu_profile, load_cpu_profile, DEFAULT_PROFILE_FILE  # Tuned CPU settings
+from quantize_models import register_int8_model  # For 'arch:int8' names
+from compiled_models import register_compiled_model  # For 'arch:jit' names
+from cascade import load_cascade_stages, register_cascade  # For the 'cascade' name
+
+# Default address of the server
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Request threads register derived models one at a time
+_register_lock = threading.Lock()
+
+
+def ensure_model(name, stages=None):
+    """
+    Makes sure a model name is registered, registering derived models such as
+    'vgg:int8', 'resnet:jit' or 'cascade' the first time they're asked for.
+    Raises KeyError for unknown architectures.
+
+    Parameters:
+        name (str): The model asked for.
+        stages (list or None): For 'cascade', the [model name, threshold] of
+                               each stage sent by the client (None uses the
+                               calibrated thresholds saved by cascade.py).
+
+    Returns:
+        str: The registry name to run, e.g. 'cascade[alexnet@0.9,resnet@0.8,vgg@None]'
+             for a cascade with stages.
+    """
+    with _register_lock:
+        if name == 'cascade' and stages:
+            try:
+                stages = [(str(stage_arch), None if threshold is None else float(threshold))
+                          for stage_arch, threshold in stages]
+            except (TypeError, ValueError):
+                raise ValueError(f"Cascade stages must be [model, threshold] pairs, not {stages}")
+            name = 'cascade[' + ','.join(f"{stage_arch}@{threshold}"
+                                         for stage_arch, threshold in stages) + ']'
+            if name not in models:
+                for stage_arch, threshold in stages:
+                    _ensure_model(stage_arch)
+                register_cascade(stages, name=name)
+            return name
+        _ensure_model(name)
+        return name
+
+
+def _ensure_model(name):
+    if name in models:
+        return
+    if name == 'cascade':
+        register_cascade(load_cascade_stages())
+        return
+    base, _, suffix = name.rpartition(':')
+    if suffix == 'int8' and base:
+        _ensure_model(base)
+        register_int8_model(base)
+    elif suffix == 'jit' and base:
+        _ensure_model(base)
+        register_compiled_model(base)
+    else:
+        raise KeyError(f"Unknown model '{name}'")
+
+
+class PendingRequest:
+    """
+    One image waiting to be classified, and (once done) its result.
+    """
+
+    def __init__(self, img_tensor, arch):
+        self.img_tensor = img_tensor
+        self.arch = arch
+        self.queued_at = time()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Gathers single-image requests into batches and runs them on one thread.
+
+    Parameters:
+        batch_size (int): Most images in one batch.
+        max_latency_ms (float): Longest time the first image of a batch waits
+                                for more images before the batch is run.
+    """
+
+    def __init__(self, batch_size=32, max_latency_ms=10.0):
+        self.batch_size = batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.batches = 0  # Number of batches run so far
+        self._queue = queue.Queue()
+        self._labels = load_imagenet_labels().normalized
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def classify(self, img_tensor, arch):
+        """
+        Queues one preprocessed image and waits for its result.
+
+        Returns:
+            dict: 'class_id', 'label', 'queue_ms', 'inference_ms' and
+                  'batch_size' (the size of the batch it was run in).
+        """
+        request = PendingRequest(img_tensor, arch)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next_batch(self):
+        # Wait for the first request, then gather more until the batch is
+        # full or the first request has waited max_latency. Requests that
+        # queued up while the last batch ran are always taken right away.
+        batch = [self._queue.get()]
+        deadline = batch[0].queued_at + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            batch_start = time()
+            self.batches += 1
+
+            # A batch can hold requests for several models: run each group
+            by_arch = {}
+            for request in batch:
+                by_arch.setdefault(request.arch, []).append(request)
+            for arch, requests in by_arch.items():
+                try:
+                    start_time = time()
+                    class_ids = predict_tensors(
+                        torch.stack([request.img_tensor for request in requests]), arch)
+                    inference_ms = (time() - start_time) * 1000.0
+                except Exception as error:  # Hand the error to every waiting request
+                    for request in requests:
+                        request.error = error
+                        request.done.set()
+                    continue
+                for request, class_id in zip(requests, class_ids):
+                    request.result = {
+                        'class_id': class_id,
+                        'label': self._labels[class_id],
+                        'queue_ms': (batch_start - request.queued_at) * 1000.0,
+                        'inference_ms': inference_ms,
+                        'batch_size': len(requests),
+                    }
+                    request.done.set()
+
+
+class ClassifierRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the /classify and /health requests. Each request runs on its own
+    thread, so images are decoded in parallel before they're batched.
+    """
+    batcher = None  # The server's MicroBatcher (set in serve)
+    image_root = None  # Folder "path" requests may read from (None = anywhere)
+    allow_paths = True  # Whether "path" requests are accepted at all (set in serve)
+    protocol_version = 'HTTP/1.1'  # Keep connections open between requests
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _allowed_path(self, path):
+        # Returns the real path of an image the server may read, or raises
+        # PermissionError
+        if not self.allow_paths:
+            raise PermissionError("This server doesn't read image paths; send the image data instead")
+        real_path = os.path.realpath(path)
+        if self.image_root is not None and \
+                os.path.commonpath([real_path, self.image_root]) != self.image_root:
+            raise PermissionError(f"{path} is outside the server's image folder")
+        return real_path
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        # models.loaded() takes a snapshot under the registry's lock, so it's
+        # safe while the batching thread builds or unloads models
+        self._send_json(200, {'status': 'ok', 'loaded': models.loaded(),
+                              'batches': self.batcher.batches})
+
+    def do_POST(self):
+        if self.path != '/classify':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length))
+            arch = ensure_model(body.get('arch', 'vgg'), body.get('stages'))
+
+            # Decode the image on this request's thread
+            start_time = time()
+            if 'image' in body:
+                img_tensor = load_image_tensor(io.BytesIO(base64.b64decode(body['image'])))
+            else:
+                img_tensor = load_image_tensor(self._allowed_path(body['path']))
+            decode_ms = (time() - start_time) * 1000.0
+        except PermissionError as error:
+            self._send_json(403, {'error': str(error)})
+            return
+        except (KeyError, ValueError, OSError) as error:
+            self._send_json(400, {'error': str(error)})
+            return
+
+        try:
+            result = self.batcher.classify(img_tensor, arch)
+        except Exception as error:
+            self._send_json(500, {'error': str(error)})
+            return
+        result['decode_ms'] = decode_ms
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        pass  # Don't print a line for every image
+
+
+class ClassifierHTTPServer(ThreadingHTTPServer):
+    """HTTP server with one thread per request."""
+    daemon_threads = True  # Don't wait for request threads when stopping
+    request_queue_size = 128  # Room for many clients connecting at once
+
+
+def is_loopback(host):
+    """True when host is a loopback address (or 'localhost')."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, archs=(), batch_size=32, max_latency_ms=10.0,
+          image_root=None):
+    """
+    Loads the given models and serves requests until interrupted.
+
+    Parameters:
+        host (str): Address to listen on.
+        port (int): Port to listen on.
+        archs (iterable): Models to load before the first request.
+        batch_size (int): Most images in one batch.
+        max_latency_ms (float): Longest wait for a batch to fill up.
+        image_root (str or None): Folder "path" requests may read from. Without
+                                  it, "path" requests are only accepted when
+                                  host is a loopback address.
+    """
+    for arch in archs:
+        ensure_model(arch)
+        models[arch]  # Load the model now so the first request isn't slow
+    ClassifierRequestHandler.batcher = MicroBatcher(batch_size, max_latency_ms)
+    ClassifierRequestHandler.image_root = os.path.realpath(image_root) if image_root else None
+    ClassifierRequestHandler.allow_paths = image_root is not None or is_loopback(host)
+    if not ClassifierRequestHandler.allow_paths:
+        print(f"Listening beyond loopback without --image_root: image paths are refused, "
+              f"only image data is accepted")
+    server = ClassifierHTTPServer((host, port), ClassifierRequestHandler)
+    print(f"Classifier server listening on http://{host}:{port} "
+          f"(models: {', '.join(models.loaded()) or 'none yet'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    """
+    Starts the server from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Local classifier server with micro-batching.")
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help=f"Address to listen on. Default is {DEFAULT_HOST}.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on. Default is {DEFAULT_PORT}.")
+    parser.add_argument('--arch', type=str, default='resnet,alexnet,vgg',
+                        help="CNN models to load at start, separated by commas.")
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help="Most images in one batch. Default is 32.")
+    parser.add_argument('--max_latency_ms', type=float, default=10.0,
+                        help="Longest time (ms) an image waits for its batch to fill. Default is 10.")
+    parser.add_argument('--cpu_profile', type=str, default=DEFAULT_PROFILE_FILE,
+                        help="CPU profile made by cpu_profile.py (used if the file exists). "
+                             "Default is the cpu_profile.json next to cpu_profile.py.")
+    parser.add_argument('--image_root', type=str, default=None,
+                        help="Folder the server may read images from by path. Default is "
+                             "anywhere on loopback, and no paths when listening beyond it.")
+    args = parser.parse_args()
+
+    cpu_profile = load_cpu_profile(args.cpu_profile)
+    if cpu_profile is not None:
+        apply_cpu_profile(cpu_profile)
+    archs = [arch.strip() for arch in args.arch.split(',') if arch.strip()]
+    serve(args.host, args.port, archs, args.batch_size, args.max_latency_ms, args.image_root)
+
+
+if __name__ == "__main__":
+    main()
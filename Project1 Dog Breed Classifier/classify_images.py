@@ -18,18 +18,44 @@
 #           that's the 'value' of the results dictionary. You will be adding the
 #           classifier label as the item at index 1 of the list and the comparison 
 #           of the pet and classifier labels as the item at index 2 of the list.
+#          The function classify_images_multi does the same for several model
+#          architectures at once, decoding each image only once. Given an
+#          image pack (see image_pack.py) instead of a folder, it reads the
+#          already cropped images from the pack without decoding them.
+#          Given a ModelPool (see model_pool.py), the batches are run by the
+#          pool's worker processes while the next batches are decoded.
+#          An on_batch function can be given to hear about each batch as soon
+#          as its predictions, classifier labels and matches are filled in
+#          (check_images.py uses it to print the running statistics).
+#          Given an iterable of (filename, pet label) pairs such as the
+#          scan_pet_images generator, the images are added to the results
+#          tables as they're taken from it, so classifying starts before the
+#          scan of the folder is finished.
+#          The per-image comparison lines are only printed when verbose.
 #
 ##
-# Import the classifier function to classify images using a CNN model
-from classifier import classifier  # This is the custom function for classification
+from collections import deque  # Batches waiting for a model pool worker
+from itertools import islice  # To take streamed images batch_size at a time
+from time import time  # To measure how long each model spends on inference
+# Import the batched classifier functions to classify images using a CNN model
+from classifier import predict_tensors  # Custom function for classification
+from imagenet_labels import load_imagenet_labels  # Precompiled ImageNet label table
+from classifier import models, PREPROCESS_VERSION  # To key cached predictions
+from image_pipeline import iter_image_batches, iter_pack_batches  # Decodes images into batches (optionally in parallel)
+from image_pack import ImagePack, is_image_pack  # Already decoded images
+from prediction_cache import hash_image_file  # Hashes image content for the prediction cache
+from breed_matcher import get_breed_matcher  # Matches pet labels to predicted classes
+from results_table import ResultsTable  # Column-based results dictionary
 
-def classify_images(images_dir, results_dic, model):
+def classify_images(images_dir, results_dic, model, batch_size=32, workers=0, prefetch=2,
+                    cache=None, matcher=None, client=None, pool=None, verbose=True):
     """
     Classifies images using a pretrained CNN model and compares predictions 
     with the actual pet labels. Updates the results dictionary.
 
     Parameters:
-      images_dir (str): Path to the folder containing the images to classify.
+      images_dir (str): Path to the folder containing the images to classify,
+                        or to an image pack made from it.
       results_dic (dict): Dictionary with:
                           - Key: Filename of the image (string)
                           - Value: A list containing:
@@ -37,45 +63,300 @@ def classify_images(images_dir, results_dic, model):
                               - [1]: (To be added) Classifier label (string)
                               - [2]: (To be added) Match flag (1 for match, 0 otherwise)
       model (str): CNN model architecture to use ('resnet', 'alexnet', 'vgg').
+      batch_size (int): How many images the model classifies in one forward pass.
+      workers (int): Number of worker processes decoding images while the
+                     model runs (0 decodes in this process).
+      prefetch (int): Number of extra batches decoded ahead of the model.
+      cache (PredictionCache or None): On-disk prediction cache. Images found
+                     in it are not run through the model again, and new
+                     predictions are added to it.
+      matcher (BreedMatcher or None): Decides whether a pet label matches the
+                     predicted class (None uses the original substring check).
+      client (ClassifierClient or None): Sends the images to a running
+                     classifier server instead of loading the model here.
+      pool (ModelPool or None): Worker processes that run the model on the
+                     batches (with the weights shared between them).
+      verbose (bool): Print the comparison of every image.
 
     Returns:
-      None: Updates the `results_dic` dictionary in place.
+      dict: Filename -> predicted ImageNet class index. Also updates the
+            `results_dic` dictionary in place.
     """
+    class_ids_by_arch, timings = classify_images_multi(
+        images_dir, {model: results_dic}, batch_size, workers, prefetch, cache,
+        matcher=matcher, client=client, pool=pool, verbose=verbose)
+    return class_ids_by_arch[model]
 
-    # Loop through each image in the dictionary
-    for image_filename, value in results_dic.items():
-        # Step 1: Construct the full path to the image
+
+def classify_images_multi(images_dir, results_by_arch, batch_size=32, workers=0, prefetch=2,
+                          cache=None, metrics=None, matcher=None, client=None, pool=None,
+                          on_batch=None, images=None, verbose=False):
+    """
+    Classifies images with several CNN models in one pass. Each image is
+    decoded and preprocessed once and the same batch is run through every
+    model. Updates one results dictionary per model.
+
+    Parameters:
+      images_dir (str): Path to the folder (or image pack) of the images.
+      results_by_arch (dict): CNN model architecture -> results dictionary
+                              (see classify_images). All results dictionaries
+                              must have the same keys.
+      batch_size, workers, prefetch, cache, matcher, client, pool, verbose:
+                              See classify_images.
+      metrics (RunMetrics or None): Records the batch latencies of each
+                              model, model load times and the time spent
+                              waiting for decoded batches.
+      on_batch (function or None): Called as on_batch(arch, indexes, amortized_ms)
+                              once the images at these indexes (rows of the
+                              model's ResultsTable) have their predictions,
+                              classifier labels and matches filled in.
+                              amortized_ms is the amortized time per image of
+                              the batch (None for images found in the cache).
+                              Only for ResultsTable results.
+      images (iterable or None): (filename, pet label) pairs of the images to
+                              classify, e.g. from scan_pet_images. The results
+                              tables must then start empty (ResultsTable());
+                              the images are added to them batch_size at a
+                              time as they're taken. None classifies the
+                              images already in the results dictionaries.
+
+    Returns:
+      tuple: (class_ids_by_arch, timings) where
+             - class_ids_by_arch: CNN model architecture -> {filename:
+               predicted ImageNet class index}
+             - timings: CNN model architecture -> {'images': number of images
+               run through the model, 'seconds': time the model spent on them,
+               'amortized_ms': amortized time of each image in image order,
+               i.e. its batch's time / images in the batch (None for images
+               found in the cache)}
+               With a pool, 'seconds' adds up the time of every worker.
+    """
+    archs = list(results_by_arch)
+    if matcher is None:
+        matcher = get_breed_matcher()
+    normalized_labels = load_imagenet_labels().normalized
+
+    # With an image pack, the images are read from the pack's rows instead
+    pack = ImagePack(images_dir) if is_image_pack(images_dir) else None
+    if pack is not None and pack.preprocess != PREPROCESS_VERSION:
+        raise ValueError(f"Image pack {images_dir} was made with preprocessing "
+                         f"'{pack.preprocess}', expected '{PREPROCESS_VERSION}'. "
+                         f"Please pack the images again.")
+
+    # Step 1: Keep the filename, full path (and, with a cache, content hash)
+    # of every image, plus each model's prediction and amortized time. They
+    # grow as images are added (all at once, or batch by batch from images).
+    image_filenames = []
+    image_paths = []
+    image_hashes = []
+    class_ids = {arch: [] for arch in archs}
+    timings = {arch: {'images': 0, 'seconds': 0.0, 'amortized_ms': []} for arch in archs}
+    new_by_arch = {arch: [] for arch in archs}
+    if cache is not None:
+        cache_keys = {arch: (arch, models.fingerprint(arch), PREPROCESS_VERSION) for arch in archs}
+
+    def label_rows(arch, indexes):
+        # Fill in the classifier labels and matches of some rows of a
+        # model's results table, then hand them to on_batch
+        results_dic = results_by_arch[arch]
+        batch_ids = [class_ids[arch][index] for index in indexes]
+        matches = matcher.match_codes(results_dic.labels, results_dic.pet_label_codes[indexes],
+                                      batch_ids)
+        results_dic.set_classifications(batch_ids, [normalized_labels[class_id] for class_id in batch_ids],
+                                        matches, rows=indexes)
+
+    def add_images(filenames):
+        # Step 2: Add images and look them up in the cache. The key also
+        # holds the model weights and preprocessing version, so a change in
+        # either means the image is classified again. Returns their indexes.
+        first = len(image_filenames)
+        image_filenames.extend(filenames)
         # Combine the directory with the filename to get the full path
-        image_path = f"{images_dir}/{image_filename}"
+        image_paths.extend(f"{images_dir}/{image_filename}" for image_filename in filenames)
+        indexes = list(range(first, len(image_filenames)))
+        for arch in archs:
+            class_ids[arch].extend([None] * len(indexes))
+            timings[arch]['amortized_ms'].extend([None] * len(indexes))
+        if cache is None:
+            return indexes
+        if pack is not None:
+            # The pack stores the hash of each original image file
+            hashes = [pack.hashes[pack.row(image_filename)] for image_filename in filenames]
+        else:
+            hashes = [hash_image_file(image_paths[index]) for index in indexes]
+        image_hashes.extend(hashes)
+        for arch in archs:
+            cached = cache.get_many(hashes, *cache_keys[arch])
+            for index, image_hash in zip(indexes, hashes):
+                class_ids[arch][index] = cached.get(image_hash)
+            # The images found in the cache are finished already
+            cached_indexes = [index for index in indexes if class_ids[arch][index] is not None]
+            if on_batch is not None and cached_indexes:
+                label_rows(arch, cached_indexes)
+                on_batch(arch, cached_indexes, None)
+        return indexes
+
+    def image_chunks():
+        # Yields the indexes of the images as they're added: the images of
+        # the results tables all at once, or batch_size at a time from images
+        if images is None:
+            yield add_images(list(results_by_arch[archs[0]]))
+            return
+        remaining_images = iter(images)
+        while True:
+            chunk = list(islice(remaining_images, batch_size))
+            if not chunk:
+                return
+            filenames = []
+            for image_filename, pet_label in chunk:
+                # append() returns False if the filename is already in the tables
+                if all([results_dic.append(image_filename, pet_label)
+                        for results_dic in results_by_arch.values()]):
+                    filenames.append(image_filename)
+                else:
+                    print(f"Warning: Duplicate filename '{image_filename}' detected!")
+            yield add_images(filenames)
+
+    # Step 3: Classify the remaining images, batch_size images per forward pass
+    # Only images that at least one model still needs are decoded, and each
+    # decoded batch is handed to every model that needs it. The batches arrive
+    # in the same order as the paths; with workers the next batches are
+    # decoded while the models work on the current one.
+    todo = deque()  # Indexes of the images handed to the decoder, oldest first
+
+    def todo_indexes():
+        # Yields the indexes of the images some model still needs (and
+        # remembers them in todo), taking new images only as they're needed
+        for indexes in image_chunks():
+            for index in indexes:
+                if any(class_ids[arch][index] is None for arch in archs):
+                    todo.append(index)
+                    yield index
+
+    def record_predictions(arch, indexes, predictions, seconds):
+        # Store one model's predictions for the images at these indexes
+        timings[arch]['seconds'] += seconds
+        timings[arch]['images'] += len(indexes)
+        if metrics is not None:
+            metrics.record_batch(arch, len(indexes), seconds)
+        amortized_ms = seconds / max(len(indexes), 1) * 1000.0
+        for index, class_id in zip(indexes, predictions):
+            class_ids[arch][index] = class_id
+            timings[arch]['amortized_ms'][index] = amortized_ms
+            new_by_arch[arch].append(index)
+        if on_batch is not None:
+            label_rows(arch, indexes)
+            on_batch(arch, indexes, amortized_ms)
+
+    if client is not None:
+        # The server decodes and batches the images itself, so each model's
+        # images are sent as they are and nothing is decoded here
+        if pack is not None:
+            raise ValueError("An image pack can't be sent to a classifier server; "
+                             "please give the image folder instead.")
+        for indexes in image_chunks():
+            for arch in archs:
+                needed = [index for index in indexes if class_ids[arch][index] is None]
+                if not needed:
+                    continue
+                start_time = time()
+                server_results = client.classify_many([image_paths[index] for index in needed], arch)
+                record_predictions(arch, needed, [server_result['class_id'] for server_result in server_results],
+                                   time() - start_time)
+        img_batches = []
+    elif pack is not None:
+        img_batches = iter_pack_batches(
+            pack, [pack.row(image_filenames[index]) for index in todo_indexes()], batch_size)
+    else:
+        img_batches = iter_image_batches((image_paths[index] for index in todo_indexes()),
+                                         batch_size, workers, prefetch)
+    # Batches handed to the model pool and not yet collected: (arch, indexes, future)
+    pool_batches = deque()
+    wait_start = time()
+    for img_batch in img_batches:
+        # Time spent waiting for this batch to be decoded
+        if metrics is not None:
+            metrics.add_time('decode_wait', time() - wait_start)
+        batch_indexes = [todo.popleft() for _ in range(len(img_batch))]
+        for arch in archs:
+            # Positions (within the batch) of the images this model still needs
+            needed = [pos for pos, index in enumerate(batch_indexes)
+                      if class_ids[arch][index] is None]
+            if not needed:
+                continue
+            arch_batch = img_batch if len(needed) == len(batch_indexes) else img_batch[needed]
+            needed_indexes = [batch_indexes[pos] for pos in needed]
+
+            if pool is not None:
+                # A pool worker runs the batch while the next one is decoded
+                pool_batches.append((arch, needed_indexes, pool.submit(arch_batch, arch)))
+                continue
+
+            models[arch]  # Build the model first so its load time isn't counted as inference
+            start_time = time()
+            predictions = predict_tensors(arch_batch, arch)
+            record_predictions(arch, needed_indexes, predictions, time() - start_time)
+
+        # Collect the finished pool batches, and wait for the oldest ones
+        # when too many are queued (each holds a decoded batch in memory)
+        while pool_batches and (pool_batches[0][2].done() or
+                                len(pool_batches) > pool.max_in_flight):
+            arch, indexes, future = pool_batches.popleft()
+            record_predictions(arch, indexes, *future.result())
+        wait_start = time()
 
-        # Debugging: Print the full image path (just to check)
-        print(f"Image path: {image_path}")  # Optional, helps ensure paths are correct
+    # Wait for the batches the pool is still working on
+    while pool_batches:
+        arch, indexes, future = pool_batches.popleft()
+        record_predictions(arch, indexes, *future.result())
 
-        # Step 2: Call the classifier function to classify the image
-        # This returns a string with the predicted labels (e.g., 'Maltese dog, Maltese').
-        classifier_label = classifier(image_path, model)
+    # Record how long each model that was used took to build
+    if metrics is not None:
+        for arch in archs:
+            if arch in models.load_seconds:
+                metrics.model_load_seconds[arch] = models.load_seconds[arch]
 
-        # Debugging: Print the classifier label (for manual checking)
-        print(f"Classifier output: {classifier_label}")  # Debug statement
+    # Store the new predictions so the next run can skip these images
+    if cache is not None:
+        for arch in archs:
+            cache.put_many({image_hashes[index]: class_ids[arch][index]
+                            for index in new_by_arch[arch]}, *cache_keys[arch])
 
-        # Step 3: Format the classifier label
-        # Convert to lowercase and remove spaces to ensure consistency in comparisons
-        classifier_label = classifier_label.lower().strip()
+    for arch in archs:
+        results_dic = results_by_arch[arch]
 
-        # Debugging: Check if formatting is correct
-        print(f"Formatted Classifier Label: {classifier_label}")  # Debug statement
+        # Step 4: Look up the predicted label (e.g., 'maltese dog, maltese') of
+        # each image. The table already holds the labels in lowercase without
+        # extra spaces, to ensure consistency in comparisons
+        classifier_labels = [normalized_labels[class_id] for class_id in class_ids[arch]]
 
-        # Step 4: Compare the pet label with the classifier label
-        # Check if the actual pet label exists in the classifier's predicted labels
-        pet_label = value[0]  # The actual label is the first item in the list
-        match = 1 if pet_label in classifier_label else 0
+        # Step 5: Compare the pet labels with the predicted classes
+        # The matcher looks up every (pet label, class id) pair in one step
+        if isinstance(results_dic, ResultsTable):
+            pet_labels = results_dic.pet_labels()
+            matches = matcher.match_codes(results_dic.labels, results_dic.pet_label_codes,
+                                          class_ids[arch])
+        else:
+            pet_labels = [results_dic[image_filename][0] for image_filename in image_filenames]
+            matches = matcher.match_batch(pet_labels, class_ids[arch])
+        matches = matches.tolist()
 
-        # Debugging: Print the comparison results
-        print(f"Pet Label: {pet_label}, Match: {'Yes' if match else 'No'}")  # Debug output
+        # Debugging: Print the comparison results (one line per image)
+        if verbose:
+            for image_filename, pet_label, classifier_label, match in zip(
+                    image_filenames, pet_labels, classifier_labels, matches):
+                print(f"[{arch}] Image: {image_filename}, Pet Label: {pet_label}, "
+                      f"Classifier Label: {classifier_label}, Match: {'Yes' if match else 'No'}")
 
-        # Step 5: Update the results dictionary
-        # Add the classifier label and match flag to the list in the dictionary
-        value.extend([classifier_label, match])
+        # Step 6: Update the results
+        # A results table stores the columns directly; a dictionary of lists
+        # gets the classifier label and match flag added to each list
+        if isinstance(results_dic, ResultsTable):
+            results_dic.set_classifications(class_ids[arch], classifier_labels, matches)
+        else:
+            for image_filename, classifier_label, match in zip(
+                    image_filenames, classifier_labels, matches):
+                results_dic[image_filename].extend([classifier_label, match])
 
-        # Debugging: Print the updated dictionary entry
-        print(f"Updated Entry for {image_filename}: {value}\n")  # Shows full updated entry
\ No newline at end of file
+    class_ids_by_arch = {arch: dict(zip(image_filenames, class_ids[arch])) for arch in archs}
+    return class_ids_by_arch, timings
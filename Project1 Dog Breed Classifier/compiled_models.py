@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/compiled_models.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Create frozen TorchScript versions of the CNN models for a faster
+#          start and faster inference. The first time a model is needed, it's
+#          traced with an example image and frozen for inference (batch norm
+#          layers are folded into the convolutions and constants are
+#          propagated). The frozen model is saved in the model cache, and
+#          later runs load it directly without building the eager model or
+#          its pretrained weights. The compiled model is registered with the
+#          classifier as '<arch>:jit' (e.g. 'resnet:jit', 'vgg:int8:jit').
+#
+##
+import os  # To check for a cached compiled model
+import torch  # For tracing, freezing and loading TorchScript models
+from classifier import models, register_model  # The model registry
+from model_cache import cached_model_path, save_atomic  # Where compiled models are stored
+
+# Name of the compiled model file kind in the model cache
+COMPILED_KIND = 'torchscript-frozen'
+
+
+def compile_model(model):
+    """
+    Traces a model with an example 224x224 image and freezes it for inference.
+    """
+    example = torch.zeros(1, 3, 224, 224)
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(model.eval(), example))
+
+
+def _optimize(frozen_model):
+    # Add CPU specific optimizations after loading. These are not saved in
+    # the cache file because some of them can't be loaded back.
+    try:
+        return torch.jit.optimize_for_inference(frozen_model)
+    except (RuntimeError, AttributeError):
+        return frozen_model
+
+
+def compiled_name(name):
+    """Returns the registry name of the compiled version of a model ('resnet' -> 'resnet:jit')."""
+    return f"{name}:jit"
+
+
+def register_compiled_model(name):
+    """
+    Registers the frozen TorchScript version of a registered model as '<name>:jit'.
+
+    Parameters:
+        name (str): A registered CNN model (e.g. 'resnet' or 'vgg:int8').
+
+    Returns:
+        str: The registry name of the compiled model.
+    """
+    fingerprint = models.fingerprint(name)
+    cache_path = cached_model_path(name, COMPILED_KIND, fingerprint)
+
+    def build_compiled(pretrained):
+        if pretrained and os.path.exists(cache_path):
+            # Warm start: load the frozen model, no eager model needed
+            return _optimize(torch.jit.load(cache_path).eval())
+        frozen_model = compile_model(models.build(name, pretrained))
+        if pretrained:
+            save_atomic(lambda path: torch.jit.save(frozen_model, path), cache_path)
+        return _optimize(frozen_model)
+
+    register_model(compiled_name(name), build_compiled,
+                   weights_id=f"{fingerprint}/{COMPILED_KIND}")
+    return compiled_name(name)
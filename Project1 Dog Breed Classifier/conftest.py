@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/conftest.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: pytest settings for the tests in this folder.
+#
+##
+
+# test_classifier.py is a demonstration script (it classifies an image with
+# the pretrained VGG as soon as it's imported), not a pytest test
+collect_ignore = ['test_classifier.py']
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/cpu_profile.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Create functions that set up how the CNN models use the CPU. A CPU
+#          profile is a dictionary with:
+#            intra_op_threads - threads used inside one operation (e.g. a convolution)
+#            inter_op_threads - threads used to run independent operations
+#            channels_last    - architectures run in channels_last memory format
+#            pin_cores        - CPU cores the process is pinned to (None = all)
+#          Run as a script to auto-tune: every combination is benchmarked on
+#          this machine (each thread setting in its own process, since PyTorch
+#          only lets the inter-op threads be set once) and the fastest profile
+#          is saved to cpu_profile.json, which check_images.py loads on later runs.
+#
+# Usage: python cpu_profile.py --arch resnet,alexnet,vgg
+#
+##
+import argparse  # For the command line arguments of the auto-tuner
+import json  # To save and load profiles
+import os  # For CPU counts and core pinning
+import subprocess  # To benchmark each thread setting in a fresh process
+import sys  # To start the benchmark processes with the same Python
+from time import time  # To time the benchmark
+import torch  # To set the thread counts
+
+# File where the fastest profile is saved
+DEFAULT_PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cpu_profile.json')
+
+
+def default_profile():
+    """Returns the profile that matches PyTorch's own defaults."""
+    return {
+        'intra_op_threads': torch.get_num_threads(),
+        'inter_op_threads': torch.get_num_interop_threads(),
+        'channels_last': [],
+        'pin_cores': None,
+    }
+
+
+def load_cpu_profile(path=DEFAULT_PROFILE_FILE):
+    """
+    Returns the profile saved in path, or None if there's no such file.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as profile_file:
+        return json.load(profile_file)
+
+
+def save_cpu_profile(profile, path=DEFAULT_PROFILE_FILE):
+    """Saves a profile as JSON."""
+    with open(path, 'w') as profile_file:
+        json.dump(profile, profile_file, indent=2)
+
+
+def available_cores():
+    """Returns the list of CPU cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def apply_cpu_profile(profile):
+    """
+    Applies a profile to this process: thread counts, core pinning and the
+    memory format of the models.
+
+    Parameters:
+        profile (dict): A CPU profile (see the top of this file). Missing
+                        keys keep the current settings.
+    """
+    # Import here so the benchmark processes can set threads before anything else
+    from classifier import models
+
+    if profile.get('pin_cores') and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, profile['pin_cores'])
+    if profile.get('intra_op_threads'):
+        torch.set_num_threads(int(profile['intra_op_threads']))
+    if profile.get('inter_op_threads'):
+        try:
+            torch.set_num_interop_threads(int(profile['inter_op_threads']))
+        except RuntimeError:
+            pass  # Can only be set once, before any inter-op work has started
+    if 'channels_last' in profile:
+        models.set_channels_last(profile['channels_last'])
+
+
+def benchmark(archs, batch_size=16, repeats=5):
+    """
+    Times the models of this process's current thread setting, with and
+    without channels_last. Uses random weights, since the speed of a model
+    doesn't depend on its weight values.
+
+    Returns:
+        dict: Architecture -> {'contiguous': seconds per batch,
+                               'channels_last': seconds per batch}.
+    """
+    from classifier import inference_mode, models
+
+    img_batch = torch.randn(batch_size, 3, 224, 224)
+    timings = {}
+    for arch in archs:
+        model = models.build(arch, pretrained=False)
+        timings[arch] = {}
+        for memory_format in ('contiguous', 'channels_last'):
+            if memory_format == 'channels_last':
+                model = model.to(memory_format=torch.channels_last)
+                batch = img_batch.contiguous(memory_format=torch.channels_last)
+            else:
+                batch = img_batch
+            with inference_mode():
+                model(batch)  # Warm-up run
+                start_time = time()
+                for _ in range(repeats):
+                    model(batch)
+            timings[arch][memory_format] = (time() - start_time) / repeats
+    return timings
+
+
+def candidate_settings():
+    """
+    Returns the thread and pinning settings to try on this machine.
+    """
+    cores = available_cores()
+    n_cores = len(cores)
+    thread_counts = sorted({1, max(1, n_cores // 4), max(1, n_cores // 2), n_cores})
+    settings = []
+    for threads in thread_counts:
+        for inter_op_threads in (1, 2):
+            for pin in (False, True):
+                if pin and threads == n_cores:
+                    continue  # Pinning to every core changes nothing
+                settings.append({
+                    'intra_op_threads': threads,
+                    'inter_op_threads': inter_op_threads,
+                    'pin_cores': cores[:threads] if pin else None,
+                })
+    return settings
+
+
+def autotune(archs, batch_size=16, repeats=5, path=DEFAULT_PROFILE_FILE):
+    """
+    Benchmarks every candidate setting in its own process and saves the
+    fastest profile.
+
+    Returns:
+        dict: The fastest profile.
+    """
+    best_profile = None
+    best_seconds = None
+    for setting in candidate_settings():
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--benchmark', json.dumps(setting),
+             '--arch', ','.join(archs), '--batch_size', str(batch_size),
+             '--repeats', str(repeats)],
+            check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+
+        # Each architecture uses whichever memory format is faster for it
+        seconds = sum(min(arch_timings.values()) for arch_timings in timings.values())
+        channels_last = [arch for arch, arch_timings in timings.items()
+                         if arch_timings['channels_last'] < arch_timings['contiguous']]
+        print(f"threads={setting['intra_op_threads']:>3} inter_op={setting['inter_op_threads']} "
+              f"pinned={'yes' if setting['pin_cores'] else 'no ':3}: "
+              f"{seconds * 1000.0:.1f} ms per batch (channels_last: {channels_last or 'none'})")
+
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+            best_profile = dict(setting, channels_last=channels_last)
+
+    save_cpu_profile(best_profile, path)
+    print(f"\nFastest profile saved to {path}:\n{json.dumps(best_profile, indent=2)}")
+    return best_profile
+
+
+def main():
+    """
+    Runs the auto-tuner, or (with --benchmark) one benchmark process.
+    """
+    parser = argparse.ArgumentParser(description="Finds the fastest CPU profile on this machine.")
+    parser.add_argument('--arch', type=str, default='resnet,alexnet,vgg',
+                        help="CNN model architectures to tune, separated by commas.")
+    parser.add_argument('--batch_size', type=int, default=16,
+                        help="Number of images per benchmark forward pass. Default is 16.")
+    parser.add_argument('--repeats', type=int, default=5,
+                        help="Timed forward passes per setting. Default is 5.")
+    parser.add_argument('--output', type=str, default=DEFAULT_PROFILE_FILE,
+                        help="File to save the fastest profile to.")
+    parser.add_argument('--benchmark', type=str, default=None,
+                        help=argparse.SUPPRESS)  # Used by the auto-tuner's own processes
+    args = parser.parse_args()
+    archs = [arch.strip() for arch in args.arch.split(',') if arch.strip()]
+
+    if args.benchmark:
+        apply_cpu_profile(json.loads(args.benchmark))
+        print(json.dumps(benchmark(archs, args.batch_size, args.repeats)))
+    else:
+        autotune(archs, args.batch_size, args.repeats, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/decode_parity.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Check that the reduced-size JPEG decoding (see decode_image in
+#          classifier.py) classifies images as well as full-size decoding.
+#          Every image in a folder is preprocessed both ways and run through
+#          a CNN model. The script reports:
+#            - the decode + preprocess time of both ways
+#            - the average pixel difference of the preprocessed images
+#            - how often both ways predict the same class (top-1 agreement)
+#            - the pet label match accuracy of both ways
+#          and exits with status 1 if the agreement is below --min_agreement.
+#
+# Usage: python decode_parity.py --dir uploaded_images --arch resnet
+#
+##
+import argparse  # For the command line arguments
+import os  # To build image paths
+import sys  # To exit with a failure status
+from time import time  # To time both ways of decoding
+import torch  # For stacking images into batches
+from classifier import load_image_tensor, predict_tensors  # Preprocessing and inference
+from get_pet_labels import scan_pet_images  # To find the images and their pet labels
+from breed_matcher import get_breed_matcher  # To check predictions against pet labels
+
+
+def decode_parity(image_dir, arch, batch_size=32):
+    """
+    Compares full-size and reduced-size JPEG decoding on a folder of images.
+
+    Parameters:
+        image_dir (str): Path to the folder containing the images.
+        arch (str): CNN model architecture to classify with.
+        batch_size (int): Images per forward pass.
+
+    Returns:
+        dict: 'images', 'agreement', 'mean_abs_diff', and per decoding way
+              ('full' and 'draft') the 'decode_seconds' and 'accuracy'.
+    """
+    images = list(scan_pet_images(image_dir))
+    matcher = get_breed_matcher()
+    report = {'images': len(images), 'full': {}, 'draft': {}}
+    class_ids = {'full': [], 'draft': []}
+    decode_seconds = {'full': 0.0, 'draft': 0.0}
+    total_abs_diff = 0.0
+
+    for start in range(0, len(images), batch_size):
+        batch_paths = [os.path.join(image_dir, filename)
+                       for filename, pet_label in images[start:start + batch_size]]
+        batches = {}
+        for way, draft in (('full', False), ('draft', True)):
+            start_time = time()
+            batches[way] = torch.stack([load_image_tensor(path, draft) for path in batch_paths])
+            decode_seconds[way] += time() - start_time
+            class_ids[way].extend(predict_tensors(batches[way], arch))
+        total_abs_diff += (batches['full'] - batches['draft']).abs().mean(dim=(1, 2, 3)).sum().item()
+
+    pet_labels = [pet_label for filename, pet_label in images]
+    for way in ('full', 'draft'):
+        matches = matcher.match_batch(pet_labels, class_ids[way]) if images else []
+        report[way]['decode_seconds'] = decode_seconds[way]
+        report[way]['accuracy'] = sum(matches) / len(images) if images else 0.0
+    report['agreement'] = (sum(1 for full_id, draft_id in zip(class_ids['full'], class_ids['draft'])
+                               if full_id == draft_id) / len(images)) if images else 1.0
+    report['mean_abs_diff'] = total_abs_diff / len(images) if images else 0.0
+    return report
+
+
+def main():
+    """
+    Prints the decode parity report and fails if the agreement is too low.
+    """
+    parser = argparse.ArgumentParser(
+        description="Compares full-size and reduced-size JPEG decoding.")
+    parser.add_argument('--dir', type=str, default='uploaded_images',
+                        help="Folder containing the images. Default is 'uploaded_images'.")
+    parser.add_argument('--arch', type=str, default='resnet',
+                        help="CNN model architecture to classify with. Default is 'resnet'.")
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help="Number of images per forward pass. Default is 32.")
+    parser.add_argument('--min_agreement', type=float, default=0.95,
+                        help="Lowest accepted top-1 agreement (0.95 = 95%%). Default is 0.95.")
+    args = parser.parse_args()
+
+    report = decode_parity(args.dir, args.arch, args.batch_size)
+
+    print(f"\n*** Decode Parity Report for {args.arch.upper()} on {args.dir} ***")
+    print(f"Images: {report['images']}")
+    for way in ('full', 'draft'):
+        print(f"{way:>6} decode: {report[way]['decode_seconds']:.2f} s, "
+              f"pet label accuracy {report[way]['accuracy'] * 100.0:.1f}%")
+    print(f"Mean absolute difference of preprocessed images: {report['mean_abs_diff']:.4f}")
+    print(f"Top-1 agreement: {report['agreement'] * 100.0:.1f}%")
+
+    if report['agreement'] < args.min_agreement:
+        print(f"FAILED: agreement is below {args.min_agreement * 100.0:.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,35 @@
 #     1. Image Folder as --dir with default value 'pet_images'
 #     2. CNN Model Architecture as --arch with default value 'vgg'
 #     3. Text File with Dog Names as --dogfile with default value 'dognames.txt'
+#     4. Images per forward pass as --batch_size with default value 32
+#     5. Image decoding processes as --workers with default value 0
+#     6. Batches decoded ahead of the model as --prefetch with default value 2
+#     7. Prediction cache file as --cache with default value None (no cache)
+#     8. Prediction cache size cap as --cache_size with default value 1000000
+#     9. Scan sub-folders of the image folder as --recursive (a flag)
+#    10. Timing metrics JSON file as --metrics with default value None
+#    11. Pet/classifier label matching as --match with default value 'substring'
+#    12. Model precision as --precision with default value 'fp32'
+#    13. Frozen TorchScript models as --compile (a flag)
+#    14. CPU profile file as --cpu_profile with default value cpu_profile.json
+#        next to cpu_profile.py (where the auto-tuner saves it)
+#    15. Classifier server address as --server with default value None
+#    16. Cascade thresholds file as --cascade with default value cascade.json
+#        next to cascade.py (where the calibration saves it)
+#    17. Shard of the images to classify as --shard with default value None (all)
+#    18. Folder for shard files as --shard_dir with default value 'shards'
+#    19. Model worker processes as --pool_workers with default value 0 (none)
+#    20. Threads per model worker as --pool_threads with default value 0 (cores / workers)
+#    21. Results database as --results_db with default value None (not stored)
+#    22. Watch the folder for new images as --watch (a flag)
+#    23. Seconds between folder scans as --watch_interval with default value 2.0
+#    24. Watch checkpoint file as --checkpoint with default value 'watch_checkpoint.json'
+#    25. Print a line for every image as --verbose (a flag)
 #
 ##
 import argparse  # This module helps handle command-line arguments
+from cpu_profile import DEFAULT_PROFILE_FILE  # Where cpu_profile.py saves the tuned profile
+from cascade import DEFAULT_CASCADE_FILE  # Where cascade.py saves the calibrated thresholds
 
 def get_input_args():
     """
@@ -22,8 +48,33 @@ def get_input_args():
     
     Command-Line Arguments:
         1. --dir: Folder containing pet images (default is 'pet_images').
-        2. --arch: CNN model architecture (default is 'vgg').
+        2. --arch: CNN model architecture, or several separated by commas (default is 'vgg').
         3. --dogfile: File with dog names (default is 'dognames.txt').
+        4. --batch_size: Images classified per forward pass (default is 32).
+        5. --workers: Processes decoding images in parallel (default is 0).
+        6. --prefetch: Batches decoded ahead of the model (default is 2).
+        7. --cache: SQLite file caching predictions (default is no cache).
+        8. --cache_size: Predictions kept in the cache (default is 1000000).
+        9. --recursive: Also scan sub-folders of --dir (default is off).
+        10. --metrics: JSON file for timing metrics (default is none).
+        11. --match: 'substring' or 'word' label matching (default is 'substring').
+        12. --precision: 'fp32' or 'int8' model precision (default is 'fp32').
+        13. --compile: Use frozen TorchScript models (default is off).
+        14. --cpu_profile: CPU threads/memory format profile (default is the
+                           cpu_profile.json saved by cpu_profile.py).
+        15. --server: Address of a running classifier server (default is none).
+        16. --cascade: Thresholds for --arch cascade (default is the
+                       cascade.json saved by cascade.py).
+        17. --shard: Classify only shard 'i/N' of the images (default is all images).
+        18. --shard_dir: Folder the shard results are written to (default is 'shards').
+        19. --pool_workers: Worker processes sharing the model weights (default is 0, none).
+        20. --pool_threads: Threads of each model worker (default is 0, cores / workers).
+        21. --results_db: SQLite database the per-image results are stored in (default is none).
+        22. --watch: Keep running and classify new or changed images as they arrive.
+        23. --watch_interval: Seconds between folder scans in watch mode (default is 2.0).
+        24. --checkpoint: File remembering the processed images in watch mode
+                          (default is 'watch_checkpoint.json').
+        25. --verbose: Print the classification and is-a-dog flags of every image.
     
     Returns:
         args: An object with the parsed command-line arguments.
@@ -49,7 +100,9 @@ def get_input_args():
         '--arch',  # Name of the argument
         type=str,  # The argument should be a string
         default='vgg',  # Default is the VGG model
-        help="CNN model architecture to use. Default is 'vgg'."  # Description of the argument
+        help="CNN model architecture to use, or several separated by commas "
+             "(e.g. 'resnet,alexnet,vgg'). 'cascade' runs alexnet first and only passes "
+             "low-confidence images on to resnet and vgg. Default is 'vgg'."  # Description of the argument
     )
 
     # Argument 3: File containing dog names
@@ -60,6 +113,195 @@ def get_input_args():
         help="File containing dog names. Default is 'dognames.txt'."  # Description for this argument
     )
 
+    # Argument 4: Number of images classified in one forward pass
+    parser.add_argument(
+        '--batch_size',  # Name of the argument
+        type=int,  # This argument is a whole number
+        default=32,  # Default batch size
+        help="Number of images the CNN model classifies at once. Default is 32."  # Description for this argument
+    )
+
+    # Argument 5: Number of worker processes decoding images
+    parser.add_argument(
+        '--workers',  # Name of the argument
+        type=int,  # This argument is a whole number
+        default=0,  # Default is to decode images in the main process
+        help="Number of worker processes that decode images while the model runs. Default is 0."  # Description for this argument
+    )
+
+    # Argument 6: Number of batches decoded ahead of the model
+    parser.add_argument(
+        '--prefetch',  # Name of the argument
+        type=int,  # This argument is a whole number
+        default=2,  # Default prefetch queue depth
+        help="Number of extra image batches decoded ahead of the model. Default is 2."  # Description for this argument
+    )
+
+    # Argument 7: On-disk cache of earlier predictions
+    parser.add_argument(
+        '--cache',  # Name of the argument
+        type=str,  # The argument should be a string (a file path)
+        default=None,  # Default is no cache
+        help="SQLite file used to cache predictions between runs. Default is no cache."  # Description for this argument
+    )
+
+    # Argument 8: Size cap of the prediction cache
+    parser.add_argument(
+        '--cache_size',  # Name of the argument
+        type=int,  # This argument is a whole number
+        default=1000000,  # Default number of cached predictions
+        help="Maximum number of predictions kept in the cache. Default is 1000000."  # Description for this argument
+    )
+
+    # Argument 9: Whether to also scan sub-folders of the image folder
+    parser.add_argument(
+        '--recursive',  # Name of the argument
+        action='store_true',  # This argument is a flag (no value needed)
+        help="Also classify images in sub-folders of --dir."  # Description for this argument
+    )
+
+    # Argument 10: JSON file for the run's timing metrics
+    parser.add_argument(
+        '--metrics',  # Name of the argument
+        type=str,  # The argument should be a string (a file path)
+        default=None,  # Default is no metrics file
+        help="JSON file to write per-stage timings and batch latencies to. Default is none."  # Description for this argument
+    )
+
+    # Argument 11: How pet labels are matched against classifier labels
+    parser.add_argument(
+        '--match',  # Name of the argument
+        type=str,  # The argument should be a string
+        choices=['word', 'substring'],  # The two ways of matching
+        default='substring',  # Default is the original substring check
+        help="'substring' matches the pet label anywhere in the classifier label (the original "
+             "check); 'word' matches it only as whole words of a class name (plurals allowed). "
+             "Default is 'substring'."  # Description for this argument
+    )
+
+    # Argument 12: Numeric precision of the CNN model
+    parser.add_argument(
+        '--precision',  # Name of the argument
+        type=str,  # The argument should be a string
+        choices=['fp32', 'int8'],  # Float model or int8 quantized model
+        default='fp32',  # Default is the float model
+        help="'int8' runs the model with int8 quantized fully connected layers "
+             "(faster and smaller on CPU). Default is 'fp32'."  # Description for this argument
+    )
+
+    # Argument 13: Whether to use frozen TorchScript models
+    parser.add_argument(
+        '--compile',  # Name of the argument
+        action='store_true',  # This argument is a flag (no value needed)
+        help="Run frozen TorchScript versions of the models, cached on disk for later runs."  # Description for this argument
+    )
+
+    # Argument 14: CPU profile made by the auto-tuner (cpu_profile.py)
+    parser.add_argument(
+        '--cpu_profile',  # Name of the argument
+        type=str,  # The argument should be a string (a file path)
+        default=DEFAULT_PROFILE_FILE,  # The file the auto-tuner writes, wherever we're run from
+        help="JSON file with the CPU thread, core pinning and memory format settings "
+             "(made by cpu_profile.py). Used only if the file exists; '' ignores it. "
+             "Default is the cpu_profile.json next to cpu_profile.py."  # Description for this argument
+    )
+
+    # Argument 15: Running classifier server to send the images to
+    parser.add_argument(
+        '--server',  # Name of the argument
+        type=str,  # The argument should be a string (an address)
+        default=None,  # Default is to load the models in this program
+        help="Address of a running classifier_server.py (e.g. 'http://127.0.0.1:8765'). "
+             "Default is none (the models are loaded here)."  # Description for this argument
+    )
+
+    # Argument 16: Calibrated thresholds of the cascade
+    parser.add_argument(
+        '--cascade',  # Name of the argument
+        type=str,  # The argument should be a string (a file path)
+        default=DEFAULT_CASCADE_FILE,  # The file cascade.py saves by default
+        help="JSON file with the cascade thresholds (made by cascade.py) used by --arch cascade. "
+             "Built-in thresholds are used if the file doesn't exist. Default is the "
+             "cascade.json that cascade.py saves next to itself."  # Description for this argument
+    )
+
+    # Argument 17: Shard of the images to classify
+    parser.add_argument(
+        '--shard',  # Name of the argument
+        type=str,  # The argument should be a string like '0/4'
+        default=None,  # Default is every image
+        help="Classify only shard i of N (counted from 0), given as 'i/N', and write its "
+             "results to --shard_dir for merge_shards.py. Default is all images."  # Description for this argument
+    )
+
+    # Argument 18: Folder for the shard files
+    parser.add_argument(
+        '--shard_dir',  # Name of the argument
+        type=str,  # The argument should be a string (a folder path)
+        default='shards',  # Default folder
+        help="Folder the shard results are written to with --shard. Default is 'shards'."  # Description for this argument
+    )
+
+    # Argument 19: Worker processes that run the models
+    parser.add_argument(
+        '--pool_workers',  # Name of the argument
+        type=int,  # The argument should be an integer
+        default=0,  # Default is to run the models in this process
+        help="Number of worker processes running the models, sharing one copy of the "
+             "weights in shared memory. Default is 0 (the models run in this process)."  # Description for this argument
+    )
+
+    # Argument 20: Threads of each model worker
+    parser.add_argument(
+        '--pool_threads',  # Name of the argument
+        type=int,  # The argument should be an integer
+        default=0,  # Default splits the cores between the workers
+        help="Intra-op threads of each model worker. Default is 0 (CPU cores / --pool_workers)."  # Description for this argument
+    )
+
+    # Argument 21: Database for the per-image results
+    parser.add_argument(
+        '--results_db',  # Name of the argument
+        type=str,  # The argument should be a string (a file path)
+        default=None,  # Default is not to store the results
+        help="SQLite database the per-image results of every model are stored in, "
+             "to query later with results_store.py. Default is none."  # Description for this argument
+    )
+
+    # Argument 22: Whether to keep watching the folder for new images
+    parser.add_argument(
+        '--watch',  # Name of the argument
+        action='store_true',  # This argument is a flag (no value needed)
+        help="Keep running and classify new or changed images in --dir as they arrive, "
+             "appending them to --results_db and printing the running statistics."  # Description for this argument
+    )
+
+    # Argument 23: Seconds between folder scans in watch mode
+    parser.add_argument(
+        '--watch_interval',  # Name of the argument
+        type=float,  # The argument should be a number of seconds
+        default=2.0,  # Default interval
+        help="Seconds between folder scans in watch mode (the longest wait when inotify "
+             "is available). Default is 2.0."  # Description for this argument
+    )
+
+    # Argument 24: Checkpoint file of the watch mode
+    parser.add_argument(
+        '--checkpoint',  # Name of the argument
+        type=str,  # The argument should be a string (a file path)
+        default='watch_checkpoint.json',  # Default checkpoint file
+        help="File remembering the images already processed in watch mode, so a restarted "
+             "watch only classifies new or changed images. Default is 'watch_checkpoint.json'."  # Description for this argument
+    )
+
+    # Argument 25: Whether to print a line for every image
+    parser.add_argument(
+        '--verbose',  # Name of the argument
+        action='store_true',  # This argument is a flag (no value needed)
+        help="Print the classification and is-a-dog flags of every image (slow for large "
+             "folders). Default is off."  # Description for this argument
+    )
+
     # Step 3: Parse the arguments
     # This will take the arguments from the command line and store them in an object
     args = parser.parse_args()
@@ -69,6 +311,28 @@ def get_input_args():
     print(f"  --dir: {args.dir}")  # Prints the directory path
     print(f"  --arch: {args.arch}")  # Prints the CNN model name
     print(f"  --dogfile: {args.dogfile}")  # Prints the dog file name
+    print(f"  --batch_size: {args.batch_size}")  # Prints the batch size
+    print(f"  --workers: {args.workers}")  # Prints the number of decode workers
+    print(f"  --prefetch: {args.prefetch}")  # Prints the prefetch queue depth
+    print(f"  --cache: {args.cache}")  # Prints the prediction cache file
+    print(f"  --cache_size: {args.cache_size}")  # Prints the cache size cap
+    print(f"  --recursive: {args.recursive}")  # Prints whether sub-folders are scanned
+    print(f"  --metrics: {args.metrics}")  # Prints the metrics file
+    print(f"  --match: {args.match}")  # Prints how labels are matched
+    print(f"  --precision: {args.precision}")  # Prints the model precision
+    print(f"  --compile: {args.compile}")  # Prints whether compiled models are used
+    print(f"  --cpu_profile: {args.cpu_profile}")  # Prints the CPU profile file
+    print(f"  --server: {args.server}")  # Prints the classifier server address
+    print(f"  --cascade: {args.cascade}")  # Prints the cascade thresholds file
+    print(f"  --shard: {args.shard}")  # Prints the shard to classify
+    print(f"  --shard_dir: {args.shard_dir}")  # Prints the shard folder
+    print(f"  --pool_workers: {args.pool_workers}")  # Prints the number of model workers
+    print(f"  --pool_threads: {args.pool_threads}")  # Prints the threads per model worker
+    print(f"  --results_db: {args.results_db}")  # Prints the results database
+    print(f"  --watch: {args.watch}")  # Prints whether the folder is watched
+    print(f"  --watch_interval: {args.watch_interval}")  # Prints the seconds between scans
+    print(f"  --checkpoint: {args.checkpoint}")  # Prints the watch checkpoint file
+    print(f"  --verbose: {args.verbose}")  # Prints whether every image gets a line
 
     # Return the parsed arguments object
     return args
@@ -14,65 +14,103 @@
 #          The results_dic dictionary has a 'key' that's the image filename and
 #          a 'value' that's a list. This list will contain the following item
 #          at index 0 : pet image label (string).
+#          The folder is read by the generator scan_pet_images, which yields
+#          one (filename, pet label) pair at a time while it scans instead of
+#          listing the whole folder first. get_pet_labels still collects every
+#          pair into the results table before check_images.py classifies
+#          anything, because the prediction cache lookup and the per-model
+#          results tables need all the filenames up front.
+#          An image pack (see image_pack.py) can be given in place of the
+#          folder; its labels are then read from the pack's index.
 #
 ##
-from os import listdir  # Importing listdir to access the files in a folder
+import os  # To scan the files in a folder (and its sub-folders)
+import re  # To parse pet labels from filenames
+from results_table import ResultsTable  # Column-based results dictionary
+from image_pack import ImagePack, is_image_pack  # Labels of already decoded images
 
-def get_pet_labels(image_dir):
+# File extensions that are treated as images
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+# Matches each part of a lowercase filename, split by underscores, that is
+# made of letters only. Example: "golden_retriever_123.jpg" -> golden, retriever
+PET_LABEL_WORDS = re.compile(r'(?:^|(?<=_))[^\W\d_]+(?=_|\Z)')
+
+
+def pet_label_from_filename(filename):
+    """
+    Returns the pet label of an image filename: the parts of the filename
+    (split by underscores) that contain only letters, lowercase and joined
+    by spaces. Example: "Golden_retriever_05182.jpg" -> "golden retriever".
+    """
+    return " ".join(PET_LABEL_WORDS.findall(filename.lower()))
+
+
+def scan_pet_images(image_dir, recursive=False, extensions=IMAGE_EXTENSIONS):
+    """
+    Scans a folder for pet images and yields them one at a time.
+
+    Parameters:
+        image_dir (str): Path to the folder containing pet images.
+        recursive (bool): Whether to also scan sub-folders.
+        extensions (tuple or None): Lowercase file extensions to accept
+                                    (None accepts every file).
+
+    Yields:
+        tuple: (filename, pet label). For files in sub-folders the filename
+               is the path relative to image_dir, e.g. "dogs/Beagle_01125.jpg".
+    """
+    # Folders still to scan, as (path on disk, path relative to image_dir)
+    pending = [(image_dir, '')]
+    while pending:
+        folder, prefix = pending.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                # Ignore hidden files and folders like .DS_Store (these start with '.')
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    if recursive:
+                        pending.append((entry.path, prefix + entry.name + '/'))
+                    continue
+                if extensions is not None and not entry.name.lower().endswith(extensions):
+                    continue
+                yield prefix + entry.name, pet_label_from_filename(entry.name)
+
+
+def get_pet_labels(image_dir, recursive=False, extensions=IMAGE_EXTENSIONS):
     """
     Creates a dictionary (`results_dic`) with pet labels extracted from image filenames.
     These labels are in lowercase and free from extra spaces.
 
     Parameters:
-        image_dir (str): Path to the folder containing pet images.
+        image_dir (str): Path to the folder containing pet images, or to an
+                         image pack made from it.
+        recursive (bool): Whether to also include images in sub-folders.
+        extensions (tuple or None): Lowercase file extensions to accept
+                                    (None accepts every file).
 
     Returns:
-        results_dic (dict): Dictionary with:
+        results_dic (ResultsTable): Results table that works as a dictionary with:
             - Key: Image filename (string)
             - Value: List with one item:
                      - Index 0: Pet label (string)
     """
-    # Create an empty dictionary to store results
-    results_dic = {}
-
-    # Step 1: Get all filenames in the directory
-    # listdir() gives a list of all file names in the specified folder
-    filenames = listdir(image_dir)
-
-    # Debugging: Print all filenames for verification
-    print("Filenames in directory:", filenames)  # Optional debug print
-
-    # Step 2: Loop through each filename to create labels
-    for filename in filenames:
-        # Ignore hidden files like .DS_Store (these start with '.')
-        if filename[0] != ".":  # Check if the first character is not '.'
-            # Debugging: Print each filename being processed
-            print(f"Processing file: {filename}")
-
-            # Step 3: Split the filename into parts by underscore
-            # Example: "golden_retriever_123.jpg" -> ["golden", "retriever", "123.jpg"]
-            parts = filename.lower().split("_")  # Convert to lowercase before splitting
-
-            # Debugging: Print the parts of the filename
-            print(f"Filename parts: {parts}")
-
-            # Step 4: Filter out non-alphabetic parts (e.g., numbers, file extensions)
-            # Join the remaining words with a space to create the label
-            pet_label = " ".join([word for word in parts if word.isalpha()]).strip()
-
-            # Debugging: Print the generated pet label
-            print(f"Generated pet label: '{pet_label}'")
+    # An image pack already holds the filenames and pet labels
+    if is_image_pack(image_dir):
+        pack = ImagePack(image_dir)
+        return ResultsTable(pack.filenames, pack.pet_labels)
 
-            # Step 5: Add the filename and label to the dictionary
-            # Check if the filename is already in the dictionary
-            if filename not in results_dic:
-                results_dic[filename] = [pet_label]
-            else:
-                # Print a warning if a duplicate filename is encountered
-                print(f"Warning: Duplicate filename '{filename}' detected!")
+    # Create an empty results table to store results
+    results_dic = ResultsTable()
 
-    # Debugging: Print the final dictionary before returning it
-    print("Final results dictionary:", results_dic)
+    # Add each image to the table as the scanner finds it (the whole folder
+    # is read before this returns)
+    for filename, pet_label in scan_pet_images(image_dir, recursive, extensions):
+        # append() returns False if the filename is already in the table
+        if not results_dic.append(filename, pet_label):
+            # Print a warning if a duplicate filename is encountered
+            print(f"Warning: Duplicate filename '{filename}' detected!")
 
-    # Return the dictionary with filenames and labels
-    return results_dic
\ No newline at end of file
+    # Return the table with filenames and labels
+    return results_dic
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/image_pack.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Create an "image pack": a folder holding the images of an image
+#          folder already decoded, resized and cropped to 224x224. A pack has:
+#            images.npy - all crops as one uint8 [N, 224, 224, 3] array
+#            index.json - filename, pet label and file hash of each image,
+#                         plus the preprocessing version of the crops
+#          The array is memory-mapped when the pack is opened, so batches are
+#          read straight from the file without decoding any JPEG. A pack can
+#          be given to check_images.py as --dir in place of the image folder.
+#
+# Usage: python image_pack.py --dir pet_images --output pet_images.pack
+#
+##
+import argparse  # For the command line arguments of the pack command
+import json  # For the index file
+import os  # For file paths
+import numpy as np  # For the memory-mapped image array
+
+# Files inside a pack folder
+PACK_INDEX_FILE = 'index.json'
+PACK_IMAGES_FILE = 'images.npy'
+
+# Change this when the layout of a pack changes
+PACK_VERSION = 1
+
+
+def is_image_pack(path):
+    """True when path is an image pack folder (and not a plain image folder)."""
+    return os.path.isfile(os.path.join(path, PACK_INDEX_FILE))
+
+
+class ImagePack:
+    """
+    An image pack opened for reading.
+
+    Parameters:
+        path (str): Path to the pack folder.
+
+    Attributes:
+        filenames (list): Image filename of each row.
+        pet_labels (list): Pet label of each row.
+        hashes (list): SHA-256 hash of each original image file.
+        preprocess (str): Preprocessing version the crops were made with.
+        images (numpy.ndarray): Memory-mapped uint8 [N, H, W, C] crops.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, PACK_INDEX_FILE)) as index_file:
+            index = json.load(index_file)
+        if index.get('version') != PACK_VERSION:
+            raise ValueError(f"Image pack {path} has version {index.get('version')}, "
+                             f"expected {PACK_VERSION}. Please pack the images again.")
+        self.filenames = index['filenames']
+        self.pet_labels = index['pet_labels']
+        self.hashes = index['hashes']
+        self.preprocess = index['preprocess']
+        # Copy-on-write mapping: pages are read from the file only when used
+        # and the file itself is never changed
+        self.images = np.load(os.path.join(path, PACK_IMAGES_FILE), mmap_mode='c')
+        self._rows = {filename: row for row, filename in enumerate(self.filenames)}
+
+    def row(self, filename):
+        """Returns the row of an image filename."""
+        return self._rows[filename]
+
+    def __len__(self):
+        return len(self.filenames)
+
+
+def pack_images(image_dir, pack_dir, recursive=False):
+    """
+    Decodes, resizes and crops every image of a folder into a new image pack.
+
+    Parameters:
+        image_dir (str): Path to the folder containing the images.
+        pack_dir (str): Path of the pack folder to create (or replace).
+        recursive (bool): Whether to also pack images in sub-folders.
+
+    Returns:
+        int: Number of images packed.
+    """
+    # Imported here so reading a pack (e.g. its labels) doesn't need PyTorch
+    from numpy.lib.format import open_memmap
+    from classifier import load_image_crop, PREPROCESS_VERSION
+    from get_pet_labels import scan_pet_images
+    from prediction_cache import hash_image_file
+
+    images = sorted(scan_pet_images(image_dir, recursive))
+    os.makedirs(pack_dir, exist_ok=True)
+
+    # Write the crops straight into the memory-mapped file, one at a time
+    images_path = os.path.join(pack_dir, PACK_IMAGES_FILE)
+    temp_images_path = f"{images_path}.{os.getpid()}.tmp.npy"
+    crops = open_memmap(temp_images_path, mode='w+', dtype=np.uint8,
+                        shape=(len(images), 224, 224, 3))
+    hashes = []
+    for row, (filename, pet_label) in enumerate(images):
+        img_path = os.path.join(image_dir, filename)
+        crops[row] = load_image_crop(img_path)
+        hashes.append(hash_image_file(img_path))
+    crops.flush()
+    del crops
+    os.replace(temp_images_path, images_path)
+
+    # Write the index last, so a pack is only complete once it has an index
+    index = {
+        'version': PACK_VERSION,
+        'preprocess': PREPROCESS_VERSION,
+        'filenames': [filename for filename, pet_label in images],
+        'pet_labels': [pet_label for filename, pet_label in images],
+        'hashes': hashes,
+    }
+    index_path = os.path.join(pack_dir, PACK_INDEX_FILE)
+    with open(f"{index_path}.tmp", 'w') as index_file:
+        json.dump(index, index_file)
+    os.replace(f"{index_path}.tmp", index_path)
+    return len(images)
+
+
+def main():
+    """
+    Packs an image folder from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Decodes and crops an image folder once into an image pack.")
+    parser.add_argument('--dir', type=str, default='pet_images',
+                        help="Folder containing the images. Default is 'pet_images'.")
+    parser.add_argument('--output', type=str, default=None,
+                        help="Pack folder to create. Default is the image folder name + '.pack'.")
+    parser.add_argument('--recursive', action='store_true',
+                        help="Also pack images in sub-folders of --dir.")
+    args = parser.parse_args()
+
+    pack_dir = args.output or os.path.normpath(args.dir) + '.pack'
+    n_images = pack_images(args.dir, pack_dir, args.recursive)
+    print(f"Packed {n_images} images from {args.dir} into {pack_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/image_pipeline.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 18.11.2024
+# REVISED DATE:
+# PURPOSE: Create a function iter_image_batches that decodes and preprocesses
+#          images into batches for the classifier. With workers > 0 a pool of
+#          worker processes opens, resizes, crops and normalizes the images
+#          while the main process runs the model on earlier batches, so image
+#          decoding overlaps inference. Finished batches are handed over as
+#          shared-memory tensors (no copy between processes) and at most
+#          workers + prefetch batches are in flight at any time.
+#          The function iter_pack_batches reads batches from an image pack
+#          (see image_pack.py) instead, where no image needs decoding.
+#
+##
+from collections import deque  # A simple queue of batches that are in flight
+from itertools import islice  # To cut the stream of paths into batches
+import torch  # For stacking images into batches
+import torch.multiprocessing as multiprocessing  # Process pool that shares tensors
+from classifier import load_image_tensor, crops_to_tensor  # Opens and preprocesses images
+
+
+def _init_worker():
+    # Each worker decodes one batch at a time, so one thread per worker is
+    # enough and keeps the workers from competing with the model for cores
+    torch.set_num_threads(1)
+
+
+def load_image_batch(img_paths):
+    """
+    Opens and preprocesses a list of images into one [N, C, H, W] tensor.
+    The tensor is moved to shared memory so it can be passed to another
+    process without copying.
+    """
+    img_batch = torch.stack([load_image_tensor(path) for path in img_paths])
+    return img_batch.share_memory_()
+
+
+def iter_image_batches(img_paths, batch_size=32, workers=0, prefetch=2):
+    """
+    Yields preprocessed batches of images, in the same order as img_paths.
+
+    Parameters:
+        img_paths (iterable): Paths to the image files. This can be a
+                              generator (e.g. from scan_pet_images); paths
+                              are only taken from it as batches are needed.
+        batch_size (int): Number of images in each batch.
+        workers (int): Number of worker processes decoding images
+                       (0 decodes in this process, one batch at a time).
+        prefetch (int): Number of extra batches decoded ahead of the model,
+                        on top of one batch per worker.
+
+    Yields:
+        torch.Tensor: A [N, C, H, W] batch with up to batch_size images.
+    """
+    # Split the paths into batches of batch_size images, lazily
+    img_paths = iter(img_paths)
+    batches = iter(lambda: list(islice(img_paths, batch_size)), [])
+
+    # Without workers, decode each batch right before it's needed
+    if workers <= 0:
+        for batch_paths in batches:
+            yield load_image_batch(batch_paths)
+        return
+
+    # With workers, keep up to workers + prefetch batches in flight so the
+    # workers stay busy while the model works on the oldest finished batch
+    max_in_flight = workers + max(prefetch, 0)
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        in_flight = deque()
+        for batch_paths in batches:
+            # Queue the batch for decoding; once the queue is full the model
+            # has to take a batch before the next one is queued
+            in_flight.append(pool.apply_async(load_image_batch, (batch_paths,)))
+            if len(in_flight) >= max_in_flight:
+                # Hand the oldest batch to the model (waits until it's decoded)
+                yield in_flight.popleft().get()
+
+        # Hand over the batches that are still in flight
+        while in_flight:
+            yield in_flight.popleft().get()
+
+
+def iter_pack_batches(pack, rows, batch_size=32):
+    """
+    Yields preprocessed batches of images from an image pack.
+
+    Parameters:
+        pack (ImagePack): An opened image pack.
+        rows (list): Rows of the pack to yield, in order.
+        batch_size (int): Number of images in each batch.
+
+    Yields:
+        torch.Tensor: A [N, C, H, W] batch with up to batch_size images.
+    """
+    for start in range(0, len(rows), batch_size):
+        batch_rows = rows[start:start + batch_size]
+        first, last = batch_rows[0], batch_rows[-1]
+        if last - first + 1 == len(batch_rows):
+            # Consecutive rows: a view of the memory-mapped file, no copy
+            crops = pack.images[first:last + 1]
+        else:
+            crops = pack.images[batch_rows]
+        yield crops_to_tensor(torch.from_numpy(crops))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/imagenet_labels.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 19.11.2024
+# REVISED DATE:
+# PURPOSE: Create a function load_imagenet_labels that returns the 1000
+#          ImageNet class labels from imagenet1000_clsid_to_human.txt, found
+#          next to this module (not in the current working directory). For
+#          each class id it provides:
+#            labels     - the label as written in the file
+#            normalized - the label in lowercase without extra spaces
+#            synonyms   - the normalized label split into its comma-separated names
+#          Parsing the text file is slow, so the parsed table is saved as a
+#          binary file in __pycache__ and loaded from there on later runs. The
+#          binary file is rebuilt automatically whenever the text file changes.
+#
+##
+import ast  # For safely reading the dictionary from the text file
+from collections import namedtuple  # Holds the three label tables
+from functools import lru_cache  # To load the table once per process
+import os  # To find the files next to this module
+import pickle  # To save and load the binary table
+
+# The text file with the ImageNet class id -> label dictionary
+IMAGENET_LABELS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    'imagenet1000_clsid_to_human.txt')
+
+# The binary table built from the text file
+IMAGENET_LABELS_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     '__pycache__', 'imagenet1000_clsid_to_human.pickle')
+
+# Change this when the layout of the binary table changes
+TABLE_VERSION = 1
+
+ImageNetLabels = namedtuple('ImageNetLabels', ['labels', 'normalized', 'synonyms'])
+
+
+def _source_stamp(source):
+    # The text file's size and modification time identify its version
+    stat = os.stat(source)
+    return (TABLE_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+def build_imagenet_labels(source=IMAGENET_LABELS_FILE):
+    """
+    Parses the ImageNet labels text file into an ImageNetLabels table.
+    """
+    with open(source) as imagenet_classes_file:
+        imagenet_classes_dict = ast.literal_eval(imagenet_classes_file.read())
+
+    labels = tuple(imagenet_classes_dict[class_id]
+                   for class_id in range(max(imagenet_classes_dict) + 1))
+    normalized = tuple(label.lower().strip() for label in labels)
+    synonyms = tuple(tuple(name.strip() for name in label.split(',')) for label in normalized)
+    return ImageNetLabels(labels, normalized, synonyms)
+
+
+@lru_cache(maxsize=4)
+def load_imagenet_labels(source=IMAGENET_LABELS_FILE, cache=IMAGENET_LABELS_CACHE):
+    """
+    Returns the ImageNetLabels table, from the binary file when it's up to
+    date with the text file, otherwise by parsing (and re-saving) it.
+
+    Parameters:
+        source (str): Path to the ImageNet labels text file.
+        cache (str): Path to the binary table file.
+
+    Returns:
+        ImageNetLabels: labels, normalized and synonyms, each a tuple indexed
+                        by ImageNet class id.
+    """
+    stamp = _source_stamp(source)
+
+    # Use the binary table if it was built from this version of the text file
+    try:
+        with open(cache, 'rb') as cache_file:
+            cached_stamp, table = pickle.load(cache_file)
+        if cached_stamp == stamp:
+            return ImageNetLabels(*table)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        pass
+
+    # Otherwise parse the text file and save the binary table for next time
+    table = build_imagenet_labels(source)
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        # Write to a temporary file first so other processes never see a half-written table
+        temp_path = f"{cache}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump((stamp, tuple(table)), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache)
+    except OSError:
+        pass  # A read-only folder only means the table is parsed every time
+    return table
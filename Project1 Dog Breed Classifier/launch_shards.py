@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/launch_shards.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Run a sharded evaluation on this machine: start N check_images.py
+#          processes (--shard 0/N ... N-1/N), give each an equal share of the
+#          CPU cores, wait for all of them and merge their shard files into
+#          the single-run report. Every other argument is passed on to
+#          check_images.py. Each shard's own output goes to a log file in
+#          the shard folder. The shards are started with an empty
+#          --cpu_profile, so a saved CPU profile doesn't override the
+#          thread counts given to them here.
+#          Only the shard files of this run (this image folder and shard
+#          count) are merged, even if the folder holds older ones.
+#
+# Usage: python launch_shards.py --shards 4 --dir pet_images --arch resnet,vgg
+#
+##
+import argparse  # For the command line arguments
+import os  # For CPU counts, paths and environment variables
+import subprocess  # To start the shard processes
+import sys  # To start the shard processes with the same Python
+from merge_shards import merge_shards  # To merge the finished shards
+
+
+def launch_shards(n_shards, shard_dir, check_images_args, script='check_images.py'):
+    """
+    Runs n_shards shard processes and waits for them.
+
+    Parameters:
+        n_shards (int): Number of shard processes.
+        shard_dir (str): Folder for the shard files and logs.
+        check_images_args (list): Other command line arguments for check_images.py.
+        script (str): The script each shard process runs.
+
+    Returns:
+        list: Exit status of each shard process.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    # Share the cores so the shards don't compete for them
+    threads = max(1, (os.cpu_count() or 1) // n_shards)
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+
+    processes = []
+    for shard_index in range(n_shards):
+        log_path = os.path.join(shard_dir, f"shard{shard_index}of{n_shards}.log")
+        with open(log_path, 'w') as log_file:
+            # Last on the command line, so these win over check_images_args
+            command = [sys.executable, script, *check_images_args,
+                       '--shard', f"{shard_index}/{n_shards}", '--shard_dir', shard_dir,
+                       '--cpu_profile', '']
+            processes.append(subprocess.Popen(command, stdout=log_file,
+                                              stderr=subprocess.STDOUT, env=env))
+        print(f"Started shard {shard_index}/{n_shards} (log: {log_path})")
+    return [process.wait() for process in processes]
+
+
+def main():
+    """
+    Runs the shards and prints the merged report.
+    """
+    parser = argparse.ArgumentParser(
+        description="Runs check_images.py in N shard processes and merges the results.")
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1,
+                        help="Number of shard processes. Default is the number of CPU cores.")
+    parser.add_argument('--shard_dir', type=str, default='shards',
+                        help="Folder for the shard files and logs. Default is 'shards'.")
+    parser.add_argument('--script', type=str, default='check_images.py',
+                        help="Script run by each shard. Default is 'check_images.py'.")
+    args, check_images_args = parser.parse_known_args()
+    # The image folder the shards classify (same default as check_images.py),
+    # to merge only this run's shard files
+    dir_parser = argparse.ArgumentParser(add_help=False)
+    dir_parser.add_argument('--dir', type=str, default='pet_images')
+    image_dir = dir_parser.parse_known_args(check_images_args)[0].dir
+
+    statuses = launch_shards(args.shards, args.shard_dir, check_images_args, args.script)
+    failed = [shard_index for shard_index, status in enumerate(statuses) if status != 0]
+    if failed:
+        print(f"Shards {failed} failed; see their logs in {args.shard_dir}")
+        sys.exit(1)
+    merge_shards(args.shard_dir, image_dir=image_dir)
+
+
+if __name__ == "__main__":
+    main()
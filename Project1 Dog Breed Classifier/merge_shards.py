@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/merge_shards.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Merge the shard files written by check_images.py --shard i/N into
+#          the report a single run over every image would print: the results
+#          summary, the incorrectly classified dogs and breeds (in the same
+#          order) and, for several models, the comparison table.
+#          Only the shard files of one run are merged: with --dir, those of
+#          the run over that image folder; otherwise the folder must hold a
+#          single run (one shard count and image folder) per model.
+#
+# Usage: python merge_shards.py --shard_dir shards --dir pet_images
+#
+##
+import argparse  # For the command line arguments
+import glob  # To find the shard files
+import json  # To read the model name of each shard file and write merged stats
+import os  # For the shard file paths
+from calculates_results_stats import calculates_results_stats  # To double-check the merge
+from print_results import print_results, print_comparison  # The final report
+from sharding import merge_shard_files, shard_run_key  # Combines the shard files
+
+
+def find_shard_files(shard_dir, image_dir=None):
+    """
+    Returns CNN model architecture -> list of its shard files in shard_dir.
+
+    Parameters:
+        shard_dir (str): Folder holding the shard files.
+        image_dir (str or None): Only the shard files of runs over this image
+                                 folder (None takes every run).
+
+    Raises ValueError if a model has shard files of more than one run.
+    """
+    paths_by_run = {}  # (arch, run key) -> shard files
+    for path in sorted(glob.glob(os.path.join(shard_dir, '*_shard*of*.json'))):
+        with open(path) as shard_file:
+            shard = json.load(shard_file)
+        run_key = shard.get('run')
+        if image_dir is not None and run_key != shard_run_key(image_dir, shard['shard'][1]):
+            continue  # Leftover of a run over another folder
+        paths_by_run.setdefault((shard['arch'], run_key), []).append(path)
+
+    paths_by_arch = {}
+    for (arch, run_key), paths in paths_by_run.items():
+        if arch in paths_by_arch:
+            raise ValueError(f"{shard_dir} holds shard files of several runs of {arch}; "
+                             f"give the image folder (--dir) or remove the old shard files")
+        paths_by_arch[arch] = paths
+    return paths_by_arch
+
+
+def merge_shards(shard_dir, output=None, image_dir=None):
+    """
+    Merges and prints the shard files of every model in shard_dir.
+
+    Parameters:
+        shard_dir (str): Folder holding the shard files.
+        output (str or None): JSON file to write the merged statistics to.
+        image_dir (str or None): Only merge the run over this image folder.
+
+    Returns:
+        dict: CNN model architecture -> merged results_stats_dic.
+    """
+    paths_by_arch = find_shard_files(shard_dir, image_dir)
+    if not paths_by_arch:
+        raise ValueError(f"No shard files found in {shard_dir}")
+
+    results_stats_by_arch = {}
+    timings = {}
+    merged = {}
+    for arch, paths in paths_by_arch.items():
+        results, accumulator, timings[arch] = merge_shard_files(paths)
+        results_stats = accumulator.results_stats()
+        # The merged counts must agree with counting the merged results again
+        if results_stats != calculates_results_stats(results):
+            raise ValueError(f"Merged statistics of {arch} don't match its merged results")
+        results_stats_by_arch[arch] = results_stats
+        merged[arch] = json.loads(accumulator.to_json())
+        print_results(results, results_stats, arch, True, True)
+
+    # Compare the models side by side when more than one was used
+    if len(results_stats_by_arch) > 1:
+        print_comparison(results_stats_by_arch, timings)
+
+    if output:
+        with open(output, 'w') as output_file:
+            json.dump({'results_stats': results_stats_by_arch, 'accumulators': merged},
+                      output_file, indent=2)
+    return results_stats_by_arch
+
+
+def main():
+    """
+    Merges the shard files from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Merges the shard files of a sharded run.")
+    parser.add_argument('--shard_dir', type=str, default='shards',
+                        help="Folder holding the shard files. Default is 'shards'.")
+    parser.add_argument('--output', type=str, default=None,
+                        help="JSON file to write the merged statistics to. Default is none.")
+    parser.add_argument('--dir', type=str, default=None,
+                        help="Only merge the run over this image folder. Default is the only run "
+                             "in --shard_dir.")
+    args = parser.parse_args()
+    merge_shards(args.shard_dir, args.output, args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/model_cache.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Create functions that decide where prepared versions of the CNN
+#          models (for example int8 quantized models) are stored on disk, so
+#          they can be loaded directly on later runs instead of being prepared
+#          again. Each file name holds the model name, the kind of file, the
+#          weights fingerprint and the PyTorch version, so a file is never
+#          reused with different weights or a different PyTorch.
+#          The folder is 'model_cache' next to this module, or the folder
+#          given by the CLASSIFIER_MODEL_CACHE environment variable.
+#
+##
+import os  # To build file paths and replace files safely
+import re  # To make names safe to use in file names
+import torch  # For the PyTorch version and saving files
+
+# Folder that holds the prepared model files
+MODEL_CACHE_DIR = os.environ.get(
+    'CLASSIFIER_MODEL_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache'))
+
+
+def cached_model_path(name, kind, fingerprint, suffix='.pt'):
+    """
+    Returns the path of a prepared model file.
+
+    Parameters:
+        name (str): CNN model architecture (e.g. 'vgg').
+        kind (str): What the file holds (e.g. 'int8-dynamic').
+        fingerprint (str): Fingerprint of the model weights.
+        suffix (str): File extension.
+
+    Returns:
+        str: Path inside MODEL_CACHE_DIR.
+    """
+    key = f"{name}-{kind}-{fingerprint}-torch{torch.__version__}"
+    # Keep only characters that are safe in file names
+    key = re.sub(r'[^A-Za-z0-9._-]+', '_', key)
+    return os.path.join(MODEL_CACHE_DIR, key + suffix)
+
+
+def save_atomic(save_function, path):
+    """
+    Calls save_function(temporary_path) and then moves the file to path, so
+    other processes never load a half-written file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    save_function(temp_path)
+    os.replace(temp_path, path)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/model_pool.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Create a ModelPool that runs the CNN models in several worker
+#          processes without a copy of the weights per process. The parent
+#          loads each model once and moves its parameters into shared memory,
+#          then forks the workers, which all read the same weights. Batches
+#          of images are put on a task queue; each worker takes the next
+#          batch, runs it with its own number of intra-op threads and sends
+#          the predictions back. Memory stays about the size of one copy of
+#          the models while throughput grows with the number of workers.
+#          classify_images_multi uses a pool when one is given (--pool_workers).
+#          If a worker dies (e.g. killed by the out-of-memory killer), the
+#          batches still waiting fail with an error and the pool shuts down,
+#          instead of the caller waiting for them forever.
+#
+##
+import os  # For the number of CPU cores
+import queue  # For the timeout while waiting for results
+import threading  # The thread that collects results from the workers
+from time import time  # To time each batch in the worker
+import torch  # For the thread count of each worker
+import torch.multiprocessing as multiprocessing  # Queues that share tensors
+from classifier import models, predict_tensors  # The models
+
+# Seconds between checks that the workers are still alive
+WORKER_CHECK_INTERVAL = 1.0
+
+
+def _worker_loop(tasks, results, threads):
+    # Runs in each forked worker: the models (and their shared weights) were
+    # inherited from the parent, so only the thread count needs setting
+    torch.set_num_threads(threads)
+    while True:
+        task = tasks.get()
+        if task is None:  # The pool is closing
+            break
+        task_id, img_batch, arch = task
+        try:
+            start_time = time()
+            class_ids = predict_tensors(img_batch, arch)
+            results.put((task_id, class_ids, time() - start_time, None))
+        except Exception as error:  # Send the error back to the waiting caller
+            results.put((task_id, None, 0.0, f"{type(error).__name__}: {error}"))
+
+
+class PoolFuture:
+    """
+    The predictions of one batch submitted to a ModelPool, once they're done.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._class_ids = None
+        self._seconds = 0.0
+        self._error = None
+
+    def done(self):
+        """Returns True when the worker has sent the predictions back."""
+        return self._done.is_set()
+
+    def result(self):
+        """
+        Waits for the predictions.
+
+        Returns:
+            tuple: (list of predicted class indexes, seconds the worker spent
+                    on the batch)
+        """
+        self._done.wait()
+        if self._error is not None:
+            raise RuntimeError(f"Model pool worker failed: {self._error}")
+        return self._class_ids, self._seconds
+
+
+class ModelPool:
+    """
+    Worker processes that classify batches with models shared between them.
+
+    Parameters:
+        archs (list): Registry names of the models the workers run. They're
+                      loaded (and moved to shared memory) before the workers start.
+        workers (int): Number of worker processes.
+        threads_per_worker (int or None): Intra-op threads of each worker
+                      (None splits the CPU cores evenly between the workers).
+        max_in_flight (int or None): Most batches queued or running at once
+                      (None is two per worker).
+    """
+
+    def __init__(self, archs, workers=2, threads_per_worker=None, max_in_flight=None):
+        # Load every model once and move its weights into shared memory, so
+        # the forked workers read the same pages instead of copying them
+        for arch in archs:
+            models[arch].share_memory()
+            # A cascade looks its stage models up when it runs: share those too
+            for stage_arch in getattr(models[arch], 'archs', ()):
+                models[stage_arch].share_memory()
+        self.archs = list(archs)
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.max_in_flight = max_in_flight or 2 * workers
+
+        # Fork (not spawn) so the workers inherit the loaded models
+        context = multiprocessing.get_context('fork')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [context.Process(target=_worker_loop, daemon=True,
+                                           args=(self._tasks, self._results, self.threads_per_worker))
+                           for _ in range(workers)]
+        for process in self._processes:
+            process.start()
+
+        # Started after the fork, so the workers don't inherit this thread
+        self._futures = {}
+        self._next_id = 0
+        self._lock = threading.Lock()  # Guards _futures and _error
+        self._error = None  # Why the pool shut down (a worker died)
+        self._closing = False
+        self._collector = threading.Thread(target=self._collect, name='model-pool', daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._results.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                if self._check_workers():
+                    continue
+                break  # A worker died and the pool is shut down
+            if message is None:  # The pool is closed
+                break
+            task_id, class_ids, seconds, error = message
+            with self._lock:
+                future = self._futures.pop(task_id)
+            future._class_ids, future._seconds, future._error = class_ids, seconds, error
+            future._done.set()
+
+    def _check_workers(self):
+        # Returns True while every worker is alive. Otherwise fails the
+        # waiting batches (a dead worker's batch would never come back),
+        # stops the other workers and returns False.
+        dead = [(number, process.exitcode) for number, process in enumerate(self._processes)
+                if not process.is_alive()]
+        if not dead or self._closing:
+            return True
+        with self._lock:
+            self._error = ", ".join(f"worker {number} died (exit code {exitcode})"
+                                    for number, exitcode in dead)
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future._error = self._error
+            future._done.set()
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        # Nobody reads the queued batches any more: don't wait to send them at exit
+        self._tasks.cancel_join_thread()
+        return False
+
+    def submit(self, img_batch, arch):
+        """
+        Queues a batch for the next free worker.
+
+        Parameters:
+            img_batch (torch.Tensor): A preprocessed [N, C, H, W] batch.
+            arch (str): Registry name of the model (one of the pool's archs).
+
+        Returns:
+            PoolFuture: Gives the predictions once the batch is done.
+        """
+        if arch not in self.archs:
+            raise KeyError(f"Model '{arch}' isn't loaded in the pool (has {self.archs})")
+        future = PoolFuture()
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError(f"Model pool is shut down: {self._error}")
+            task_id = self._next_id
+            self._next_id += 1
+            self._futures[task_id] = future
+        # The queue moves the batch into shared memory instead of pickling the data
+        self._tasks.put((task_id, img_batch, arch))
+        return future
+
+    def close(self):
+        """Stops the workers once they've finished the queued batches."""
+        self._closing = True
+        if self._error is None:
+            for _ in self._processes:
+                self._tasks.put(None)
+            for process in self._processes:
+                process.join()
+            self._results.put(None)
+        else:
+            # A worker died: the others are stopped and the collecting
+            # thread has already finished
+            for process in self._processes:
+                process.join()
+        self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/prediction_cache.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 19.11.2024
+# REVISED DATE:
+# PURPOSE: Create a class PredictionCache that stores the classifier's
+#          predictions on disk so images that were already classified don't
+#          have to go through the CNN model again. Each prediction is stored
+#          under a key made of:
+#            - the hash of the image file's content
+#            - the CNN model architecture ('resnet', 'alexnet', 'vgg')
+#            - the fingerprint of the model's weights
+#            - the version of the image preprocessing
+#          so a prediction is only reused when all four are unchanged. The
+#          cache is a SQLite database, which lets several check_images.py
+#          processes read and write it at the same time. When it grows past
+#          its size cap, the least recently used predictions are removed.
+#
+##
+import hashlib  # To hash the content of image files
+import sqlite3  # The on-disk database that holds the predictions
+from time import time  # To record when a prediction was last used
+
+
+def hash_image_file(img_path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hash of an image file's content (as a hex string).
+    """
+    hasher = hashlib.sha256()
+    with open(img_path, 'rb') as img_file:
+        for chunk in iter(lambda: img_file.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class PredictionCache:
+    """
+    On-disk cache of predicted ImageNet class indexes.
+
+    Parameters:
+        path (str): Path to the SQLite database file (created if missing).
+        max_entries (int): Size cap. When the cache holds more predictions,
+                           the least recently used ones are removed.
+        timeout (float): Seconds to wait for another process that is
+                         writing to the cache.
+    """
+
+    def __init__(self, path, max_entries=1000000, timeout=30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0  # Predictions found in the cache
+        self.misses = 0  # Predictions that had to be computed
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        # Write-ahead logging lets readers keep working while another process writes
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                ' image_hash TEXT NOT NULL,'
+                ' arch TEXT NOT NULL,'
+                ' weights TEXT NOT NULL,'
+                ' preprocess TEXT NOT NULL,'
+                ' class_id INTEGER NOT NULL,'
+                ' last_used REAL NOT NULL,'
+                ' PRIMARY KEY (image_hash, arch, weights, preprocess))')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS predictions_last_used'
+                ' ON predictions (last_used)')
+
+    def get_many(self, image_hashes, arch, weights, preprocess):
+        """
+        Looks up stored predictions.
+
+        Parameters:
+            image_hashes (list): Content hashes of the images.
+            arch (str): CNN model architecture.
+            weights (str): Fingerprint of the model weights.
+            preprocess (str): Version of the image preprocessing.
+
+        Returns:
+            dict: Image hash -> class index, only for the images that were found.
+        """
+        found = {}
+        unique_hashes = list(dict.fromkeys(image_hashes))
+        # SQLite limits the number of '?' parameters, so look up in chunks
+        for start in range(0, len(unique_hashes), 500):
+            chunk = unique_hashes[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._conn.execute(
+                'SELECT image_hash, class_id FROM predictions'
+                ' WHERE arch = ? AND weights = ? AND preprocess = ?'
+                f' AND image_hash IN ({placeholders})',
+                [arch, weights, preprocess] + chunk).fetchall()
+            found.update(rows)
+
+        # Mark the found predictions as recently used
+        if found:
+            now = time()
+            with self._conn:
+                self._conn.executemany(
+                    'UPDATE predictions SET last_used = ?'
+                    ' WHERE image_hash = ? AND arch = ? AND weights = ? AND preprocess = ?',
+                    [(now, image_hash, arch, weights, preprocess) for image_hash in found])
+
+        self.hits += sum(1 for image_hash in image_hashes if image_hash in found)
+        self.misses += sum(1 for image_hash in image_hashes if image_hash not in found)
+        return found
+
+    def put_many(self, predictions, arch, weights, preprocess):
+        """
+        Stores predictions and evicts the least recently used ones if the
+        cache is over its size cap.
+
+        Parameters:
+            predictions (dict): Image hash -> class index.
+            arch (str): CNN model architecture.
+            weights (str): Fingerprint of the model weights.
+            preprocess (str): Version of the image preprocessing.
+        """
+        if not predictions:
+            return
+        now = time()
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO predictions'
+                ' (image_hash, arch, weights, preprocess, class_id, last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                [(image_hash, arch, weights, preprocess, int(class_id), now)
+                 for image_hash, class_id in predictions.items()])
+            self._evict()
+
+    def _evict(self):
+        # Remove the least recently used predictions beyond the size cap
+        n_entries = self._conn.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        if n_entries > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM predictions WHERE rowid IN ('
+                ' SELECT rowid FROM predictions ORDER BY last_used LIMIT ?)',
+                (n_entries - self.max_entries,))
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+    def close(self):
+        """Closes the database connection."""
+        self._conn.close()
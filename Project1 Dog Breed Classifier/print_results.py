@@ -7,6 +7,13 @@
 # REVISED DATE: 
 # PURPOSE: Create a function print_results that prints the results statistics
 #          from the results statistics dictionary (results_stats_dic). 
+#          The misclassified images are picked out with vectorized masks over
+#          the match and is-a-dog flags.
+#          The functions print_progress and print_breed_confusion print the
+#          running totals of a ResultsStatsAccumulator, for live progress
+#          during long runs and for the final totals of sharded runs.
+import numpy as np  # For selecting the misclassified images
+from calculates_results_stats import result_flags  # Flags of every image as arrays
 
 def print_results(results_dic, results_stats_dic, model, 
                   print_incorrect_dogs=False, print_incorrect_breed=False):
@@ -16,6 +23,7 @@ def print_results(results_dic, results_stats_dic, model,
     
     Parameters:
       results_dic (dict): A dictionary containing information about images and their classification.
+                          None prints only the statistics (e.g. totals merged from shards).
       results_stats_dic (dict): A dictionary with calculated statistics like counts and percentages.
       model (str): The CNN model architecture used for classification.
       print_incorrect_dogs (bool): Whether to print incorrectly classified dogs.
@@ -38,28 +46,104 @@ def print_results(results_dic, results_stats_dic, model,
         if key.startswith('pct'):  # Only print percentages
             print("{:20}: {:.1f}%".format(key, value))  # Format to 1 decimal place
 
+    # Without the results themselves there are no images to list
+    if results_dic is None:
+        return
+
+    # Get the flags of all images as arrays, to pick out the misclassified ones
+    filenames = list(results_dic)
+    match, is_pet_dog, is_classifier_dog = result_flags(results_dic)
+
     # Check and print incorrectly classified dogs
     if print_incorrect_dogs and (
         results_stats_dic['n_correct_dogs'] + results_stats_dic['n_correct_notdogs'] != results_stats_dic['n_images']):
         print("\n*** Incorrectly Classified Dog Images ***")
-        incorrect_dogs_found = False
-        for key, value in results_dic.items():
-            if (value[3] == 1 and value[4] == 0) or (value[3] == 0 and value[4] == 1):
-                incorrect_dogs_found = True
-                print("Image: {:>30} | Pet Label: {:>20} | Classifier Label: {:>30}".format(
-                    key, value[0], value[1]))
-        if not incorrect_dogs_found:
+        # Pet label and classifier label disagree about being a dog
+        incorrect_dogs = np.flatnonzero(is_pet_dog != is_classifier_dog)
+        for row in incorrect_dogs:
+            value = results_dic[filenames[row]]
+            print("Image: {:>30} | Pet Label: {:>20} | Classifier Label: {:>30}".format(
+                filenames[row], value[0], value[1]))
+        if len(incorrect_dogs) == 0:
             print("No incorrectly classified dog images found.")
 
     # Check and print incorrectly classified dog breeds
     if print_incorrect_breed and (
         results_stats_dic['n_correct_dogs'] != results_stats_dic['n_correct_breed']):
         print("\n*** Incorrectly Classified Dog Breeds ***")
-        incorrect_breeds_found = False
-        for key, value in results_dic.items():
-            if value[3] == 1 and value[4] == 1 and value[2] == 0:
-                incorrect_breeds_found = True
-                print("Image: {:>30} | Pet Label: {:>20} | Classifier Label: {:>30}".format(
-                    key, value[0], value[1]))
-        if not incorrect_breeds_found:
+        # Both agree it's a dog but the labels don't match
+        incorrect_breeds = np.flatnonzero(is_pet_dog & is_classifier_dog & ~match)
+        for row in incorrect_breeds:
+            value = results_dic[filenames[row]]
+            print("Image: {:>30} | Pet Label: {:>20} | Classifier Label: {:>30}".format(
+                filenames[row], value[0], value[1]))
+        if len(incorrect_breeds) == 0:
             print("No incorrectly classified dog breeds found.")
+
+def print_comparison(results_stats_by_arch, timings):
+    """
+    Prints a side-by-side comparison of several CNN model architectures that
+    classified the same images.
+
+    Parameters:
+      results_stats_by_arch (dict): CNN model architecture -> results_stats_dic.
+      timings (dict): CNN model architecture -> {'images': number of images
+                      run through the model, 'seconds': inference time}.
+
+    Returns:
+      None: Prints directly to the console.
+    """
+    print("\n\n*** Comparison of CNN Model Architectures ***\n")
+    print("{:>10} | {:>9} | {:>12} | {:>11} | {:>15} | {:>10}".format(
+        "Model", "% Match", "% Dogs", "% Breed", "% Not-a-Dog", "Images/sec"))
+    for arch, results_stats_dic in results_stats_by_arch.items():
+        timing = timings[arch]
+        # Images/sec only counts images that actually went through the model
+        if timing['seconds'] > 0:
+            images_per_sec = "{:.1f}".format(timing['images'] / timing['seconds'])
+        else:
+            images_per_sec = "cached"
+        print("{:>10} | {:>8.1f}% | {:>11.1f}% | {:>10.1f}% | {:>14.1f}% | {:>10}".format(
+            arch.upper(), results_stats_dic['pct_match'], results_stats_dic['pct_correct_dogs'],
+            results_stats_dic['pct_correct_breed'], results_stats_dic['pct_correct_notdogs'],
+            images_per_sec))
+
+def print_progress(accumulator, model, n_total=None):
+    """
+    Prints one line with the running statistics of a long run.
+
+    Parameters:
+      accumulator (ResultsStatsAccumulator): Statistics of the images so far.
+      model (str): The CNN model architecture used for classification.
+      n_total (int or None): Total number of images expected (if known).
+
+    Returns:
+      None: Prints directly to the console.
+    """
+    stats = accumulator.results_stats()
+    done = "{:d}".format(stats['n_images'])
+    if n_total:
+        done += "/{:d} ({:.0f}%)".format(n_total, stats['n_images'] / n_total * 100.0)
+    print("[{}] {} images | Match {:.1f}% | Dogs {:.1f}% | Breed {:.1f}% | Not-a-Dog {:.1f}%".format(
+        model, done, stats['pct_match'], stats['pct_correct_dogs'],
+        stats['pct_correct_breed'], stats['pct_correct_notdogs']), flush=True)
+
+
+def print_breed_confusion(accumulator, top=3):
+    """
+    Prints, for each dog breed, the classifier labels it was most often
+    classified as.
+
+    Parameters:
+      accumulator (ResultsStatsAccumulator): Statistics with the confusion counts.
+      top (int): Number of classifier labels to print per breed.
+
+    Returns:
+      None: Prints directly to the console.
+    """
+    print("\n*** Dog Breed Confusion (most common classifier labels per breed) ***")
+    for pet_label, classifier_labels in sorted(accumulator.breed_confusion().items()):
+        total = sum(classifier_labels.values())
+        common = ", ".join("{} ({:d})".format(classifier_label, count)
+                           for classifier_label, count in classifier_labels.most_common(top))
+        print("{:>26} | {:4d} images | {}".format(pet_label, total, common))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/quantize_models.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 20.11.2024
+# REVISED DATE:
+# PURPOSE: Create int8 versions of the CNN models for faster, smaller CPU
+#          inference. Dynamic quantization stores the weights of the fully
+#          connected (Linear) layers as 8-bit integers; these layers hold most
+#          of the parameters of AlexNet and VGG-16. The quantized model is
+#          registered with the classifier as '<arch>:int8' (e.g. 'vgg:int8')
+#          and saved in the model cache, so later runs load it directly.
+#          Run as a script to report how often the int8 model predicts the
+#          same class as the float model on a folder of images.
+#
+# Usage: python quantize_models.py --dir pet_images --arch vgg
+#
+##
+import argparse  # For the command line arguments of the agreement report
+import io  # To measure the size of a model's saved weights
+import os  # To check for a cached quantized model
+from time import time  # To time both models
+import torch  # For quantization and saving models
+from classifier import models, predict_tensors, register_model  # The model registry
+from get_pet_labels import scan_pet_images  # To find the images in a folder
+from image_pipeline import iter_image_batches  # Decodes images into batches
+from model_cache import cached_model_path, save_atomic  # Where quantized models are stored
+
+try:
+    from torch.ao.quantization import quantize_dynamic  # PyTorch 1.10 and later
+except ImportError:
+    from torch.quantization import quantize_dynamic  # Older PyTorch versions
+
+# Name of the quantized model file kind in the model cache
+QUANTIZED_KIND = 'int8-dynamic-linear'
+
+
+def quantize_model(model):
+    """
+    Returns a copy of model with its Linear layers dynamically quantized to int8.
+    """
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8).eval()
+
+
+def quantized_name(name):
+    """Returns the registry name of the int8 version of a model ('vgg' -> 'vgg:int8')."""
+    return f"{name}:int8"
+
+
+def register_int8_model(name):
+    """
+    Registers the int8 version of a registered model as '<name>:int8'.
+
+    The first time it's built, the float model is quantized and the result
+    saved in the model cache; after that the quantized weights are loaded
+    from the cache into an empty (not pretrained) copy of the model.
+
+    Parameters:
+        name (str): A registered CNN model architecture (e.g. 'vgg').
+
+    Returns:
+        str: The registry name of the int8 model.
+    """
+    fingerprint = models.fingerprint(name)
+    cache_path = cached_model_path(name, QUANTIZED_KIND, fingerprint)
+
+    def build_int8(pretrained):
+        if pretrained and os.path.exists(cache_path):
+            # Quantize an empty model to get the right layers, then load the weights
+            model = quantize_model(models.build(name, pretrained=False))
+            model.load_state_dict(torch.load(cache_path))
+            return model
+        model = quantize_model(models.build(name, pretrained))
+        if pretrained:
+            save_atomic(lambda path: torch.save(model.state_dict(), path), cache_path)
+        return model
+
+    register_model(quantized_name(name), build_int8,
+                   weights_id=f"{fingerprint}/{QUANTIZED_KIND}")
+    return quantized_name(name)
+
+
+def weights_mb(model):
+    """Returns the size of a model's saved weights in megabytes."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return len(buffer.getvalue()) / 2 ** 20
+
+
+def top1_agreement(img_paths, name, batch_size=32, workers=0):
+    """
+    Compares the float and int8 versions of a model on the same images.
+
+    Parameters:
+        img_paths (list): Paths to the image files.
+        name (str): CNN model architecture (e.g. 'vgg').
+        batch_size (int): Images per forward pass.
+        workers (int): Processes decoding images (see iter_image_batches).
+
+    Returns:
+        dict: 'images', 'agreement' (fraction of images where both predict
+              the same class) and 'seconds' of inference for each version.
+    """
+    int8_name = register_int8_model(name)
+    n_images = 0
+    n_agree = 0
+    seconds = {name: 0.0, int8_name: 0.0}
+    for img_batch in iter_image_batches(img_paths, batch_size, workers):
+        predictions = {}
+        for model_name in (name, int8_name):
+            models[model_name]  # Build the model before timing inference
+            start_time = time()
+            predictions[model_name] = predict_tensors(img_batch, model_name)
+            seconds[model_name] += time() - start_time
+        n_images += len(img_batch)
+        n_agree += sum(1 for float_id, int8_id in zip(predictions[name], predictions[int8_name])
+                       if float_id == int8_id)
+    return {
+        'images': n_images,
+        'agreement': n_agree / n_images if n_images else 0.0,
+        'seconds': seconds,
+    }
+
+
+def main():
+    """
+    Prints the top-1 agreement, inference time and weight memory of the
+    float and int8 versions of a model on a folder of images.
+    """
+    parser = argparse.ArgumentParser(
+        description="Compares a CNN model with its int8 quantized version.")
+    parser.add_argument('--dir', type=str, default='pet_images',
+                        help="Folder containing the images. Default is 'pet_images'.")
+    parser.add_argument('--arch', type=str, default='vgg',
+                        help="CNN model architecture to quantize. Default is 'vgg'.")
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help="Number of images per forward pass. Default is 32.")
+    args = parser.parse_args()
+
+    img_paths = [os.path.join(args.dir, filename)
+                 for filename, pet_label in scan_pet_images(args.dir)]
+    report = top1_agreement(img_paths, args.arch, args.batch_size)
+
+    print(f"\n*** int8 Quantization Report for {args.arch.upper()} ***")
+    print(f"Images: {report['images']}")
+    print(f"Top-1 agreement with float model: {report['agreement'] * 100.0:.1f}%")
+    for model_name, seconds in report['seconds'].items():
+        print(f"{model_name:>12}: {seconds:.2f} s inference, "
+              f"{weights_mb(models[model_name]):.1f} MB weights")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/reanalyze_results.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Re-analyze saved predictions without running (or even importing)
+#          the CNN models. The predicted class ids of an earlier run are read
+#          from a results database (check_images.py --results_db) or from
+#          shard files (check_images.py --shard), and then the usual steps
+#          run again: adjust_results4_isadog (e.g. with a new dog names
+#          file), calculates_results_stats and print_results with the chosen
+#          incorrect dogs / breeds listings. Optionally the pet labels are
+#          matched against the classes again with another --match setting.
+#          Only torch-free modules are imported, so this starts in a fraction
+#          of a second.
+#
+# Usage: python reanalyze_results.py --db results.db --dogfile dognames.txt --incorrect_dogs
+#        python reanalyze_results.py --shard_dir shards --incorrect_breed
+#
+##
+import argparse  # For the command line arguments
+from time import time  # To measure the runtime
+from adjust_results4_isadog import adjust_results4_isadog  # Is-a-dog flags from the class ids
+from calculates_results_stats import calculates_results_stats  # The statistics
+from print_results import print_results, print_comparison  # The report
+from breed_matcher import get_breed_matcher  # For --match
+from imagenet_labels import load_imagenet_labels  # Classifier labels for --match
+from results_store import ResultsStore  # Results saved with --results_db
+from merge_shards import find_shard_files  # Results saved with --shard
+from sharding import merge_shard_files  # Combines the shard files
+
+
+def load_from_store(db_path, run_ids=None, archs=None):
+    """
+    Loads runs from a results database.
+
+    Parameters:
+        db_path (str): The SQLite results database.
+        run_ids (list or None): Runs to load (None loads the newest run of
+                                each model).
+        archs (list or None): Only runs of these models.
+
+    Returns:
+        tuple: (CNN model architecture -> ResultsTable,
+                CNN model architecture -> {'images', 'seconds'})
+    """
+    store = ResultsStore(db_path)
+    runs = store.runs()  # Newest first
+    if run_ids:
+        runs = [run for run in runs if run['run_id'] in run_ids]
+    if archs:
+        runs = [run for run in runs if run['arch'] in archs]
+
+    results_by_arch, timings = {}, {}
+    for run in runs:
+        name = run['arch']
+        if name in results_by_arch:
+            if not run_ids:
+                continue  # Only the newest run of each model
+            # Two chosen runs of the same model are told apart by run id
+            name = f"{run['arch']}#{run['run_id']}"
+        results_by_arch[name] = store.load_results(run['run_id'])
+        timings[name] = store.run_timing(run['run_id'])
+    store.close()
+    return results_by_arch, timings
+
+
+def load_from_shards(shard_dir, archs=None, image_dir=None):
+    """
+    Loads (and merges) the shard files of every model in shard_dir (only
+    those of the run over image_dir, if given).
+
+    Returns:
+        tuple: (CNN model architecture -> ResultsTable,
+                CNN model architecture -> {'images', 'seconds'})
+    """
+    results_by_arch, timings = {}, {}
+    for arch, paths in find_shard_files(shard_dir, image_dir).items():
+        if archs and arch not in archs:
+            continue
+        results_by_arch[arch], accumulator, timings[arch] = merge_shard_files(paths)
+    return results_by_arch, timings
+
+
+def rematch(results_dic, matcher):
+    """
+    Matches the pet labels against the stored class ids again.
+    """
+    class_ids = results_dic.class_ids.copy()
+    matches = matcher.match_codes(results_dic.labels, results_dic.pet_label_codes, class_ids)
+    normalized_labels = load_imagenet_labels().normalized
+    results_dic.set_classifications(class_ids, [normalized_labels[class_id] for class_id in class_ids],
+                                    matches)
+
+
+def main():
+    """
+    Re-runs the dog check, statistics and report on saved predictions.
+    """
+    start_time = time()
+    parser = argparse.ArgumentParser(
+        description="Re-analyzes saved predictions without loading the CNN models.")
+    parser.add_argument('--db', type=str, default=None,
+                        help="Results database made with check_images.py --results_db.")
+    parser.add_argument('--shard_dir', type=str, default=None,
+                        help="Folder of shard files made with check_images.py --shard.")
+    parser.add_argument('--dir', type=str, default=None,
+                        help="With --shard_dir, only the run over this image folder. "
+                             "Default is the only run in the folder.")
+    parser.add_argument('--run', type=int, nargs='*', default=None,
+                        help="Run ids to re-analyze (with --db). Default is the newest run of each model.")
+    parser.add_argument('--arch', type=str, default=None,
+                        help="Only these CNN models, separated by commas. Default is all.")
+    parser.add_argument('--dogfile', type=str, default='dognames.txt',
+                        help="Text file with dog names. Default is 'dognames.txt'.")
+    parser.add_argument('--match', type=str, choices=['word', 'substring'], default=None,
+                        help="Match the pet labels against the classes again this way. "
+                             "Default keeps the saved match flags.")
+    parser.add_argument('--incorrect_dogs', action='store_true',
+                        help="List the incorrectly classified dog images.")
+    parser.add_argument('--incorrect_breed', action='store_true',
+                        help="List the incorrectly classified dog breeds.")
+    args = parser.parse_args()
+
+    archs = [arch.strip() for arch in args.arch.split(',') if arch.strip()] if args.arch else None
+    if args.db:
+        results_by_arch, timings = load_from_store(args.db, args.run, archs)
+    elif args.shard_dir:
+        results_by_arch, timings = load_from_shards(args.shard_dir, archs, args.dir)
+    else:
+        parser.error("Please give --db or --shard_dir")
+    if not results_by_arch:
+        parser.error("No saved results found")
+
+    if args.match is not None:
+        matcher = get_breed_matcher(whole_word=args.match == 'word', plurals=args.match == 'word')
+
+    results_stats_by_arch = {}
+    for arch, results in results_by_arch.items():
+        if args.match is not None:
+            rematch(results, matcher)
+        # The is-a-dog flags are worked out again from the (new) dog names file
+        adjust_results4_isadog(results, args.dogfile)
+        results_stats_by_arch[arch] = calculates_results_stats(results)
+        print_results(results, results_stats_by_arch[arch], arch,
+                      args.incorrect_dogs, args.incorrect_breed)
+
+    # Compare the models side by side when more than one was loaded
+    if len(results_stats_by_arch) > 1:
+        print_comparison(results_stats_by_arch, timings)
+
+    print(f"\n** Re-analyzed {sum(len(results) for results in results_by_arch.values())} "
+          f"results in {time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/results_store.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Create a class ResultsStore that keeps the per-image results of
+#          every check_images.py run (--results_db) in a SQLite database, so
+#          old runs can be searched and reported on without running the CNN
+#          models again. The database has two tables:
+#            runs    - one row per model per run: when it started, the model
+#                      architecture, the fingerprint of its weights, the
+#                      preprocessing version, the image folder and dog file
+#            results - one row per image per run: filename, pet label, class
+#                      id, classifier label, match and is-a-dog flags and the
+#                      image's amortized time in the model (its batch's time
+#                      / images in the batch; NULL if it was cached)
+#          Rows are buffered and written in batched transactions. A
+#          watched file that changes replaces its earlier row in the run, in
+#          the same transaction, so a run has one row per image.
+#          The database's schema version is kept in SQLite's user_version;
+#          older databases are brought up to date when they're opened (the
+#          results column latency_ms was renamed to amortized_ms in version 2).
+#          check_images.py adds each batch as soon as it's classified, at the
+#          image's row in the run, so the run keeps the image order however
+#          the batches finish.
+#          Run as a script to query the database: list the runs, print the
+#          print_results report of a run, or list the misclassified images
+#          of a model across runs (e.g. dogs classified as non-dogs by
+#          alexnet in the last 7 days).
+#
+# Usage: python results_store.py --db results.db --runs
+#        python results_store.py --db results.db --report --arch vgg
+#        python results_store.py --db results.db --find dog-as-notdog --arch alexnet --days 7
+#
+##
+import argparse  # For the command line arguments of the query tool
+import sqlite3  # The on-disk database
+from datetime import datetime  # To print when a run started
+from time import time  # To record when a run started
+import numpy as np  # To pick the rows of a batch
+from results_table import ResultsTable, as_results_table  # Column-based results
+from calculates_results_stats import calculates_results_stats  # Statistics of a stored run
+from print_results import print_results  # Prints the report of a stored run
+
+# Misclassifications the query tool can search for, as SQL conditions
+FIND_CONDITIONS = {
+    'dog-as-notdog': 'results.is_pet_dog = 1 AND results.is_classifier_dog = 0',
+    'notdog-as-dog': 'results.is_pet_dog = 0 AND results.is_classifier_dog = 1',
+    'breed': 'results.is_pet_dog = 1 AND results.is_classifier_dog = 1 AND results.match = 0',
+    'no-match': 'results.match = 0',
+}
+
+# Version of the database layout, stored as the database's user_version
+SCHEMA_VERSION = 2
+
+
+class ResultsStore:
+    """
+    SQLite database of the per-image results of check_images.py runs.
+    Raises ValueError if the database was written by a newer version or
+    has a results table this version doesn't know.
+
+    Parameters:
+        path (str): Path to the SQLite database file (created if missing).
+        batch_rows (int): Buffered rows are written once this many are waiting.
+        timeout (float): Seconds to wait for another process that is writing.
+    """
+
+    def __init__(self, path, batch_rows=1000, timeout=30.0):
+        self.path = path
+        self.batch_rows = batch_rows
+        self._pending = []  # Rows waiting to be written
+        self._replaced = []  # (run id, filename) of stored rows to delete before writing
+        self._next_row = {}  # Run id -> row number of the next image added
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        # Write-ahead logging lets queries run while a check_images.py run writes
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        columns = [column[1] for column in self._conn.execute('PRAGMA table_info(results)')]
+        if version > SCHEMA_VERSION:
+            self._conn.close()
+            raise ValueError(f"{path} has results database version {version}, but this version "
+                             f"only knows up to version {SCHEMA_VERSION}")
+        if columns and 'latency_ms' not in columns and 'amortized_ms' not in columns:
+            self._conn.close()
+            raise ValueError(f"{path} has a results table without an amortized_ms or latency_ms "
+                             f"column; it isn't a results database of check_images.py")
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS runs ('
+                ' run_id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' started REAL NOT NULL,'
+                ' arch TEXT NOT NULL,'
+                ' weights TEXT NOT NULL,'
+                ' preprocess TEXT NOT NULL,'
+                ' image_dir TEXT,'
+                ' dogfile TEXT)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                ' run_id INTEGER NOT NULL REFERENCES runs (run_id),'
+                ' row INTEGER NOT NULL,'
+                ' filename TEXT NOT NULL,'
+                ' pet_label TEXT NOT NULL,'
+                ' class_id INTEGER NOT NULL,'
+                ' classifier_label TEXT NOT NULL,'
+                ' match INTEGER NOT NULL,'
+                ' is_pet_dog INTEGER NOT NULL,'
+                ' is_classifier_dog INTEGER NOT NULL,'
+                ' amortized_ms REAL,'
+                ' PRIMARY KEY (run_id, row))')
+            if 'latency_ms' in columns:
+                # Version 1 stored the same per-image time as latency_ms
+                self._conn.execute('ALTER TABLE results RENAME COLUMN latency_ms TO amortized_ms')
+            self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            # Indexes for finding runs by model and date, images by name and
+            # misclassified images by their flags
+            self._conn.execute('CREATE INDEX IF NOT EXISTS runs_arch_started ON runs (arch, started)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_filename ON results (filename)')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS results_flags'
+                ' ON results (is_pet_dog, is_classifier_dog, match, run_id)')
+
+    def start_run(self, arch, weights, preprocess, image_dir=None, dogfile=None, started=None):
+        """
+        Adds a run of one model.
+
+        Parameters:
+            arch (str): CNN model architecture (registry name, e.g. 'vgg:int8').
+            weights (str): Fingerprint of the model weights.
+            preprocess (str): Version of the image preprocessing.
+            image_dir (str or None): Folder (or image pack) of the images.
+            dogfile (str or None): Dog names file used for the is-a-dog flags.
+            started (float or None): Start time (None is now).
+
+        Returns:
+            int: The new run's id.
+        """
+        with self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO runs (started, arch, weights, preprocess, image_dir, dogfile)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (started or time(), arch, weights, preprocess, image_dir, dogfile))
+        self._next_row[cursor.lastrowid] = 0
+        return cursor.lastrowid
+
+    def add_results(self, run_id, results_dic, amortized_ms=None, rows=None, replace=False):
+        """
+        Adds the results of some images to a run (after its earlier images).
+        The rows are buffered and written batch_rows at a time.
+
+        Parameters:
+            run_id (int): The run (from start_run).
+            results_dic (dict): Results with classifications and is-a-dog flags.
+            amortized_ms (list or None): Amortized time of each added image in
+                                         the model, in the same order (None = unknown).
+            rows (list or None): Only add these rows of a ResultsTable (e.g.
+                                 one finished batch), stored at the same row
+                                 numbers in the run. None adds every row
+                                 after the run's earlier images.
+            replace (bool): Delete the run's earlier rows of the same files
+                            (e.g. files that changed while watching a folder).
+        """
+        table = as_results_table(results_dic)
+        if replace:
+            filenames = set(table.filenames)
+            self._pending = [row for row in self._pending
+                             if row[0] != run_id or row[2] not in filenames]
+            self._replaced.extend((run_id, filename) for filename in filenames)
+        if run_id not in self._next_row:
+            self._next_row[run_id] = self._conn.execute(
+                'SELECT COALESCE(MAX(row) + 1, 0) FROM results WHERE run_id = ?',
+                (run_id,)).fetchone()[0]
+        if rows is None:
+            selected = slice(None)
+            row_numbers = list(range(self._next_row[run_id], self._next_row[run_id] + len(table)))
+        else:
+            selected = np.asarray(rows, dtype=np.int64)
+            row_numbers = selected.tolist()
+        if row_numbers:
+            self._next_row[run_id] = max(self._next_row[run_id], max(row_numbers) + 1)
+
+        labels = table.labels
+        if amortized_ms is None:
+            amortized_ms = [None] * len(row_numbers)
+        self._pending.extend(zip(
+            [run_id] * len(row_numbers),
+            row_numbers,
+            [table.filenames[row] for row in np.arange(len(table))[selected].tolist()],
+            [labels[code] for code in table.column('pet_label_codes')[selected].tolist()],
+            table.column('class_ids')[selected].tolist(),
+            [labels[code] for code in table.column('classifier_label_codes')[selected].tolist()],
+            table.column('match')[selected].tolist(),
+            table.column('is_pet_dog')[selected].tolist(),
+            table.column('is_classifier_dog')[selected].tolist(),
+            [float(image_ms) if image_ms is not None else None for image_ms in amortized_ms]))
+        if len(self._pending) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows in one transaction."""
+        if not self._pending and not self._replaced:
+            return
+        with self._conn:
+            self._conn.executemany('DELETE FROM results WHERE run_id = ? AND filename = ?',
+                                   self._replaced)
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO results (run_id, row, filename, pet_label, class_id,'
+                ' classifier_label, match, is_pet_dog, is_classifier_dog, amortized_ms)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self._pending)
+        self._pending = []
+        self._replaced = []
+
+    def runs(self, arch=None, since=None):
+        """
+        Returns the runs (newest first) as dictionaries with 'run_id',
+        'started', 'arch', 'weights', 'preprocess', 'image_dir', 'dogfile'
+        and 'images', optionally only those of one model and/or started
+        after the time since.
+        """
+        self.flush()
+        conditions, params = [], []
+        if arch:
+            conditions.append('runs.arch = ?')
+            params.append(arch)
+        if since:
+            conditions.append('runs.started >= ?')
+            params.append(since)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self._conn.execute(
+            'SELECT runs.run_id, started, arch, weights, preprocess, image_dir, dogfile,'
+            ' (SELECT COUNT(*) FROM results WHERE results.run_id = runs.run_id)'
+            f' FROM runs{where} ORDER BY started DESC, run_id DESC', params)
+        columns = ('run_id', 'started', 'arch', 'weights', 'preprocess', 'image_dir', 'dogfile', 'images')
+        return [dict(zip(columns, run)) for run in cursor]
+
+    def load_results(self, run_id):
+        """
+        Returns the stored results of a run as a ResultsTable (in the order
+        the images were added), with classifications and is-a-dog flags.
+        An image stored more than once (in a database written before changed
+        files replaced their rows) has only its latest results.
+        """
+        self.flush()
+        rows = self._conn.execute(
+            'SELECT filename, pet_label, class_id, classifier_label, match, is_pet_dog,'
+            ' is_classifier_dog FROM results WHERE run_id = ? AND row IN ('
+            ' SELECT MAX(row) FROM results WHERE run_id = ? GROUP BY filename)'
+            ' ORDER BY row', (run_id, run_id)).fetchall()
+        table = ResultsTable((row[0] for row in rows), (row[1] for row in rows))
+        if rows:
+            table.set_classifications([row[2] for row in rows], [row[3] for row in rows],
+                                      [row[4] for row in rows])
+            table.set_dog_flags([row[5] for row in rows], [row[6] for row in rows])
+        return table
+
+    def run_timing(self, run_id):
+        """
+        Returns {'images', 'seconds'} of a run: the images that went through
+        the model (not found in the cache) and their total time.
+        """
+        self.flush()
+        images, total_ms = self._conn.execute(
+            'SELECT COUNT(amortized_ms), COALESCE(SUM(amortized_ms), 0) FROM results'
+            ' WHERE run_id = ?', (run_id,)).fetchone()
+        return {'images': images, 'seconds': total_ms / 1000.0}
+
+    def find(self, kind, arch=None, since=None):
+        """
+        Returns the misclassified images of one kind (see FIND_CONDITIONS)
+        as (started, arch, run_id, filename, pet_label, classifier_label) tuples,
+        newest runs first.
+        """
+        self.flush()
+        conditions, params = [FIND_CONDITIONS[kind]], []
+        if arch:
+            conditions.append('runs.arch = ?')
+            params.append(arch)
+        if since:
+            conditions.append('runs.started >= ?')
+            params.append(since)
+        return self._conn.execute(
+            'SELECT runs.started, runs.arch, runs.run_id, results.filename, results.pet_label,'
+            ' results.classifier_label FROM results JOIN runs ON runs.run_id = results.run_id'
+            f" WHERE {' AND '.join(conditions)}"
+            ' ORDER BY runs.started DESC, results.run_id DESC, results.row', params).fetchall()
+
+    def close(self):
+        """Writes the buffered rows and closes the database."""
+        self.flush()
+        self._conn.close()
+
+
+def format_time(timestamp):
+    """Returns a start time as 'YYYY-MM-DD HH:MM:SS'."""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main():
+    """
+    Queries a results database from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Queries the results stored by check_images.py --results_db.")
+    parser.add_argument('--db', type=str, default='results.db',
+                        help="SQLite results database. Default is 'results.db'.")
+    parser.add_argument('--runs', action='store_true',
+                        help="List the stored runs.")
+    parser.add_argument('--report', action='store_true',
+                        help="Print the results report of a run (the newest one unless --run is given).")
+    parser.add_argument('--find', type=str, choices=sorted(FIND_CONDITIONS), default=None,
+                        help="List the images misclassified in this way.")
+    parser.add_argument('--run', type=int, default=None,
+                        help="Run id for --report. Default is the newest run.")
+    parser.add_argument('--arch', type=str, default=None,
+                        help="Only runs of this CNN model architecture.")
+    parser.add_argument('--days', type=float, default=None,
+                        help="Only runs started in the last DAYS days.")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    since = time() - args.days * 86400.0 if args.days else None
+
+    if args.runs:
+        print("{:>6} | {:>19} | {:>12} | {:>16} | {:>7} | {}".format(
+            "Run", "Started", "Model", "Weights", "Images", "Images folder"))
+        for run in store.runs(args.arch, since):
+            print("{:>6} | {:>19} | {:>12} | {:>16} | {:>7} | {}".format(
+                run['run_id'], format_time(run['started']), run['arch'], run['weights'][:16],
+                run['images'], run['image_dir']))
+
+    if args.report:
+        if args.run is not None:
+            runs = [run for run in store.runs() if run['run_id'] == args.run]
+        else:
+            runs = store.runs(args.arch, since)[:1]
+        if not runs:
+            parser.error("No matching run found")
+        run = runs[0]
+        print(f"Run {run['run_id']} started {format_time(run['started'])} on {run['image_dir']}")
+        results = store.load_results(run['run_id'])
+        print_results(results, calculates_results_stats(results), run['arch'], True, True)
+
+    if args.find:
+        found = store.find(args.find, args.arch, since)
+        print(f"\n*** {len(found)} images found ({args.find}) ***")
+        for started, arch, run_id, filename, pet_label, classifier_label in found:
+            print("{} | {:>8} | Run {:>4} | Image: {:>30} | Pet Label: {:>20} | Classifier Label: {:>30}".format(
+                format_time(started), arch, run_id, filename, pet_label, classifier_label))
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
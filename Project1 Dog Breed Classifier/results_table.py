@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/results_table.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 19.11.2024
+# REVISED DATE:
+# PURPOSE: Create a class ResultsTable that holds the results of a program
+#          run as columns instead of one Python list per image. Each column is
+#          a NumPy array with one entry per image:
+#            pet_label_codes        - pet image label (code into the labels list)
+#            classifier_label_codes - classifier label (code into the labels list)
+#            class_ids              - predicted ImageNet class index
+#            match                  - 1 if pet & classifier labels match, else 0
+#            is_pet_dog             - 1 if the pet image label is a dog, else 0
+#            is_classifier_dog      - 1 if the classifier label is a dog, else 0
+#          Labels are stored once each in the labels list and the columns
+#          only hold their codes. Columns that aren't filled in yet hold -1.
+#          The table still behaves like the results dictionary (results_dic):
+#          results_dic[filename] returns the list
+#            [pet label, classifier label, match, is pet dog, is classifier dog]
+#          with as many items as have been filled in so far.
+#
+##
+from collections.abc import Mapping  # Gives the table its dictionary methods
+import numpy as np  # For the column arrays
+
+# Column name -> NumPy type of the column
+COLUMNS = {
+    'pet_label_codes': np.int32,
+    'classifier_label_codes': np.int32,
+    'class_ids': np.int16,
+    'match': np.int8,
+    'is_pet_dog': np.int8,
+    'is_classifier_dog': np.int8,
+}
+
+
+class ResultsTable(Mapping):
+    """
+    Column-based results of a program run that also works as a results_dic.
+
+    Parameters:
+        filenames (iterable): Image filenames (the keys of the results).
+        pet_labels (iterable): Pet image label of each filename.
+    """
+
+    def __init__(self, filenames=(), pet_labels=()):
+        self.filenames = []  # Row -> image filename
+        self._rows = {}  # Image filename -> row
+        self.labels = []  # Code -> label string
+        self._label_codes = {}  # Label string -> code
+        self._columns = {name: np.full(0, -1, dtype=dtype) for name, dtype in COLUMNS.items()}
+        for filename, pet_label in zip(filenames, pet_labels):
+            self.append(filename, pet_label)
+
+    @classmethod
+    def from_dict(cls, results_dic):
+        """
+        Creates a table from a results dictionary of lists (see classify_images).
+        """
+        table = cls()
+        for filename, value in results_dic.items():
+            table.append(filename, value[0])
+        n = len(table)
+        values = list(results_dic.values())
+        if n and all(len(value) >= 3 for value in values):
+            table.set_classifications(
+                np.full(n, -1), [value[1] for value in values], [value[2] for value in values])
+        if n and all(len(value) >= 5 for value in values):
+            table.set_dog_flags([value[3] for value in values], [value[4] for value in values])
+        return table
+
+    def intern(self, label):
+        """Returns the code of a label string, adding the label if it's new."""
+        code = self._label_codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self._label_codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def append(self, filename, pet_label):
+        """
+        Adds an image with its pet label. Returns False (and adds nothing)
+        if the filename is already in the table.
+        """
+        if filename in self._rows:
+            return False
+        row = len(self.filenames)
+        # Grow the columns by doubling, so appending stays cheap on average
+        capacity = len(self._columns['pet_label_codes'])
+        if row == capacity:
+            new_capacity = max(1024, capacity * 2)
+            for name, column in self._columns.items():
+                grown = np.full(new_capacity, -1, dtype=column.dtype)
+                grown[:capacity] = column
+                self._columns[name] = grown
+        self._columns['pet_label_codes'][row] = self.intern(pet_label)
+        self.filenames.append(filename)
+        self._rows[filename] = row
+        return True
+
+    def column(self, name):
+        """Returns a column (as a NumPy array view with one entry per image)."""
+        return self._columns[name][:len(self.filenames)]
+
+    # Shortcuts for the columns
+    pet_label_codes = property(lambda self: self.column('pet_label_codes'))
+    classifier_label_codes = property(lambda self: self.column('classifier_label_codes'))
+    class_ids = property(lambda self: self.column('class_ids'))
+    match = property(lambda self: self.column('match'))
+    is_pet_dog = property(lambda self: self.column('is_pet_dog'))
+    is_classifier_dog = property(lambda self: self.column('is_classifier_dog'))
+
+    def pet_labels(self):
+        """Returns the pet label of every image, in row order."""
+        return [self.labels[code] for code in self.pet_label_codes]
+
+    def row(self, filename):
+        """Returns the row number of an image filename."""
+        return self._rows[filename]
+
+    def has_classifications(self):
+        """True when every image has a classifier label and match flag."""
+        return len(self) > 0 and bool((self.match >= 0).all())
+
+    def has_dog_flags(self):
+        """True when every image has both is-a-dog flags."""
+        return len(self) > 0 and bool((self.is_classifier_dog >= 0).all())
+
+    def set_classifications(self, class_ids, classifier_labels, match, rows=None):
+        """
+        Fills in the classifier results.
+
+        Parameters:
+            class_ids (array): Predicted ImageNet class index per image.
+            classifier_labels (list): Classifier label string per image.
+            match (array): 1 if the pet & classifier labels match, else 0.
+            rows (array or None): Rows to fill in (None means every row).
+        """
+        rows = slice(None) if rows is None else np.asarray(rows)
+        self.column('class_ids')[rows] = class_ids
+        self.column('classifier_label_codes')[rows] = [self.intern(label)
+                                                       for label in classifier_labels]
+        self.column('match')[rows] = match
+
+    def set_dog_flags(self, is_pet_dog, is_classifier_dog, rows=None):
+        """
+        Fills in the is-a-dog flags (1 if a dog, 0 if not) of the pet image
+        labels and the classifier labels.
+        """
+        rows = slice(None) if rows is None else np.asarray(rows)
+        self.column('is_pet_dog')[rows] = is_pet_dog
+        self.column('is_classifier_dog')[rows] = is_classifier_dog
+
+    def copy(self):
+        """Returns an independent copy of the table."""
+        table = ResultsTable()
+        table.filenames = list(self.filenames)
+        table._rows = dict(self._rows)
+        table.labels = list(self.labels)
+        table._label_codes = dict(self._label_codes)
+        table._columns = {name: column.copy() for name, column in self._columns.items()}
+        return table
+
+    # Dictionary view: results_dic[filename] returns the results list
+    def __getitem__(self, filename):
+        row = self._rows[filename]
+        value = [self.labels[self._columns['pet_label_codes'][row]]]
+        if self._columns['match'][row] >= 0:
+            value.extend([self.labels[self._columns['classifier_label_codes'][row]],
+                          int(self._columns['match'][row])])
+            if self._columns['is_classifier_dog'][row] >= 0:
+                value.extend([int(self._columns['is_pet_dog'][row]),
+                              int(self._columns['is_classifier_dog'][row])])
+        return value
+
+    def __iter__(self):
+        return iter(self.filenames)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __contains__(self, filename):
+        return filename in self._rows
+
+    def __repr__(self):
+        return f"ResultsTable({dict(self.items())!r})"
+
+
+def as_results_table(results_dic):
+    """
+    Returns results_dic as a ResultsTable (converting a dictionary of lists).
+    """
+    if isinstance(results_dic, ResultsTable):
+        return results_dic
+    return ResultsTable.from_dict(results_dic)
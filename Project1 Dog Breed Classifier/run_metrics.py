@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/run_metrics.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 19.11.2024
+# REVISED DATE:
+# PURPOSE: Create a class RunMetrics that measures where the time of a
+#          check_images.py run goes. It records:
+#            - the time spent in each stage of the program (get_pet_labels,
+#              classify_images, adjust_results4_isadog, store_results,
+#              calculates_results_stats, print_progress, print_results)
+#            - the latency of every batch (forward pass) in the CNN model,
+#              summarized as a histogram and the p50/p95/p99 percentiles,
+#              per model
+#            - the amortized time per image (batch time / images in the
+#              batch), images/sec and model load time per model
+#          Images in one batch finish together, so per-image percentiles
+#          would only repeat the batch values; the percentiles are therefore
+#          over batches. The metrics are written to a JSON file that
+#          dashboards can read.
+#
+##
+from contextlib import contextmanager  # To time a stage with a 'with' block
+import json  # To write the metrics file
+from time import time  # To measure elapsed time
+import numpy as np  # For percentiles and histograms
+
+# Edges (in milliseconds) of the batch latency histogram buckets
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class RunMetrics:
+    """
+    Collects timings of one program run.
+    """
+
+    def __init__(self):
+        self.start_time = time()
+        self.stages = {}  # Stage name -> seconds spent in the stage
+        self.batches = {}  # CNN model -> list of (images in the batch, seconds)
+        self.model_load_seconds = {}  # CNN model -> seconds to build the model
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the code in a 'with' block and adds it to the named stage.
+
+        Example:
+            with metrics.stage('get_pet_labels'):
+                results = get_pet_labels(in_arg.dir)
+        """
+        start_time = time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time() - start_time)
+
+    def add_time(self, name, seconds):
+        """Adds seconds to the named stage."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record_batch(self, model, n_images, seconds):
+        """
+        Records one forward pass of n_images images that took seconds.
+        """
+        if n_images > 0:
+            self.batches.setdefault(model, []).append((n_images, seconds))
+
+    def summary(self):
+        """
+        Returns all metrics as a dictionary that can be written as JSON.
+        """
+        models_summary = {}
+        for model, batches in self.batches.items():
+            n_images = sum(batch_images for batch_images, batch_seconds in batches)
+            batch_ms = np.array([batch_seconds for batch_images, batch_seconds in batches]) * 1000.0
+            seconds = float(batch_ms.sum()) / 1000.0
+            counts, _ = np.histogram(batch_ms, bins=[0] + LATENCY_BUCKETS_MS + [np.inf])
+            models_summary[model] = {
+                'images': n_images,
+                'batches': len(batches),
+                'inference_seconds': seconds,
+                'images_per_sec': n_images / seconds if seconds > 0 else None,
+                # Batch time / images in the batch, averaged over all images
+                'amortized_ms_per_image': seconds * 1000.0 / n_images,
+                'batch_latency_ms': {
+                    'p50': float(np.percentile(batch_ms, 50)),
+                    'p95': float(np.percentile(batch_ms, 95)),
+                    'p99': float(np.percentile(batch_ms, 99)),
+                    'mean': float(batch_ms.mean()),
+                },
+                # Bucket 0 counts batches under the first edge, bucket i
+                # those from edge i-1 up to (not including) edge i, and the
+                # last bucket those at or above the last edge
+                'batch_latency_histogram': {
+                    'bucket_edges_ms': LATENCY_BUCKETS_MS,
+                    'counts': counts.tolist(),
+                },
+                'model_load_seconds': self.model_load_seconds.get(model),
+            }
+        # Models that were loaded but found everything in the cache
+        for model, load_seconds in self.model_load_seconds.items():
+            models_summary.setdefault(model, {'images': 0, 'model_load_seconds': load_seconds})
+
+        return {
+            'total_seconds': time() - self.start_time,
+            'stages_seconds': dict(self.stages),
+            'models': models_summary,
+        }
+
+    def write_json(self, path):
+        """Writes the metrics summary to a JSON file."""
+        with open(path, 'w') as metrics_file:
+            json.dump(self.summary(), metrics_file, indent=2)
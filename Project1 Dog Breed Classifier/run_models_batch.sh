@@ -5,10 +5,10 @@
 # DATE CREATED: 19.11.2024                                  
 # REVISED DATE: 
 # PURPOSE: Runs all three models to test which provides 'best' solution.
-#          Please note output from each run has been piped into a text file.
+#          All three models classify the images in a single run, so each
+#          image is decoded once. The output, including the side-by-side
+#          comparison table, is piped into a text file.
 #
 # Usage: sh run_models_batch.sh    -- will run program from commandline within Project Workspace
 #  
-python check_images.py --dir pet_images/ --arch resnet  --dogfile dognames.txt > resnet_pet-images.txt
-python check_images.py --dir pet_images/ --arch alexnet --dogfile dognames.txt > alexnet_pet-images.txt
-python check_images.py --dir pet_images/ --arch vgg  --dogfile dognames.txt > vgg_pet-images.txt
+python check_images.py --dir pet_images/ --arch resnet,alexnet,vgg --dogfile dognames.txt --cache prediction_cache.sqlite --metrics all-models_pet-images.json > all-models_pet-images.txt
@@ -5,10 +5,10 @@
 # DATE CREATED: 19.11.2024                                   
 # REVISED DATE:
 # PURPOSE: Runs all three models to test which provides 'best' solution on the Uploaded Images.
-#          Please note output from each run has been piped into a text file.
+#          All three models classify the images in a single run, so each
+#          image is decoded once. The output, including the side-by-side
+#          comparison table, is piped into a text file.
 #
 # Usage: sh run_models_batch_uploaded.sh    -- will run program from commandline within Project Workspace
 #  
-python check_images.py --dir uploaded_images/ --arch resnet  --dogfile dognames.txt > resnet_uploaded-images.txt
-python check_images.py --dir uploaded_images/ --arch alexnet --dogfile dognames.txt > alexnet_uploaded-images.txt
-python check_images.py --dir uploaded_images/ --arch vgg  --dogfile dognames.txt > vgg_uploaded-images.txt
+python check_images.py --dir uploaded_images/ --arch resnet,alexnet,vgg --dogfile dognames.txt --cache prediction_cache.sqlite --metrics all-models_uploaded-images.json > all-models_uploaded-images.txt
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/sharding.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Create functions to split one evaluation into shards that run in
+#          separate processes or on separate machines sharing a filesystem.
+#          Each image belongs to shard crc32(filename) % N, so every shard
+#          process picks the same split without talking to the others. A
+#          shard writes its results and statistics to a JSON shard file, and
+#          merge_shard_files combines the files of all N shards into the
+#          results and statistics a single run over every image would give.
+#          Shards are numbered from 0, e.g. --shard 0/4 ... --shard 3/4.
+#          iter_shard picks a shard's images out of a stream of images (e.g.
+#          the folder scan) while it's being read.
+#          Shard file names carry a run key (the number of shards and a hash
+#          of the image folder), so leftovers of a run over another folder or
+#          with another shard count in the same shard folder are told apart.
+#
+##
+import json  # For the shard files
+import os  # For the shard file paths
+import zlib  # crc32 gives the same hash in every process and on every machine
+import numpy as np  # For selecting the rows of a shard
+from results_table import ResultsTable, as_results_table  # Column-based results
+from calculates_results_stats import ResultsStatsAccumulator  # Mergeable statistics
+
+# Version of the shard file format
+SHARD_FORMAT_VERSION = 2
+
+
+def parse_shard(text):
+    """
+    Parses a shard given as 'i/N' (shard i of N, counted from 0).
+
+    Returns:
+        tuple: (shard index, number of shards).
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like 'i/N' (e.g. '0/4'), not '{text}'")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}, not {index}")
+    return index, count
+
+
+def shard_of(filename, n_shards):
+    """Returns the shard (0 to n_shards - 1) an image filename belongs to."""
+    return zlib.crc32(filename.encode('utf-8')) % n_shards
+
+
+def shard_run_key(image_dir, n_shards):
+    """
+    Returns the key shared by the shard files of one sharded run: the number
+    of shards and a hash of the image folder, e.g. '4x1a2b3c4d'.
+    """
+    folder = os.path.abspath(image_dir)
+    return f"{n_shards}x{zlib.crc32(folder.encode('utf-8')):08x}"
+
+
+def iter_shard(images, shard_index, n_shards, rows):
+    """
+    Yields the images of one shard from a stream of images.
+
+    Parameters:
+        images (iterable): (filename, pet label) pairs, e.g. from scan_pet_images.
+        shard_index (int): The shard to keep.
+        n_shards (int): Number of shards.
+        rows (list): The position in images of each yielded image is
+                     appended to it (the same rows as select_shard gives).
+
+    Yields:
+        tuple: (filename, pet label) of each image of the shard.
+    """
+    for row, (filename, pet_label) in enumerate(images):
+        if shard_of(filename, n_shards) == shard_index:
+            rows.append(row)
+            yield filename, pet_label
+
+
+def select_shard(results_dic, shard_index, n_shards):
+    """
+    Keeps only the images of one shard.
+
+    Parameters:
+        results_dic (ResultsTable): Pet labels of every image (see get_pet_labels).
+        shard_index (int): The shard to keep.
+        n_shards (int): Number of shards.
+
+    Returns:
+        tuple: (ResultsTable with the shard's images, array with the row of
+               each of them in the full results, used to restore the order)
+    """
+    results_dic = as_results_table(results_dic)
+    rows = np.array([row for row, filename in enumerate(results_dic.filenames)
+                     if shard_of(filename, n_shards) == shard_index], dtype=np.int64)
+    pet_labels = results_dic.pet_labels()
+    shard = ResultsTable((results_dic.filenames[row] for row in rows),
+                         (pet_labels[row] for row in rows))
+    return shard, rows
+
+
+def shard_file_path(shard_dir, arch, shard_index, n_shards, image_dir):
+    """Returns the path of a shard file, e.g. 'shards/vgg_4x1a2b3c4d_shard0of4.json'."""
+    safe_arch = arch.replace(':', '-')
+    run_key = shard_run_key(image_dir, n_shards)
+    return os.path.join(shard_dir, f"{safe_arch}_{run_key}_shard{shard_index}of{n_shards}.json")
+
+
+def write_shard_file(path, arch, shard_index, n_shards, results_dic, rows, timing=None,
+                     image_dir=None):
+    """
+    Writes the finished results of one shard for one model.
+
+    Parameters:
+        path (str): The shard file to write.
+        arch (str): CNN model architecture of the results.
+        shard_index, n_shards (int): Which shard this is.
+        results_dic (ResultsTable): The shard's results with is-a-dog flags.
+        rows (array): Row of each image in the full results (from select_shard).
+        timing (dict or None): {'images', 'seconds'} of the model in this shard.
+        image_dir (str or None): The image folder of the run (for its run key).
+    """
+    table = as_results_table(results_dic)
+    shard = {
+        'version': SHARD_FORMAT_VERSION,
+        'arch': arch,
+        'shard': [shard_index, n_shards],
+        'run': shard_run_key(image_dir, n_shards) if image_dir else None,
+        'labels': table.labels,
+        'filenames': table.filenames,
+        'rows': [int(row) for row in rows],
+        'columns': {name: table.column(name).tolist() for name in
+                    ('pet_label_codes', 'classifier_label_codes', 'class_ids', 'match',
+                     'is_pet_dog', 'is_classifier_dog')},
+        'stats': json.loads(ResultsStatsAccumulator().update(table).to_json()),
+        'timing': {'images': timing['images'], 'seconds': timing['seconds']} if timing
+                  else {'images': 0, 'seconds': 0.0},
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Write to a temporary file first so a merge never reads a half-written shard
+    with open(f"{path}.tmp", 'w') as shard_file:
+        json.dump(shard, shard_file, separators=(',', ':'))
+    os.replace(f"{path}.tmp", path)
+
+
+def merge_shard_files(paths):
+    """
+    Merges the shard files of one model into the results of a single run.
+
+    Parameters:
+        paths (list): The shard files, one per shard (in any order).
+
+    Returns:
+        tuple: (ResultsTable in single-run order, ResultsStatsAccumulator,
+                combined timing {'images', 'seconds'})
+    """
+    shards = []
+    for path in paths:
+        with open(path) as shard_file:
+            shard = json.load(shard_file)
+        if shard.get('version') != SHARD_FORMAT_VERSION:
+            raise ValueError(f"{path} has unknown shard format version {shard.get('version')}")
+        shards.append(shard)
+
+    # Every shard of the same run must be there exactly once
+    if len({shard.get('run') for shard in shards}) > 1:
+        raise ValueError(f"Shard files of different runs can't be merged: {sorted(paths)}")
+    n_shards = shards[0]['shard'][1]
+    found = sorted(shard['shard'][0] for shard in shards)
+    if any(shard['shard'][1] != n_shards for shard in shards) or found != list(range(n_shards)):
+        raise ValueError(f"Expected shards 0 to {n_shards - 1} exactly once, found {found}")
+
+    # Put every image back at its row of the full run
+    entries = []
+    for shard in shards:
+        columns = shard['columns']
+        for position, (row, filename) in enumerate(zip(shard['rows'], shard['filenames'])):
+            entries.append((row, filename, shard['labels'], columns, position))
+    entries.sort(key=lambda entry: entry[0])
+
+    table = ResultsTable()
+    class_ids, classifier_labels, match, is_pet_dog, is_classifier_dog = [], [], [], [], []
+    for row, filename, labels, columns, position in entries:
+        table.append(filename, labels[columns['pet_label_codes'][position]])
+        class_ids.append(columns['class_ids'][position])
+        classifier_labels.append(labels[columns['classifier_label_codes'][position]])
+        match.append(columns['match'][position])
+        is_pet_dog.append(columns['is_pet_dog'][position])
+        is_classifier_dog.append(columns['is_classifier_dog'][position])
+    if len(table):
+        table.set_classifications(class_ids, classifier_labels, match)
+        table.set_dog_flags(is_pet_dog, is_classifier_dog)
+
+    accumulator = ResultsStatsAccumulator.merge_all(
+        ResultsStatsAccumulator.from_json(json.dumps(shard['stats'])) for shard in shards)
+    timing = {'images': sum(shard['timing']['images'] for shard in shards),
+              'seconds': sum(shard['timing']['seconds'] for shard in shards)}
+    return table, accumulator, timing
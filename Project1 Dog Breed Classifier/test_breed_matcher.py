@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/test_breed_matcher.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: Tests of BreedMatcher in breed_matcher.py: the default substring
+#          matching gives the same match as the original check in
+#          classify_images.py (pet label in the lowercase classifier label)
+#          for every pet label and every ImageNet class.
+#
+# Usage: python -m pytest test_breed_matcher.py
+#
+##
+import os  # To list the pet images
+import numpy as np  # To compare the match flags
+from breed_matcher import BreedMatcher  # The matcher under test
+from get_pet_labels import pet_label_from_filename  # Pet labels of the pet images
+from imagenet_labels import load_imagenet_labels  # The classifier labels
+
+# Pet labels that are easy to get wrong with substring matching, besides those of pet_images/
+EXTRA_LABELS = ['cat', 'dog', 'fox', 'bull', 'terrier', 'sea lion', 'tabby cat', '', 'x']
+
+
+def pet_labels():
+    """Returns the pet labels of the pet images and EXTRA_LABELS."""
+    labels = {pet_label_from_filename(filename) for filename in os.listdir('pet_images')}
+    return sorted(labels | set(EXTRA_LABELS))
+
+
+def test_substring_matching_equals_original_check():
+    matcher = BreedMatcher()
+    classifier_labels = [label.lower().strip() for label in load_imagenet_labels().labels]
+    for pet_label in pet_labels():
+        expected = np.array([pet_label in classifier_label for classifier_label in classifier_labels])
+        assert (matcher.match_row(pet_label) == expected).all(), pet_label
+
+
+def test_match_batch_equals_single_matches():
+    matcher = BreedMatcher()
+    labels = pet_labels()
+    rng = np.random.default_rng(0)
+    pet_batch = [labels[index] for index in rng.integers(0, len(labels), 200)]
+    class_ids = rng.integers(0, matcher.n_classes, 200)
+    # Put in some true matches too (class 162 is 'beagle', 281 is 'tabby, tabby cat')
+    pet_batch[:2], class_ids[:2] = ['beagle', 'cat'], [162, 281]
+    expected = [matcher.match(pet_label, class_id) for pet_label, class_id in zip(pet_batch, class_ids)]
+    assert matcher.match_batch(pet_batch, class_ids).tolist() == expected
+    assert expected[:2] == [1, 1]
+
+
+def test_whole_word_matching_skips_parts_of_words():
+    matcher = BreedMatcher(whole_word=True, plurals=True)
+    assert matcher.match('cat', 281)  # 'tabby, tabby cat'
+    assert 358 not in matcher.matching_classes('cat')  # 'polecat, ...'
+    assert BreedMatcher().match('cat', 358)  # The original substring check does match it
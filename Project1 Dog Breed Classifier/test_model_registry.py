@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/test_model_registry.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: Tests of the model registry in classifier.py that run offline:
+#          small stand-in models are registered instead of the pretrained
+#          networks, so nothing needs downloading.
+#
+# Usage: python -m pytest test_model_registry.py
+#
+##
+import threading  # To notice a registry that hangs
+import torch  # For the stand-in models
+from classifier import models, register_model  # The registry under test
+from cascade import register_cascade  # A model whose builder uses the registry
+
+
+class FixedModel(torch.nn.Module):
+    """
+    Stand-in model that gives every image the same class, with a confidence
+    set by scale (a higher scale makes the softmax more confident).
+    """
+
+    def __init__(self, class_id, scale):
+        super().__init__()
+        self.class_id = class_id
+        self.scale = torch.nn.Parameter(torch.tensor(float(scale)))
+
+    def forward(self, img_batch):
+        outputs = torch.zeros(len(img_batch), 1000)
+        outputs[:, self.class_id] = self.scale
+        return outputs
+
+
+def register_fixed_model(name, class_id, scale):
+    """Registers a FixedModel under name."""
+    register_model(name, lambda pretrained: FixedModel(class_id, scale), weights_id=f"{name}/fixed")
+
+
+def get_with_timeout(name, seconds=30.0):
+    """Gets models[name] in a thread; fails the test if it doesn't return in time."""
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('model', models[name]), daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), f"models['{name}'] didn't return within {seconds} seconds"
+    return result['model']
+
+
+def test_model_is_built_once():
+    register_fixed_model('test_once', 1, 1.0)
+    assert get_with_timeout('test_once') is get_with_timeout('test_once')
+    assert 'test_once' in models.loaded()
+    models.unload('test_once')
+
+
+def test_cascade_builds_through_registry():
+    # The cascade's builder asks the registry for its stages while the
+    # registry is building the cascade itself
+    register_fixed_model('test_cheap', 1, 20.0)  # Confident: answers every image
+    register_fixed_model('test_big', 2, 20.0)
+    name = register_cascade([('test_cheap', 0.5), ('test_big', None)], name='test_cascade')
+    cascade = get_with_timeout(name)
+    class_ids = cascade(torch.zeros(4, 3, 224, 224)).argmax(dim=1).tolist()
+    assert class_ids == [1, 1, 1, 1]
+    for model_name in ('test_cascade', 'test_cheap', 'test_big'):
+        models.unload(model_name)
+
+
+def test_cascade_leaves_stage_models_to_registry():
+    # The cascade holds no weights of its own, so unloading a stage really
+    # frees it and the stage isn't counted twice in memory_bytes
+    register_fixed_model('test_first', 3, 1.0)  # Not confident: passes every image on
+    register_fixed_model('test_last', 4, 1.0)
+    name = register_cascade([('test_first', 0.9), ('test_last', None)], name='test_cascade2')
+    cascade = get_with_timeout(name)
+    assert list(cascade.parameters()) == []
+    assert cascade(torch.zeros(2, 3, 224, 224)).argmax(dim=1).tolist() == [4, 4]
+    models.unload('test_last')
+    assert cascade(torch.zeros(2, 3, 224, 224)).argmax(dim=1).tolist() == [4, 4]
+    assert cascade.images_per_stage == [0, 4]
+    for model_name in ('test_cascade2', 'test_first', 'test_last'):
+        models.unload(model_name)
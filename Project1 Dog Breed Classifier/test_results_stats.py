@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/test_results_stats.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: Tests of ResultsStatsAccumulator in calculates_results_stats.py:
+#          accumulators of parts of the results merge into (and subtract
+#          back out of) the statistics calculates_results_stats gives for
+#          all of them, and survive a round trip through JSON.
+#
+# Usage: python -m pytest test_results_stats.py
+#
+##
+import pytest  # For the expected errors
+from results_table import ResultsTable  # Column-based results
+from calculates_results_stats import calculates_results_stats, ResultsStatsAccumulator  # Under test
+
+# (filename, pet label, class id, classifier label, match, is pet dog, is classifier dog)
+RESULTS = [
+    ('Beagle_01125.jpg', 'beagle', 162, 'beagle', 1, 1, 1),
+    ('Beagle_01141.jpg', 'beagle', 167, 'english foxhound', 0, 1, 1),
+    ('Poodle_07927.jpg', 'poodle', 267, 'standard poodle', 1, 1, 1),
+    ('Collie_03797.jpg', 'collie', 281, 'tabby, tabby cat', 0, 1, 0),
+    ('cat_01.jpg', 'cat', 281, 'tabby, tabby cat', 1, 0, 0),
+    ('fox_squirrel_01.jpg', 'fox squirrel', 335, 'fox squirrel, eastern fox squirrel', 1, 0, 0),
+    ('skunk_029.jpg', 'skunk', 162, 'beagle', 0, 0, 1),
+]
+
+
+def make_results(entries):
+    """Returns a ResultsTable with the classifications and is-a-dog flags of entries."""
+    table = ResultsTable([entry[0] for entry in entries], [entry[1] for entry in entries])
+    table.set_classifications([entry[2] for entry in entries], [entry[3] for entry in entries],
+                              [entry[4] for entry in entries])
+    table.set_dog_flags([entry[5] for entry in entries], [entry[6] for entry in entries])
+    return table
+
+
+def test_merged_parts_give_the_full_statistics():
+    expected = calculates_results_stats(make_results(RESULTS))
+    parts = [ResultsStatsAccumulator().update(make_results(RESULTS[start:start + 3]))
+             for start in range(0, len(RESULTS), 3)]
+    assert ResultsStatsAccumulator.merge_all(parts).results_stats() == expected
+    # The grouping and order of the merges don't matter
+    assert ResultsStatsAccumulator.merge_all(reversed(parts)).results_stats() == expected
+    assert (ResultsStatsAccumulator().merge(parts[2]).merge(parts[0].merge(parts[1]))
+            .results_stats() == expected)
+
+
+def test_update_by_rows_matches_update_of_parts():
+    table = make_results(RESULTS)
+    by_rows = ResultsStatsAccumulator().update(table, rows=[0, 1, 2]).update(table, rows=[3, 4, 5, 6])
+    whole = ResultsStatsAccumulator().update(table)
+    assert by_rows.counts == whole.counts
+    assert by_rows.confusion == whole.confusion
+
+
+def test_subtract_takes_a_part_back_out():
+    whole = ResultsStatsAccumulator().update(make_results(RESULTS))
+    last = ResultsStatsAccumulator().update(make_results(RESULTS[4:]))
+    whole.subtract(last)
+    expected = ResultsStatsAccumulator().update(make_results(RESULTS[:4]))
+    assert whole.counts == expected.counts
+    assert whole.confusion == expected.confusion
+    # Pairs that reach zero are dropped from the breed confusion
+    whole.subtract(ResultsStatsAccumulator().update(make_results(RESULTS[3:4])))
+    assert ('collie', 'tabby, tabby cat') not in whole.confusion
+
+
+def test_json_round_trip():
+    accumulator = ResultsStatsAccumulator().update(make_results(RESULTS))
+    loaded = ResultsStatsAccumulator.from_json(accumulator.to_json())
+    assert loaded.counts == accumulator.counts
+    assert loaded.confusion == accumulator.confusion
+    assert loaded.breed_confusion() == accumulator.breed_confusion()
+    assert loaded.to_json() == accumulator.to_json()
+
+
+def test_unknown_json_version_fails():
+    with pytest.raises(ValueError):
+        ResultsStatsAccumulator.from_json('{"version": 99, "counts": {}, "confusion": []}')
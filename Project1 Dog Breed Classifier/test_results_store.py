@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/test_results_store.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: Tests of the results database in results_store.py: databases
+#          written by an older version are upgraded when opened, and ones
+#          it can't read fail with a clear message.
+#
+# Usage: python -m pytest test_results_store.py
+#
+##
+import sqlite3  # To write databases in the older layouts
+import pytest  # For the expected errors
+from results_store import ResultsStore, SCHEMA_VERSION  # The database under test
+
+
+def write_version1_database(path, time_column='latency_ms'):
+    """Writes a database in the layout used before user_version was set, with one result."""
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute('CREATE TABLE runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, started REAL NOT NULL,'
+                     ' arch TEXT NOT NULL, weights TEXT NOT NULL, preprocess TEXT NOT NULL,'
+                     ' image_dir TEXT, dogfile TEXT)')
+        conn.execute('CREATE TABLE results (run_id INTEGER NOT NULL REFERENCES runs (run_id),'
+                     ' row INTEGER NOT NULL, filename TEXT NOT NULL, pet_label TEXT NOT NULL,'
+                     ' class_id INTEGER NOT NULL, classifier_label TEXT NOT NULL,'
+                     ' match INTEGER NOT NULL, is_pet_dog INTEGER NOT NULL,'
+                     f' is_classifier_dog INTEGER NOT NULL, {time_column} REAL,'
+                     ' PRIMARY KEY (run_id, row))')
+        conn.execute("INSERT INTO runs VALUES (1, 0.0, 'vgg', 'abc', 'v1', 'pet_images/', 'dognames.txt')")
+        conn.execute("INSERT INTO results VALUES (1, 0, 'Beagle_01125.jpg', 'beagle', 162, 'beagle',"
+                     " 1, 1, 1, 12.5)")
+    conn.close()
+
+
+def test_old_database_is_upgraded(tmp_path):
+    path = str(tmp_path / 'results.db')
+    write_version1_database(path)
+    store = ResultsStore(path)
+    assert store.run_timing(1) == {'images': 1, 'seconds': 0.0125}
+    assert store.load_results(1).filenames == ['Beagle_01125.jpg']
+    store.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_unknown_results_table_fails(tmp_path):
+    path = str(tmp_path / 'results.db')
+    write_version1_database(path, time_column='seconds')
+    with pytest.raises(ValueError, match='amortized_ms'):
+        ResultsStore(path)
+
+
+def test_newer_database_fails(tmp_path):
+    path = str(tmp_path / 'results.db')
+    ResultsStore(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION + 1}')
+    conn.close()
+    with pytest.raises(ValueError, match='newer|only knows'):
+        ResultsStore(path)
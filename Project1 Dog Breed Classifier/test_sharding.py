@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/test_sharding.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: Tests of sharding.py: the shards split the images without
+#          overlap, and merging the shard files gives back the images in the
+#          order of a single run, with the same statistics.
+#
+# Usage: python -m pytest test_sharding.py
+#
+##
+import pytest  # For the expected errors
+from get_pet_labels import get_pet_labels, scan_pet_images  # The images to shard
+from calculates_results_stats import calculates_results_stats  # Statistics of a single run
+from sharding import (select_shard, iter_shard, shard_file_path, write_shard_file,
+                      merge_shard_files)  # Under test
+
+N_SHARDS = 3
+
+
+def classify_shard(shard):
+    """Fills in made-up classifications and is-a-dog flags (every other image a match)."""
+    n_images = len(shard)
+    shard.set_classifications([162] * n_images, ['beagle'] * n_images,
+                              [row % 2 for row in range(n_images)])
+    shard.set_dog_flags([1] * n_images, [row % 3 != 0 for row in range(n_images)])
+    return shard
+
+
+def write_shards(shard_dir):
+    """Writes the shard files of pet_images/; returns them with the full results."""
+    results = get_pet_labels('pet_images')
+    paths = []
+    for shard_index in range(N_SHARDS):
+        shard, rows = select_shard(results, shard_index, N_SHARDS)
+        path = shard_file_path(str(shard_dir), 'vgg', shard_index, N_SHARDS, 'pet_images')
+        write_shard_file(path, 'vgg', shard_index, N_SHARDS, classify_shard(shard), rows,
+                         {'images': len(shard), 'seconds': 1.0}, 'pet_images')
+        paths.append(path)
+    return results, paths
+
+
+def test_shards_split_the_images():
+    results = get_pet_labels('pet_images')
+    shard_rows = [select_shard(results, shard_index, N_SHARDS)[1].tolist()
+                  for shard_index in range(N_SHARDS)]
+    assert sorted(row for rows in shard_rows for row in rows) == list(range(len(results)))
+    # Each shard keeps the images in scan order
+    assert all(rows == sorted(rows) for rows in shard_rows)
+
+
+def test_iter_shard_gives_the_same_rows_as_select_shard():
+    results = get_pet_labels('pet_images')
+    for shard_index in range(N_SHARDS):
+        shard, rows = select_shard(results, shard_index, N_SHARDS)
+        streamed_rows = []
+        streamed = list(iter_shard(scan_pet_images('pet_images'), shard_index, N_SHARDS, streamed_rows))
+        assert streamed_rows == rows.tolist()
+        assert [filename for filename, pet_label in streamed] == shard.filenames
+
+
+def test_merge_restores_single_run_order(tmp_path):
+    results, paths = write_shards(tmp_path)
+    # The shard files can be given in any order
+    table, accumulator, timing = merge_shard_files(list(reversed(paths)))
+    assert table.filenames == results.filenames
+    assert table.pet_labels() == results.pet_labels()
+    assert accumulator.results_stats() == calculates_results_stats(table)
+    assert timing == {'images': len(results), 'seconds': float(N_SHARDS)}
+
+
+def test_merge_needs_every_shard(tmp_path):
+    results, paths = write_shards(tmp_path)
+    with pytest.raises(ValueError):
+        merge_shard_files(paths[1:])
+    with pytest.raises(ValueError):
+        merge_shard_files(paths + paths[:1])
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/test_watch_folder.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 22.11.2024
+# REVISED DATE:
+# PURPOSE: Tests of the watch mode in watch_folder.py that run offline: a
+#          small stand-in model is registered instead of the pretrained
+#          networks, and a few of the pet images are copied to a temporary
+#          folder to watch.
+#
+# Usage: python -m pytest test_watch_folder.py
+#
+##
+import json  # To read the checkpoint
+import os  # To copy and touch the images
+import shutil  # To copy the images
+from time import time  # To date the files back past the settle time
+import torch  # For the stand-in model
+from classifier import models, register_model  # The stand-in is registered here
+from results_store import ResultsStore  # Where the watched results are stored
+from watch_folder import watch  # The watch mode under test
+
+# Pet images copied to the watched folder
+IMAGES = ['Beagle_01125.jpg', 'cat_01.jpg', 'Poodle_07927.jpg']
+
+
+class CountingModel(torch.nn.Module):
+    """Stand-in model that calls every image a beagle and counts the images."""
+
+    def __init__(self):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.ones(()))
+        self.images = 0
+
+    def forward(self, img_batch):
+        self.images += len(img_batch)
+        outputs = torch.zeros(len(img_batch), 1000)
+        outputs[:, 162] = self.weight  # ImageNet class 162 is 'beagle'
+        return outputs
+
+
+def settled(path):
+    """Dates a file 10 seconds back, so a polling watcher doesn't wait for it to settle."""
+    past = time() - 10.0
+    os.utime(path, (past, past))
+
+
+def add_image(image_dir, filename, source=None):
+    """Copies a pet image (source, default filename) into the watched folder."""
+    shutil.copyfile(os.path.join('pet_images', source or filename), str(image_dir / filename))
+    settled(str(image_dir / filename))
+
+
+def watch_once(image_dir, checkpoint, store):
+    """Classifies the new or changed files of the folder in one batch."""
+    return watch(str(image_dir), ['test_watch'], 'dognames.txt', str(checkpoint), store,
+                 batch_size=32, interval=0.1, max_batches=1)
+
+
+def setup_watch(tmp_path):
+    """Registers a fresh stand-in model and fills the watched folder."""
+    register_model('test_watch', lambda pretrained: CountingModel(), weights_id='test_watch/counting')
+    models.unload('test_watch')
+    image_dir = tmp_path / 'images'
+    image_dir.mkdir()
+    for filename in IMAGES:
+        add_image(image_dir, filename)
+    return image_dir, tmp_path / 'checkpoint.json', ResultsStore(str(tmp_path / 'results.db'))
+
+
+def test_restart_classifies_only_new_files(tmp_path):
+    image_dir, checkpoint, store = setup_watch(tmp_path)
+    watch_once(image_dir, checkpoint, store)
+    assert models['test_watch'].images == 3
+
+    # A restart with a new file: only that one is classified, in the same run
+    add_image(image_dir, 'Beagle_01141.jpg')
+    accumulators = watch_once(image_dir, checkpoint, ResultsStore(str(tmp_path / 'results.db')))
+    assert models['test_watch'].images == 4
+    assert accumulators['test_watch'].counts['n_images'] == 4
+    assert accumulators['test_watch'].counts['n_dogs_img'] == 3
+    runs = store.runs()
+    assert [run['images'] for run in runs] == [4]
+
+
+def test_changed_file_replaces_its_row(tmp_path):
+    image_dir, checkpoint, store = setup_watch(tmp_path)
+    watch_once(image_dir, checkpoint, store)
+
+    # cat_01.jpg is replaced by another picture: its row and statistics are updated
+    add_image(image_dir, 'cat_01.jpg', source='cat_02.jpg')
+    accumulators = watch_once(image_dir, checkpoint, store)
+    assert models['test_watch'].images == 4
+    assert accumulators['test_watch'].counts['n_images'] == 3
+    run_id = store.runs()[0]['run_id']
+    assert sorted(store.load_results(run_id).filenames) == sorted(IMAGES)
+    assert store.runs()[0]['images'] == 3
+
+
+def test_unreadable_file_waits_until_it_changes(tmp_path):
+    image_dir, checkpoint, store = setup_watch(tmp_path)
+    with open(str(image_dir / 'dog_99.jpg'), 'wb') as broken_file:
+        broken_file.write(b'not an image')
+    settled(str(image_dir / 'dog_99.jpg'))
+    accumulators = watch_once(image_dir, checkpoint, store)
+    assert accumulators['test_watch'].counts['n_images'] == 3
+    with open(str(checkpoint)) as checkpoint_file:
+        saved = json.load(checkpoint_file)['files']['dog_99.jpg']
+    assert 'failed' in saved and 'results' not in saved
+
+    # Not tried again while it's unchanged; classified once it's a real image
+    add_image(image_dir, 'Poodle_07927.jpg', source='Poodle_07956.jpg')
+    watch_once(image_dir, checkpoint, store)
+    assert models['test_watch'].images == 4
+    add_image(image_dir, 'dog_99.jpg', source='Collie_03797.jpg')
+    accumulators = watch_once(image_dir, checkpoint, store)
+    assert models['test_watch'].images == 5
+    assert accumulators['test_watch'].counts['n_images'] == 4
+    with open(str(checkpoint)) as checkpoint_file:
+        saved = json.load(checkpoint_file)['files']['dog_99.jpg']
+    assert 'failed' not in saved
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/watch_folder.py
+#
+# PROGRAMMER: LULUH ALYAHYA
+# DATE CREATED: 21.11.2024
+# REVISED DATE:
+# PURPOSE: Create a watch mode (check_images.py --watch) that keeps running
+#          and classifies images as they arrive in a folder such as
+#          uploaded_images/, with the models kept loaded between batches.
+#          New or changed files are found with inotify (if the optional
+#          inotify_simple package is installed) or by scanning the folder
+#          every few seconds. Each batch is classified, its results are
+#          added to the results database (--results_db; a changed file's
+#          new results replace its earlier row) and the running statistics
+#          of every model are printed.
+#          A checkpoint file remembers every processed file (its modification
+#          time, size and results), so after a restart only files that are
+#          new or changed since are classified. A changed file's old results
+#          are taken out of the running statistics before its new ones are
+#          added. Results are stored before the checkpoint is saved, so a
+#          crash in between can store a batch twice but never loses one.
+#          Files that can't be read (e.g. a corrupt or half-uploaded image)
+#          are logged and remembered as failed in the checkpoint, and only
+#          tried again once they change; the rest of their batch is
+#          classified as usual.
+#
+##
+import json  # For the checkpoint file
+import os  # To look at the files in the folder
+from time import time, sleep  # For the polling interval
+from PIL import Image  # To find the files of a batch that can't be read
+from get_pet_labels import scan_pet_images, pet_label_from_filename, IMAGE_EXTENSIONS  # Finds the images
+from classify_images import classify_images_multi  # Classifies a batch of images
+from adjust_results4_isadog import adjust_results4_isadog  # Is-a-dog flags
+from calculates_results_stats import ResultsStatsAccumulator  # Running statistics
+from print_results import print_results, print_progress, print_breed_confusion  # Progress and totals
+from imagenet_labels import load_imagenet_labels  # Classifier labels of checkpointed results
+from results_table import ResultsTable  # Column-based results
+from classifier import models, PREPROCESS_VERSION  # To label the stored runs
+
+try:
+    from inotify_simple import INotify, flags  # Optional: wakes up as soon as files arrive
+except ImportError:
+    INotify = None
+
+# Version of the checkpoint file format
+CHECKPOINT_VERSION = 1
+
+
+def load_checkpoint(path, image_dir):
+    """
+    Returns the checkpoint saved in path, or an empty one if there's no such
+    file. Raises ValueError if the checkpoint belongs to another folder.
+    """
+    if not os.path.exists(path):
+        return {'version': CHECKPOINT_VERSION, 'image_dir': os.path.abspath(image_dir),
+                'files': {}, 'stats': {}, 'runs': {}}
+    with open(path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"{path} has unknown checkpoint version {checkpoint.get('version')}")
+    if checkpoint['image_dir'] != os.path.abspath(image_dir):
+        raise ValueError(f"{path} is the checkpoint of {checkpoint['image_dir']}, not {image_dir}")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """Saves a checkpoint, replacing the old file only once the new one is written."""
+    with open(f"{path}.tmp", 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, separators=(',', ':'))
+    os.replace(f"{path}.tmp", path)
+
+
+class FolderWatcher:
+    """
+    Finds the images in a folder that are new or changed since they were
+    last processed.
+
+    Parameters:
+        image_dir (str): The folder to watch.
+        recursive (bool): Whether to also watch sub-folders.
+        interval (float): Seconds between scans (without inotify, or as the
+                          longest wait for inotify events).
+        settle (float): Without inotify, files changed in the last settle
+                        seconds are left for the next scan (they may still
+                        be being written).
+    """
+
+    def __init__(self, image_dir, recursive=False, interval=2.0, settle=1.0):
+        self.image_dir = image_dir
+        self.recursive = recursive
+        self.interval = interval
+        self.settle = settle
+        self._candidates = None  # Files named by inotify events (None = scan everything)
+        self._inotify = None
+        if INotify is not None:
+            self._inotify = INotify()
+            self._watch_masks = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+            self._folders = {}  # Watch descriptor -> folder path relative to image_dir
+            self._add_watches(image_dir, '')
+
+    @property
+    def mode(self):
+        """'inotify' or 'polling'."""
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def _add_watches(self, folder, prefix):
+        self._folders[self._inotify.add_watch(folder, self._watch_masks)] = prefix
+        if self.recursive:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir() and not entry.name.startswith('.'):
+                        self._add_watches(entry.path, prefix + entry.name + '/')
+
+    def wait(self):
+        """
+        Waits until files may have changed: for inotify events (at most
+        interval seconds), or for interval seconds when polling.
+        """
+        if self._inotify is None:
+            sleep(self.interval)
+            return
+        candidates = set()
+        for event in self._inotify.read(timeout=int(self.interval * 1000)):
+            prefix = self._folders.get(event.wd, '')
+            if event.mask & flags.ISDIR:
+                # A new sub-folder: watch it and look at everything in it
+                if self.recursive and event.name and not event.name.startswith('.'):
+                    self._add_watches(os.path.join(self.image_dir, prefix + event.name),
+                                      prefix + event.name + '/')
+                    candidates = None
+            elif candidates is not None and event.mask & (flags.CLOSE_WRITE | flags.MOVED_TO):
+                candidates.add(prefix + event.name)
+        self._candidates = candidates
+
+    def changed_files(self, processed):
+        """
+        Returns the images that are new or changed compared to processed.
+
+        Parameters:
+            processed (dict): Filename -> {'mtime_ns', 'size', ...} of the
+                              files processed so far.
+
+        Returns:
+            list: (filename, mtime_ns, size) of each new or changed image.
+        """
+        if self._candidates is None:
+            filenames = [filename for filename, pet_label in
+                         scan_pet_images(self.image_dir, self.recursive)]
+        else:
+            filenames = sorted(filename for filename in self._candidates
+                               if not os.path.basename(filename).startswith('.')
+                               and filename.lower().endswith(IMAGE_EXTENSIONS))
+        self._candidates = set() if self._inotify is not None else None
+
+        now = time()
+        changed = []
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(self.image_dir, filename))
+            except FileNotFoundError:
+                continue  # Removed again before we got to it
+            known = processed.get(filename)
+            if known is not None and (known['mtime_ns'], known['size']) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            if self._inotify is None and now - stat.st_mtime < self.settle:
+                continue  # Maybe still being written; look again next scan
+            changed.append((filename, stat.st_mtime_ns, stat.st_size))
+        return changed
+
+
+def _checkpointed_results(filename, saved, labels):
+    # One-row results table of a file's checkpointed results for one model
+    class_id, match, is_pet_dog, is_classifier_dog = saved
+    table = ResultsTable([filename], [pet_label_from_filename(os.path.basename(filename))])
+    table.set_classifications([class_id], [labels[class_id]], [match])
+    table.set_dog_flags([is_pet_dog], [is_classifier_dog])
+    return table
+
+
+def _unreadable_files(image_dir, filenames):
+    # Returns filename -> error of the images PIL can't open or fully decode
+    unreadable = {}
+    for filename in filenames:
+        try:
+            with Image.open(os.path.join(image_dir, filename)) as img:
+                img.load()
+        except OSError as error:  # Also PIL.UnidentifiedImageError
+            unreadable[filename] = f"{type(error).__name__}: {error}"
+    return unreadable
+
+
+def watch(image_dir, archs, dogfile, checkpoint_path, store=None, batch_size=32, cache=None,
+          matcher=None, client=None, pool=None, recursive=False, interval=2.0, max_batches=None,
+          metrics=None):
+    """
+    Classifies the images in image_dir as they arrive, until interrupted
+    (Ctrl+C) or after max_batches batches.
+
+    Parameters:
+        image_dir (str): The folder to watch.
+        archs (list): Registry names of the CNN models.
+        dogfile (str): Text file with dog names.
+        checkpoint_path (str): File that remembers the processed files.
+        store (ResultsStore or None): Database the per-image results are appended to.
+        batch_size (int): Most images classified in one batch.
+        cache, matcher, client, pool: See classify_images_multi.
+        recursive (bool): Whether to also watch sub-folders.
+        interval (float): Seconds between scans (see FolderWatcher).
+        max_batches (int or None): Stop after this many batches (None runs until interrupted).
+        metrics (RunMetrics or None): Records the batch timings and model load times.
+
+    Returns:
+        dict: CNN model architecture -> ResultsStatsAccumulator of the
+              latest results of every processed image.
+    """
+    checkpoint = load_checkpoint(checkpoint_path, image_dir)
+    processed = checkpoint['files']
+    accumulators = {arch: ResultsStatsAccumulator.from_json(json.dumps(checkpoint['stats'][arch]))
+                    if arch in checkpoint['stats'] else ResultsStatsAccumulator() for arch in archs}
+    # Files without results for one of the models count as not processed
+    # (unless they failed to be read; those wait until they change)
+    for filename in [filename for filename, saved in processed.items()
+                     if 'failed' not in saved and
+                     any(arch not in saved.get('results', {}) for arch in archs)]:
+        processed[filename] = dict(processed[filename], mtime_ns=None)
+    # Continue the same runs in the results database after a restart
+    if store is not None:
+        runs = checkpoint['runs']
+        for arch in archs:
+            if arch not in runs:
+                runs[arch] = store.start_run(arch, models.fingerprint(arch), PREPROCESS_VERSION,
+                                             image_dir, dogfile)
+    labels = load_imagenet_labels().normalized
+
+    watcher = FolderWatcher(image_dir, recursive, interval)
+    print(f"Watching {image_dir} ({watcher.mode}); {len(processed)} files already processed. "
+          f"Press Ctrl+C to stop.")
+    n_batches = 0
+    try:
+        while max_batches is None or n_batches < max_batches:
+            changed = watcher.changed_files(processed)
+            if not changed:
+                watcher.wait()
+                continue
+
+            for start in range(0, len(changed), batch_size):
+                if max_batches is not None and n_batches >= max_batches:
+                    break
+                batch = changed[start:start + batch_size]
+
+                # Classify the batch, leaving out the files that can't be read
+                failed = {}  # Filename -> error
+                while True:
+                    batch = [entry for entry in batch if entry[0] not in failed]
+                    filenames = [filename for filename, mtime_ns, size in batch]
+                    results = ResultsTable(filenames, (pet_label_from_filename(os.path.basename(filename))
+                                                       for filename in filenames))
+                    results_by_arch = {arch: results.copy() for arch in archs}
+                    if not filenames:
+                        break
+                    try:
+                        class_ids_by_arch, timings = classify_images_multi(
+                            image_dir, results_by_arch, batch_size, 0, 0, cache, metrics, matcher,
+                            client, pool)
+                        break
+                    except OSError:
+                        unreadable = _unreadable_files(image_dir, filenames)
+                        if not unreadable:
+                            raise  # Not a bad file (e.g. the server is down)
+                        failed.update(unreadable)
+                # Remember failed files with their time and size, so they're
+                # only tried again once they change
+                for filename, mtime_ns, size in changed[start:start + batch_size]:
+                    if filename in failed:
+                        print(f"Skipping unreadable image {filename}: {failed[filename]}")
+                        processed[filename] = dict(processed.get(filename, {}), mtime_ns=mtime_ns,
+                                                   size=size, failed=failed[filename])
+
+                if batch:  # Unless every file of the batch failed
+                    for arch, arch_results in results_by_arch.items():
+                        adjust_results4_isadog(arch_results, dogfile, class_ids_by_arch[arch])
+                        # Changed files: take their old results out of the statistics first
+                        for filename in filenames:
+                            saved = processed.get(filename, {}).get('results', {}).get(arch)
+                            if saved is not None:
+                                accumulators[arch].subtract(ResultsStatsAccumulator().update(
+                                    _checkpointed_results(filename, saved, labels)))
+                        accumulators[arch].update(arch_results)
+                        if store is not None:
+                            store.add_results(checkpoint['runs'][arch], arch_results,
+                                              timings[arch]['amortized_ms'], replace=True)
+                        print_progress(accumulators[arch], arch)
+                    if store is not None:
+                        store.flush()
+
+                # Remember the batch only after its results are stored (the
+                # results of models not run this time are kept)
+                for row, (filename, mtime_ns, size) in enumerate(batch):
+                    new_results = {arch: [int(arch_results.class_ids[row]), int(arch_results.match[row]),
+                                          int(arch_results.is_pet_dog[row]),
+                                          int(arch_results.is_classifier_dog[row])]
+                                   for arch, arch_results in results_by_arch.items()}
+                    processed[filename] = {
+                        'mtime_ns': mtime_ns, 'size': size,
+                        'results': dict(processed.get(filename, {}).get('results', {}), **new_results)}
+                checkpoint['stats'] = {arch: json.loads(accumulator.to_json())
+                                       for arch, accumulator in accumulators.items()}
+                save_checkpoint(checkpoint_path, checkpoint)
+                n_batches += 1
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+    # Print the totals of every model
+    for arch, accumulator in accumulators.items():
+        if accumulator.counts['n_images']:
+            print_results(None, accumulator.results_stats(), arch)
+            print_breed_confusion(accumulator)
+    return accumulators
@@ -7,6 +7,9 @@ import argparse
 def process_image(image_path):
     """Process an image for inference."""
     image = Image.open(image_path)
+    # Let the JPEG decoder scale large photos down while decoding (to the
+    # smallest size with a short side of at least 256); other formats are unchanged
+    image.draft('RGB', (256, 256))
     preprocess = transforms.Compose([
         transforms.Resize(256),
         transforms.CenterCrop(224),